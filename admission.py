@@ -0,0 +1,163 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from constants import *
+from metrics import Counter, Gauge
+
+ADMISSIONS_TOTAL = Counter(
+    "masader_admissions_total", "Admission decisions for expensive operations, by outcome."
+)
+IN_FLIGHT = Gauge("masader_in_flight", "Expensive operations currently running.")
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message, wait):
+        super().__init__(message)
+        self.wait = wait
+
+
+class TokenBucket:
+    """
+    Allows `capacity` operations at once, refilled at `rate` operations per second.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        # a bucket created after `now` was read is not refilled backwards
+        if now <= self.updated:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        # seconds until a token is available, 0 if one is available now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class AdmissionController:
+    """
+    Admits expensive operations with per-key token buckets and a global concurrency cap.
+
+    Every operation has its own limits in ADMISSION_LIMITS: the rate and burst of each
+    key (a GitHub username or a session), the number of operations running at once and
+    how long a request may queue for a free slot before it is rejected.
+    """
+
+    def __init__(self, limits=ADMISSION_LIMITS):
+        self.limits = limits
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._slots = {
+            operation: threading.BoundedSemaphore(limit["max_concurrent"])
+            for operation, limit in limits.items()
+        }
+        self._waiting = {operation: 0 for operation in limits}
+        self._running = {operation: 0 for operation in limits}
+
+    def _bucket(self, operation, key):
+        if (operation, key) not in self._buckets:
+            limit = self.limits[operation]
+            self._buckets[(operation, key)] = TokenBucket(limit["rate"], limit["burst"])
+        return self._buckets[(operation, key)]
+
+    def _prune(self, now):
+        # full buckets hold no state worth keeping
+        if len(self._buckets) > ADMISSION_MAX_BUCKETS:
+            for bucket_key in [k for k, b in self._buckets.items() if b.is_idle(now)]:
+                del self._buckets[bucket_key]
+
+    def _take_tokens(self, operation, keys, take=True):
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            buckets = [self._bucket(operation, key) for key in keys if key]
+            wait = max([bucket.wait_time(now) for bucket in buckets], default=0.0)
+            if wait > 0 or not take:
+                return wait
+            for bucket in buckets:
+                bucket.take()
+            return 0.0
+
+    def _reject_rate_limited(self, operation, wait):
+        ADMISSIONS_TOTAL.inc(operation=operation, outcome="rate_limited")
+        raise AdmissionRejected(f"Too many {operation} requests.", wait)
+
+    def queue_length(self, operation):
+        return self._waiting[operation]
+
+    @contextmanager
+    def admit(self, operation, keys, on_queue=None):
+        """
+        Runs an operation if its keys have quota left and a slot frees up in time.
+
+        Args:
+            operation (str): The name of the operation in ADMISSION_LIMITS.
+            keys (list): The keys charged for the operation, for example the session and username.
+            on_queue (callable): Called with the number of waiting requests when the request queues.
+
+        Raises:
+            AdmissionRejected: With the seconds to wait before trying again.
+        """
+        # the quota is only charged once a slot is free, a request rejected for
+        # saturation can be sent again without using it up
+        wait = self._take_tokens(operation, keys, take=False)
+        if wait > 0:
+            self._reject_rate_limited(operation, wait)
+
+        limit = self.limits[operation]
+        slots = self._slots[operation]
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self._waiting[operation] += 1
+                waiting = self._waiting[operation]
+            if on_queue:
+                on_queue(waiting)
+            try:
+                acquired = waiting <= limit["max_queue"] and slots.acquire(
+                    timeout=limit["queue_timeout"]
+                )
+            finally:
+                with self._lock:
+                    self._waiting[operation] -= 1
+            if not acquired:
+                ADMISSIONS_TOTAL.inc(operation=operation, outcome="saturated")
+                raise AdmissionRejected(
+                    f"The server is busy with other {operation} requests.", limit["queue_timeout"]
+                )
+
+        # the keys may have used their quota while this request queued
+        wait = self._take_tokens(operation, keys)
+        if wait > 0:
+            slots.release()
+            self._reject_rate_limited(operation, wait)
+
+        ADMISSIONS_TOTAL.inc(operation=operation, outcome="admitted")
+        with self._lock:
+            self._running[operation] += 1
+            IN_FLIGHT.set(self._running[operation], operation=operation)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running[operation] -= 1
+                IN_FLIGHT.set(self._running[operation], operation=operation)
+            slots.release()
+
+
+admission = AdmissionController()
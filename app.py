@@ -1,22 +1,42 @@
 import streamlit as st  # ignore
 import requests
-import re
 import json
 import os
-import subprocess
-from github import Github
+import shutil
+import tempfile
+from contextlib import contextmanager
 from git import Repo
 from datetime import date
 from constants import *
 from streamlit_tags import st_tags
 from dotenv import load_dotenv
 from streamlit_pdf_viewer import pdf_viewer
-import streamlit.components.v1 as components
-import base64
-
-# MASADER_BOT_URL = "http://0.0.0.0:8080"
-MASADER_BOT_URL = "https://masaderbot-production.up.railway.app"
-
+from share import encode_config, store_config, prefill_key, resolve_prefill, config_hash
+from catalogue import data_file_name, resolve_dataset_link, load_remote_json
+from schemas import start_schema_prefetch, get_schema
+from bot import stream_metadata, extraction_key
+from journal import get_journal
+from metrics import start_metrics_server, timed, observe, log_event
+import time
+from gh_client import get_client, GitHubError, RateLimitExceeded, GitHubUnavailable
+from breaker import CircuitOpen, get_breaker
+from export import serialize_config, zip_configs
+from validation import dict_keys, ValidationError, get_check_cache
+from admission import admission, AdmissionRejected
+from store import get_store, PRRegistry
+from session_memory import get_session_memory
+from pdf_preprocess import prepare_pdf
+from pdf_pages import page_count, page_range
+from columnar import append as append_columnar, start_compaction
+from picker import get_index
+from submissions import get_submissions, idempotency_key, SubmissionPending
+import math
+import uuid
+import hashlib
+from concurrent.futures import wait
+
+
+rerun_start = time.perf_counter()
 
 st.set_page_config(
     page_title="Masader Form",
@@ -32,58 +52,39 @@ GIT_USER_NAME = os.getenv("GIT_USER_NAME")
 GIT_USER_EMAIL = os.getenv("GIT_USER_EMAIL")
 
 
-import requests
+start_metrics_server()
+start_schema_prefetch()
+start_compaction()
 
-# Example Usage
-mode = st.selectbox("Mode", ["ar", "en", "ru", "jp", "fr", "multi"])
+mode = st.selectbox("Mode", MODES)
 
 try:
-    schema = requests.post(f"{MASADER_BOT_URL}/schema", data={"name": mode}).json()
+    compiled_schema = get_schema(mode)
 except Exception as e:
     print("Error:", str(e))
+    st.error(f"Cannot load the {mode} schema, please try again later.")
+    st.stop()
 
-evaluation_subsets = {}
-for c in schema:
-    if "validation_group" in schema[c]:
-        group = schema[c]["validation_group"]
-        if group not in evaluation_subsets:
-            evaluation_subsets[group] = []
-        evaluation_subsets[group].append(c)
-
-validation_columns = []
-for c in evaluation_subsets:
-    validation_columns += evaluation_subsets[c]
-
+schema = compiled_schema["schema"]
+evaluation_subsets = compiled_schema["evaluation_subsets"]
+validation_columns = compiled_schema["validation_columns"]
 NUM_VALIDATION_COLUMNS = len(validation_columns)
-
-column_types = {}
-for c in schema:
-    column_types[c] = schema[c]["output_type"]
-
-column_lens = {}
-for c in schema:
-    column_lens[c] = schema[c]["output_len"]
-required_columns = []
-
-for c in schema:
-    if (
-        "N=0" not in schema[c]["output_len"] and "N>=0" not in schema[c]["output_len"]
-    ):  # find required columns using N=0
-        required_columns.append(c)
+column_types = compiled_schema["column_types"]
+column_lens = compiled_schema["column_lens"]
+required_columns = compiled_schema["required_columns"]
 
 use_annotations_paper = st.toggle("Enable annotations from paper")
 
-columns = list(schema.keys())
+columns = compiled_schema["columns"]
 
 
+# runs in the background threads of the check cache, errors are shown by check_field
+@timed("validate_github")
 def validate_github(username):
-    response = requests.get(f"https://api.github.com/users/{username}")
-    if response.status_code == 200:
-        return True
-    else:
-        return False
+    return get_client(GITHUB_TOKEN).user_exists(username)
 
 
+@timed("validate_url")
 def validate_url(url):
     try:
         response = requests.head(url, allow_redirects=True, timeout=5)
@@ -95,39 +96,44 @@ def validate_url(url):
         return False
 
 
-def validate_dataname(name: str) -> bool:
-    """
-    Validates the name of the dataset.
-
-    Args:
-        name (str): The name of the dataset.
-
-    Returns:
-        bool: True if valid, False otherwise.
-    """
+def update_session_field(column, value):
+    type = column_types[column]
+    if type == "List[str]":
+        st.session_state[column] = value
 
-    for char in name.lower():
-        if char not in VALID_SYMP_NAMES:
-            st.error(f"Invalid character in the dataset name {char}")
-            return False
-    return True
-
-
-def validate_comma_separated_number(number: str) -> bool:
-    """
-    Validates a number with commas separating thousands.
-
-    Args:
-        number (str): The number as a string.
-
-    Returns:
-        bool: True if valid, False otherwise.
-    """
-    # Regular expression pattern to match numbers with comma-separated thousands
-    pattern = r"^\d{1,3}(,\d{3})*$"
-
-    # Match the pattern
-    return bool(re.fullmatch(pattern, number))
+    elif "List[Dict[" in type:
+        subsets = value
+        keys = type.replace("List[Dict[", "").replace("]]", "").split(",")
+        keys = [key.strip() for key in keys]
+        i = 0
+        nostop = True
+        while nostop:
+            for key in keys:
+                if f"{column}_{i}_{key}" in st.session_state:
+                    del st.session_state[f"{column}_{i}_{key}"]
+                else:
+                    nostop = False
+                    break
+            i += 1
+        if len(subsets) > 0:
+            for i, subset in enumerate(subsets):
+                for subkey in subset:
+                    st.session_state[f"{column}_{i}_{subkey}"] = subset[subkey]
+        else:
+            for subkey in keys:
+                if subkey in schema:
+                    if "options" in schema[subkey]:
+                        st.session_state[f"{column}_0_{subkey}"] = schema[subkey][
+                            "options"
+                        ][-1]
+                    else:
+                        type = column_types[subkey]
+                        if type == 'float':
+                            st.session_state[f"{column}_0_{subkey}"] = 0.0
+                        else:
+                            st.session_state[f"{column}_0_{subkey}"] = ""
+    else:
+        st.session_state[column] = value
 
 
 def update_session_config(json_data):
@@ -136,44 +142,7 @@ def update_session_config(json_data):
             st.session_state[f"annot_{column}"] = json_data["annotations_from_paper"][
                 column
             ]
-        type = column_types[column]
-        if type == "List[str]":
-            values = json_data[column]
-            st.session_state[column] = values
-
-        elif "List[Dict[" in type:
-            subsets = json_data[column]
-            keys = type.replace("List[Dict[", "").replace("]]", "").split(",")
-            keys = [key.strip() for key in keys]
-            i = 0
-            nostop = True
-            while nostop:
-                for key in keys:
-                    if f"{column}_{i}_{key}" in st.session_state:
-                        del st.session_state[f"{column}_{i}_{key}"]
-                    else:
-                        nostop = False
-                        break
-                i += 1
-            if len(subsets) > 0:
-                for i, subset in enumerate(subsets):
-                    for subkey in subset:
-                        st.session_state[f"{column}_{i}_{subkey}"] = subset[subkey]
-            else:
-                for subkey in keys:
-                    if subkey in schema:
-                        if "options" in schema[subkey]:
-                            st.session_state[f"{column}_0_{subkey}"] = schema[subkey][
-                                "options"
-                            ][-1]
-                        else:
-                            type = column_types[subkey]
-                            if type == 'float':
-                                st.session_state[f"{column}_0_{subkey}"] = 0.0
-                            else:
-                                st.session_state[f"{column}_0_{subkey}"] = ""
-        else:
-            st.session_state[column] = json_data[column]
+        update_session_field(column, json_data[column])
 
 
 def update_config(config, update_url=True):
@@ -189,6 +158,58 @@ def update_config(config, update_url=True):
     update_session_config(config)
 
 
+def on_pick(field, key):
+    st.session_state[key] = st.session_state[f"{key}__pick"]
+    on_field_change(field)
+
+
+def render_picker(
+    field, key, options, multiple=False, help="", label="", label_visibility="collapsed"
+):
+    """
+    Renders a select box for a large option set, searched on the server so only the matches
+    of the search box are sent to the browser.
+
+    The value is kept in st.session_state[key] like the other fields, the select box has its
+    own key since its options change with every search.
+
+    Args:
+        field (str): The column validated when the value changes.
+        key (str): The session state key of the value.
+        options (list): All the options.
+        multiple (bool): Select many options.
+
+    Returns:
+        The selected option, or options if multiple.
+    """
+    value = st.session_state.get(key)
+    if value is None and not multiple:
+        # like a new select box, the first option is selected
+        value = st.session_state[key] = options[0]
+    matches = get_index(options).search(st.session_state.get(f"{key}__query", ""))
+    # the selected values are always sent, so the widget keeps showing them
+    selected = list(value or []) if multiple else [value]
+    shown = selected + [option for option in matches if option not in selected]
+    st.session_state[f"{key}__pick"] = selected if multiple else value
+    widget = st.multiselect if multiple else st.selectbox
+    widget(
+        label or key,
+        options=shown,
+        key=f"{key}__pick",
+        label_visibility=label_visibility,
+        help=help,
+        on_change=on_pick,
+        args=(field, key),
+    )
+    st.text_input(
+        f"Search {label or key}",
+        key=f"{key}__query",
+        placeholder=f"Search the {len(options)} options",
+        label_visibility="collapsed",
+    )
+    return st.session_state[key]
+
+
 def render_list_dict(c, type):
     # List[Dict[Name, Volume, Unit, Dialect]]
     type = type.replace("List[Dict[", "")
@@ -203,10 +224,22 @@ def render_list_dict(c, type):
             elem = None
             with cols[j]:
                 if subkey in schema:
-                    if "options" in schema[subkey]:
+                    if len(schema[subkey].get("options", [])) >= PICKER_MIN_OPTIONS:
+                        elem = render_picker(
+                            c,
+                            f"{c}_{i}_{subkey}",
+                            schema[subkey]["options"],
+                            label=subkey,
+                            label_visibility="visible",
+                        )
+                    elif "options" in schema[subkey]:
                         options = schema[subkey]["options"]
                         elem = st.selectbox(
-                            subkey, options=options, key=f"{c}_{i}_{subkey}"
+                            subkey,
+                            options=options,
+                            key=f"{c}_{i}_{subkey}",
+                            on_change=on_field_change,
+                            args=(c,),
                         )
                     else:
                         type = column_types[subkey]
@@ -215,11 +248,23 @@ def render_list_dict(c, type):
                                 subkey,
                                 key=f"{c}_{i}_{subkey}",
                                 step=0.1,
+                                on_change=on_field_change,
+                                args=(c,),
                             )
                         else:
-                            elem = st.text_input(subkey, key=f"{c}_{i}_{subkey}")
+                            elem = st.text_input(
+                                subkey,
+                                key=f"{c}_{i}_{subkey}",
+                                on_change=on_field_change,
+                                args=(c,),
+                            )
                 else:
-                    elem = st.text_input(subkey, key=f"{c}_{i}_{subkey}")
+                    elem = st.text_input(
+                        subkey,
+                        key=f"{c}_{i}_{subkey}",
+                        on_change=on_field_change,
+                        args=(c,),
+                    )
             if j == 0:
                 first_elem = elem
         if first_elem:
@@ -228,133 +273,385 @@ def render_list_dict(c, type):
             break
 
 
+REPO_NAME = MASADER_GH_REPO  # Format: "owner/repo"
+
+
+def pr_registry():
+    registry = PRRegistry(get_store())
+    if "prs_imported" not in st.session_state:
+        registry.import_json("prs.json")
+        st.session_state.prs_imported = True
+    return registry
+
+
+def refresh_pr_states(g, registry):
+    # check the list of Pull Requests
+    PRS = registry.all()
+    for pr in PRS:
+        if pr["state"] != "open":
+            continue
+        with timed("github_get_pull"):
+            pr_obj = g.get_pull(REPO_NAME, pr["number"])
+        #  delete unused branches
+        if pr_obj["state"] == "closed":
+            # repo.get_git_ref(f"heads/{pr['branch']}").delete() # might be risky
+            pr["state"] = "closed"
+            registry.save(pr)
+    return PRS
+
+
+@contextmanager
+def clone_catalogue():
+    # every submission gets its own clone, removed once it is done
+    local_path = tempfile.mkdtemp(prefix="masader-")
+    repo_url = MASADER_GH_REMOTE_URL.format(token=GITHUB_TOKEN)
+    try:
+        try:
+            with timed("git_clone"), get_breaker("github").guard():
+                local_repo = Repo.clone_from(repo_url, local_path)
+        except CircuitOpen as e:
+            raise GitHubUnavailable(str(e))
+        # setup name and email for this clone only
+        with local_repo.config_writer() as config:
+            config.set_value("user", "email", GIT_USER_EMAIL)
+            config.set_value("user", "name", GIT_USER_NAME)
+        yield local_repo
+    finally:
+        shutil.rmtree(local_path, ignore_errors=True)
+
+
+def blob_sha(content: bytes) -> str:
+    # the id git gives a file, the contents API returns it as the sha of the file
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def remember_dataset(branch, path, dataset_hash):
+    # the hash of a pushed dataset, keyed by the blob sha of its file
+    with open(path, "rb") as f:
+        sha = blob_sha(f.read())
+    get_store().set_json("dataset_blobs", branch, {"sha": sha, "hash": dataset_hash})
+
+
+def branch_has_dataset(g, branch, file_path, dataset_hash):
+    # the file on the branch decides, the cached hash only saves parsing it when its sha is known
+    try:
+        with timed("github_get_file"):
+            file = g.get_file(REPO_NAME, file_path, branch)
+        if file is None:
+            return False
+        cached = get_store().get_json("dataset_blobs", branch)
+        if cached is not None and cached["sha"] == file["sha"]:
+            return cached["hash"] == dataset_hash
+        remote_hash = config_hash(json.loads(file["content"]))
+    except (GitHubError, ValueError) as e:
+        print("Error:", str(e))
+        return False
+    get_store().set_json("dataset_blobs", branch, {"sha": file["sha"], "hash": remote_hash})
+    return remote_hash == dataset_hash
+
+
+def export_columnar(dataset, data_name):
+    # the analytics copy, a failure must not fail the submission
+    try:
+        with timed("columnar_append"):
+            append_columnar(dataset, column_types, mode, data_name)
+    except Exception as e:
+        print("Error:", "cannot append the dataset to the columnar export", str(e))
+
+
+@timed("update_pr")
 def update_pr(new_dataset):
-    PRS = []
-    if os.path.exists("prs.json"):
-        with open("prs.json", "r") as f:
-            PRS = json.load(f)
-    else:
-        with open("prs.json", "w") as f:
-            json.dump(PRS, f, indent=4)
+    """
+    Creates or updates the pull request of a dataset.
+
+    Returns:
+        dict: The status ("created", "updated" or "unchanged") and the url of a new pull request.
+    """
+    registry = pr_registry()
 
     # create a valid name for the dataset
-    data_name = new_dataset["Name"].lower().strip()
-    for symbol in VALID_PUNCT_NAMES:
-        data_name = data_name.replace(symbol, "_")
+    data_name = data_file_name(new_dataset["Name"])
 
     # Configuration
-    REPO_NAME = "ARBML/masader"  # Format: "owner/repo"
     BRANCH_NAME = f"add-{data_name}"
     PR_TITLE = f"Adding {new_dataset['Name']} to the catalogue"
     PR_BODY = f"This is a pull request by @{st.session_state['gh_username']} to add a {new_dataset['Name']} to the catalogue."
 
     # Initialize GitHub client
-    g = Github(GITHUB_TOKEN)
-    repo = g.get_repo(REPO_NAME)
-
-    # setup name and email
-    os.system(f"git config --global user.email {GIT_USER_EMAIL}")
-    os.system(f"git config --global user.name {GIT_USER_NAME}")
-
-    # Clone repository
-    repo_url = f"https://{GITHUB_TOKEN}@github.com/{REPO_NAME}.git"
-    local_path = "./temp_repo"
-
-    pr_exists = False
+    g = get_client(GITHUB_TOKEN)
 
-    # check the list of Pull Requests
-    for pr in PRS:
-        pr_obj = repo.get_pull(pr["number"])
+    refresh_pr_states(g, registry)
+    # check the branch if it exists
+    pr_exists = registry.get(BRANCH_NAME) is not None
+    if pr_exists:
+        print("PR already exists")
 
-        # check the branch if it exists
-        if pr["branch"] == BRANCH_NAME:
-            print("PR already exists")
-            pr_exists = True
-        else:
-            #  delete unused branches
-            if pr["state"] == "open":
-                if pr_obj.state == "closed":
-                    # repo.get_git_ref(f"heads/{pr['branch']}").delete() # might be risky
-                    pr["state"] = "closed"
+    FILE_PATH = f"datasets/{data_name}.json"
 
-    if os.path.exists(local_path):
-        subprocess.run(["rm", "-rf", local_path])  # Clean up if exists
-    Repo.clone_from(repo_url, local_path)
+    # skip the clone when the branch already has this exact dataset
+    dataset_hash = config_hash(new_dataset)
+    if pr_exists and branch_has_dataset(g, BRANCH_NAME, FILE_PATH, dataset_hash):
+        return {"status": "unchanged"}
 
     # Modify file
-    local_repo = Repo(local_path)
-
-    FILE_PATH = f"datasets/{data_name}.json"
-
-    # if the branch exists
-    if pr_exists:
-        local_repo.git.checkout(BRANCH_NAME)
-        local_repo.git.pull("origin", BRANCH_NAME)
-        with open(f"{local_path}/{FILE_PATH}", "w") as f:
-            json.dump(new_dataset, f, indent=4)
-        local_repo.git.add(FILE_PATH)
-        # check if changes made
-        if local_repo.is_dirty():
-            local_repo.git.commit("-m", f"Updating {FILE_PATH}")
-            local_repo.git.push("origin", BRANCH_NAME)
+    with clone_catalogue() as local_repo:
+        # if the branch exists
+        if pr_exists:
+            with timed("git_checkout"):
+                local_repo.git.checkout(BRANCH_NAME)
+                local_repo.git.pull("origin", BRANCH_NAME)
+            with open(f"{local_repo.working_dir}/{FILE_PATH}", "w") as f:
+                json.dump(new_dataset, f, indent=4)
+            local_repo.git.add(FILE_PATH)
+            # check if changes made
+            if local_repo.is_dirty():
+                with timed("git_commit"):
+                    local_repo.git.commit("-m", f"Updating {FILE_PATH}")
+                with timed("git_push"):
+                    local_repo.git.push("origin", BRANCH_NAME)
+                remember_dataset(BRANCH_NAME, f"{local_repo.working_dir}/{FILE_PATH}", dataset_hash)
+            else:
+                return {"status": "unchanged"}
         else:
-            st.info("No changes made to the dataset")
-            return
-    else:
-        with open(f"{local_path}/{FILE_PATH}", "w") as f:
-            json.dump(new_dataset, f, indent=4)
-        local_repo.git.checkout("-b", BRANCH_NAME)
-        local_repo.git.pull("origin", "main")
-        # Commit and push changes
-        local_repo.git.add(FILE_PATH)
-        local_repo.git.commit("-m", f"Creating {FILE_PATH}.json")
-        local_repo.git.push("--set-upstream", "origin", BRANCH_NAME)
+            with open(f"{local_repo.working_dir}/{FILE_PATH}", "w") as f:
+                json.dump(new_dataset, f, indent=4)
+            with timed("git_checkout"):
+                local_repo.git.checkout("-b", BRANCH_NAME)
+                local_repo.git.pull("origin", "main")
+            # Commit and push changes
+            local_repo.git.add(FILE_PATH)
+            with timed("git_commit"):
+                local_repo.git.commit("-m", f"Creating {FILE_PATH}.json")
+            with timed("git_push"):
+                local_repo.git.push("--set-upstream", "origin", BRANCH_NAME)
+            remember_dataset(BRANCH_NAME, f"{local_repo.working_dir}/{FILE_PATH}", dataset_hash)
+    export_columnar(new_dataset, data_name)
 
     # if the PR doesn't exist
     if not pr_exists:
-        pr = repo.create_pull(
-            title=PR_TITLE,
-            body=PR_BODY,
-            head=BRANCH_NAME,
-            base=repo.default_branch,
-        )
-        st.success(f"Pull request created: {pr.html_url}")
+        with timed("github_get_repo"):
+            repo = g.get_repo(REPO_NAME)
+        with timed("github_create_pull"):
+            pr = g.create_pull(
+                REPO_NAME,
+                title=PR_TITLE,
+                body=PR_BODY,
+                head=BRANCH_NAME,
+                base=repo["default_branch"],
+            )
         # add the pr
-        PRS.append(
+        registry.save(
             {
                 "name": new_dataset["Name"],
-                "url": pr.html_url,
+                "url": pr["html_url"],
                 "branch": BRANCH_NAME,
                 "state": "open",
-                "number": pr.number,
+                "number": pr["number"],
             }
         )
-    else:
-        st.success(f"Pull request updated")
+        return {"status": "created", "url": pr["html_url"]}
+    return {"status": "updated"}
 
-    with open("prs.json", "w") as f:
-        json.dump(PRS, f, indent=4)
 
-    st.balloons()
+def batch_conflicts(datasets, PRS, local_path, branch=None):
+    """
+    Checks each dataset of a batch against the catalogue and the open pull requests.
 
+    Args:
+        datasets (list): The configs of the batch.
+        PRS (list): The pull requests created by the form.
+        local_path (str): The path of the catalogue clone.
+        branch (str): The branch of the batch when it is updated, its own pull request is no conflict.
 
-def get_metadata(link="", pdf=None):
-    url = f"{MASADER_BOT_URL}/run"
-    if link != "":
-        response = requests.post(url, data={"link": link})
-    elif pdf:
-        response = requests.post(url, files={"file": pdf})
-    else:
-        response = requests.get(url)
+    Returns:
+        tuple: The (file path, config) pairs to commit and the messages of the skipped datasets.
+    """
+    open_prs = [pr for pr in PRS if pr["state"] == "open" and pr["branch"] != branch]
+    open_branches = {pr["branch"] for pr in open_prs}
+    # the datasets of the other open batches
+    batched = {data_file_name(name) for pr in open_prs for name in pr.get("names", [])}
+    files, skipped, seen = [], [], set()
+    for dataset in datasets:
+        data_name = data_file_name(dataset["Name"])
+        FILE_PATH = f"datasets/{data_name}.json"
+        if data_name in seen:
+            skipped.append(f"{dataset['Name']} appears twice in the batch.")
+            continue
+        seen.add(data_name)
+        if f"add-{data_name}" in open_branches or data_name in batched:
+            skipped.append(f"{dataset['Name']} already has an open pull request, update it instead.")
+            continue
+        if os.path.exists(f"{local_path}/{FILE_PATH}"):
+            with open(f"{local_path}/{FILE_PATH}", "r") as f:
+                if json.load(f) == dataset:
+                    skipped.append(f"{dataset['Name']} is already in the catalogue with no changes.")
+                    continue
+        files.append((FILE_PATH, dataset))
+    return files, skipped
+
+
+@timed("update_batch_pr")
+def update_batch_pr(datasets):
+    """
+    Creates or updates the pull request of a batch of datasets.
 
-    # Check if the request was successful
-    if response.status_code == 200:
-        # Parse the JSON content
-        json_data = response.json()
-        return json_data
+    Returns:
+        dict: The status ("created", "updated" or "unchanged"), the url of a new pull request
+            and the messages of the skipped datasets.
+    """
+    registry = pr_registry()
+    names = [dataset["Name"] for dataset in datasets]
+
+    # Configuration, a batch is identified by its datasets, an edited batch updates its branch
+    batch_id = hashlib.sha1("\n".join(sorted(names)).encode("utf-8")).hexdigest()[:8]
+    g = get_client(GITHUB_TOKEN)
+    with timed("github_get_repo"):
+        repo = g.get_repo(REPO_NAME)
+    PRS = refresh_pr_states(g, registry)
+    # a closed batch can be sent again, on a new branch so the closed one is left as is
+    BRANCH_NAME, attempt = f"add-batch-{batch_id}", 1
+    existing = registry.get(BRANCH_NAME)
+    while existing is not None and existing["state"] != "open":
+        BRANCH_NAME, attempt = f"add-batch-{batch_id}-{attempt}", attempt + 1
+        existing = registry.get(BRANCH_NAME)
+    pr_exists = existing is not None
+
+    PR_TITLE = f"Adding {len(names)} datasets to the catalogue"
+    PR_BODY = f"This is a pull request by @{st.session_state['gh_username']} to add the following datasets to the catalogue:\n"
+    PR_BODY += "\n".join(f"- {name}" for name in names)
+
+    with clone_catalogue() as local_repo:
+        if pr_exists:
+            with timed("git_checkout"):
+                local_repo.git.checkout(BRANCH_NAME)
+                local_repo.git.pull("origin", BRANCH_NAME)
+        files, skipped = batch_conflicts(
+            datasets, PRS, local_repo.working_dir, branch=BRANCH_NAME if pr_exists else None
+        )
+        if len(files) == 0:
+            return {"status": "unchanged", "skipped": skipped}
+
+        if not pr_exists:
+            with timed("git_checkout"):
+                local_repo.git.checkout("-b", BRANCH_NAME)
+        for FILE_PATH, dataset in files:
+            with open(f"{local_repo.working_dir}/{FILE_PATH}", "w") as f:
+                json.dump(dataset, f, indent=4)
+        # one commit for the whole batch
+        local_repo.git.add(*[FILE_PATH for FILE_PATH, _ in files])
+        with timed("git_commit"):
+            verb = "Updating" if pr_exists else "Adding"
+            local_repo.git.commit("-m", f"{verb} {len(files)} datasets")
+        with timed("git_push"):
+            local_repo.git.push("--set-upstream", "origin", BRANCH_NAME)
+    extractions = st.session_state.get("batch_extractions", {})
+    for FILE_PATH, dataset in files:
+        export_columnar(dataset, os.path.splitext(os.path.basename(FILE_PATH))[0])
+        record_submission(dataset, extractions.get(dataset["Name"]))
+
+    committed = [dataset["Name"] for _, dataset in files]
+    if pr_exists:
+        existing["names"] = existing.get("names", []) + [
+            name for name in committed if name not in existing.get("names", [])
+        ]
+        existing["name"] = ", ".join(existing["names"])
+        registry.save(existing)
+        return {"status": "updated", "skipped": skipped}
     else:
-        st.error(response.text)
-    return None
+        with timed("github_create_pull"):
+            pr = g.create_pull(
+                REPO_NAME,
+                title=PR_TITLE,
+                body=PR_BODY,
+                head=BRANCH_NAME,
+                base=repo["default_branch"],
+            )
+        registry.save(
+            {
+                "name": ", ".join(committed),
+                "names": committed,
+                "url": pr["html_url"],
+                "branch": BRANCH_NAME,
+                "state": "open",
+                "number": pr["number"],
+            }
+        )
+        return {"status": "created", "url": pr["html_url"], "skipped": skipped}
+
+
+def session_id():
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+
+def admit(operation, keys):
+    def on_queue(waiting):
+        st.info(f"The server is busy, your request is number {waiting} in the queue.")
+
+    return admission.admit(operation, keys, on_queue=on_queue)
+
+
+def admission_keys():
+    # the GitHub user across their sessions, and the session until a user is known
+    keys = [f"session:{session_id()}"]
+    username = (st.session_state.get("gh_username") or "").strip()
+    if not username or username.lower() == DEFAULT_GH_USERNAME:
+        return keys
+    # only a username that passed its check, anyone can type any name
+    result = st.session_state.get("field_results", {}).get("gh_username")
+    if result == (value_hash(username), []):
+        keys.insert(0, f"user:{username.lower()}")
+    return keys
+
+
+def show_rejection(e):
+    st.warning(f"{e} Please try again in {math.ceil(e.wait)} seconds.")
+
+
+def preview_value(value, width=80):
+    if isinstance(value, list) and all(isinstance(v, dict) for v in value):
+        value = f"{len(value)} rows"
+    elif isinstance(value, list):
+        value = ", ".join(str(v) for v in value)
+    value = " ".join(str(value).split())
+    return value if len(value) <= width else value[: width - 1] + "…"
+
+
+@timed("get_metadata")
+def get_metadata(link="", pdf=None):
+    metadata = {}
+    with st.status("Extracting metadata ...", expanded=True) as status:
+        try:
+            with admit("extract", admission_keys()):
+                payload = None
+                if pdf:
+                    with timed("pdf_preprocess"):
+                        payload = prepare_pdf(pdf)
+                    log_event(
+                        "pdf_payload",
+                        kind=payload.kind,
+                        pdf_bytes=len(pdf[1]),
+                        sent_bytes=len(payload.content),
+                    )
+                # fill the form field by field and show every value as the bot decides it
+                for field, value in stream_metadata(link=link, pdf=pdf, payload=payload):
+                    metadata[field] = value
+                    if field in columns:
+                        update_session_field(field, value)
+                        st.text(f"✅ {field}: {preview_value(value)}")
+        except AdmissionRejected as e:
+            status.update(label="Metadata extraction postponed", state="error")
+            show_rejection(e)
+            return None
+        except Exception as e:
+            print("Error:", str(e))
+            status.update(label="Metadata extraction failed", state="error")
+            st.error(str(e))
+            return None
+        status.update(label="Metadata extracted", state="complete", expanded=False)
+    st.session_state.extraction_key = extraction_key(link=link, pdf=pdf, payload=payload)
+    return metadata
 
 
 def create_default_json():
@@ -393,7 +690,24 @@ def reset_config():
     update_config(default_json)
     st.session_state.show_form = False
     st.session_state.paper_url = ""
+    if st.session_state.get("paper_pdf"):
+        get_session_memory().release(session_id(), st.session_state.paper_pdf)
     st.session_state.paper_pdf = None
+    st.session_state.paper_pdf_name = ""
+    st.session_state.loaded_hash = None
+    st.session_state.extraction_key = None
+    st.session_state.validation_errors = {}
+    st.session_state.field_results = {}
+    st.session_state.touched_fields = set()
+    st.session_state.checking_fields = set()
+
+
+def update_loaded_config(metadata, content_hash, update_url=True):
+    # only overwrite the form when a different annotation is loaded, so edits survive reruns
+    if st.session_state.get("loaded_hash") == content_hash:
+        return
+    update_config(metadata, update_url=update_url)
+    st.session_state.loaded_hash = content_hash
 
 
 def create_name(name):
@@ -405,33 +719,142 @@ def create_name(name):
     return name.lower()
 
 
-def validate_columns():
-    if not validate_github(st.session_state["gh_username"].strip()):
-        st.error("Please enter a valid GitHub username.")
-    for key in required_columns:
-        value = st.session_state[key]
-        type = column_types[key]
-        if type in ["List[str]", "List[Dict]"]:
-            if len(value) == 0:
-                st.error(f"Please enter a valid {key}.")
-                break
-        elif type == "str":
-            if value == "":
-                st.error(f"Please enter a valid {key}.")
-                break
-        elif type == "url":
-            if not validate_url(value):
-                st.error(f"Please enter a valid {key}.")
-                break
-        elif type == "int":
-            if value == 0:
-                st.error(f"Please enter a valid {key}.")
-                break
-        else:
-            continue
+def value_hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def check_field(field, value, timeout=0):
+    """
+    Validates one field, the network check of its value (if any) runs in the background.
+
+    Args:
+        field (str): The column of the field, or gh_username.
+        value: The value of the field.
+        timeout (float): Seconds to wait for the network check, None to wait until it is done.
+
+    Returns:
+        list: The ValidationError of the field, None while its network check is running.
+    """
+    if field == "gh_username":
+        if not value:
+            return [ValidationError(field, "Please enter a valid GitHub username.")]
+        errors, target = [], value
+        name, check, message = "github", validate_github, "Please enter a valid GitHub username."
     else:
-        return True
-    return False
+        errors, target = compiled_schema["validator"].check_field(field, value)
+        name, check, message = "url", validate_url, f"{target} is not reachable."
+    if target is None:
+        return errors
+
+    future = get_check_cache().submit(name, target, check)
+    if not wait([future], timeout=timeout).done:
+        return None
+    try:
+        valid = future.result()
+    except (RateLimitExceeded, GitHubUnavailable) as e:
+        st.warning(str(e))
+        valid = False
+    except Exception as e:
+        print("Error:", str(e))
+        valid = False
+    if not valid:
+        errors.append(ValidationError(field, message))
+    return errors
+
+
+def validate_fields(values, timeout=0):
+    """
+    Validates the fields whose value changed since they were last checked.
+
+    The results are kept per field with the hash of the checked value, so a field is only
+    checked again once its value changes. Fields whose network check is still running stay
+    dirty and are picked up by the next call.
+
+    Args:
+        values (dict): The fields to validate and their values.
+        timeout (float): Seconds to wait for the network checks, None to wait until they are done.
+
+    Returns:
+        bool: True if the fields are valid and checked.
+    """
+    results = st.session_state.setdefault("field_results", {})
+    dirty = {}
+    for field, value in values.items():
+        key = value_hash(value)
+        if field not in results or results[field][0] != key:
+            dirty[field] = (key, value)
+            # start every network check before waiting for any of them
+            errors = check_field(field, value)
+            if errors is not None:
+                results[field] = (key, [error.message for error in errors])
+                del dirty[field]
+    for field, (key, value) in dirty.items():
+        errors = check_field(field, value, timeout=timeout)
+        if errors is not None:
+            results[field] = (key, [error.message for error in errors])
+
+    checking = st.session_state.setdefault("checking_fields", set())
+    validation_errors = dict(st.session_state.get("validation_errors", {}))
+    for field, value in values.items():
+        checked = field in results and results[field][0] == value_hash(value)
+        if checked:
+            checking.discard(field)
+        else:
+            checking.add(field)
+        if checked and results[field][1]:
+            validation_errors[field] = results[field][1]
+        else:
+            validation_errors.pop(field, None)
+    st.session_state.validation_errors = validation_errors
+    return not any(field in validation_errors or field in checking for field in values)
+
+
+def field_value(field):
+    if field == "gh_username":
+        return st.session_state.get("gh_username", "").strip()
+    if "List[Dict[" in column_types[field]:
+        return subset_rows(field)
+    return st.session_state.get(field)
+
+
+def on_field_change(field):
+    # runs before the rerun, so the field shows its errors as soon as it is left
+    st.session_state.setdefault("touched_fields", set()).add(field)
+    validate_fields({field: field_value(field)}, timeout=VALIDATION_FIELD_WAIT)
+
+
+def refresh_validation():
+    # the fields without callbacks (tags) and the network checks that finished since the last rerun
+    touched = st.session_state.get("touched_fields", set())
+    if touched:
+        validate_fields({field: field_value(field) for field in touched})
+
+
+@timed("validate_config")
+def validate_columns(config):
+    # only the fields that changed since they were last checked are validated again
+    values = {"gh_username": st.session_state["gh_username"].strip()}
+    for column in compiled_schema["validator"].types:
+        if column not in config:
+            st.session_state.validation_errors = {column: [f"{column} is missing."]}
+            return False
+        values[column] = config[column]
+    st.session_state.touched_fields = set(values)
+    return validate_fields(values, timeout=None)
+
+
+def subset_rows(column):
+    rows = []
+    keys = dict_keys(column_types[column])
+    i = 0
+    # the form always renders one empty row after the last subset
+    while st.session_state.get(f"{column}_{i}_{keys[0]}"):
+        subset = {}
+        for subkey in keys:
+            subset[subkey] = st.session_state.get(f"{column}_{i}_{subkey}", "")
+        rows.append(subset)
+        i += 1
+    return rows
 
 
 def create_json():
@@ -440,19 +863,7 @@ def create_json():
     for column in columns:
         type = column_types[column]
         if "List[Dict[" in type:
-            config[column] = []
-            i = 0
-            while True:
-                subset = {}
-                matched_subsets = [s for s in st.session_state if f"subset_{i}_" in s]
-                if len(matched_subsets):
-                    for subset_key_name in matched_subsets:
-                        subset_name = subset_key_name.split("_")[-1]
-                        subset[subset_name] = st.session_state[subset_key_name]
-                    config[column].append(subset)
-                    i += 1
-                else:
-                    break
+            config[column] = subset_rows(column)
         else:
             config[column] = st.session_state[column]
 
@@ -478,6 +889,10 @@ def create_element(
         st.write(f"{label}*")
     else:
         st.write(label)
+    for message in st.session_state.get("validation_errors", {}).get(key, []):
+        st.error(message)
+    if key in st.session_state.get("checking_fields", set()):
+        st.caption("Checking...")
     if use_annotations_paper:
         st.toggle(
             f"Paper annotated",
@@ -496,23 +911,65 @@ def create_element(
             key=key,
             label_visibility="collapsed",
             step=0.1,
+            on_change=on_field_change,
+            args=(key,),
         )
     elif type in ["int", "date[year]"]:
-        st.number_input(key, key=key, label_visibility="collapsed", step=1, help=help)
+        st.number_input(
+            key,
+            key=key,
+            label_visibility="collapsed",
+            step=1,
+            help=help,
+            on_change=on_field_change,
+            args=(key,),
+        )
     elif (len(options) > 0 and len(options) <= 5) and type == "str":
-        st.radio(key, options=options, key=key, label_visibility="collapsed", help=help)
+        st.radio(
+            key,
+            options=options,
+            key=key,
+            label_visibility="collapsed",
+            help=help,
+            on_change=on_field_change,
+            args=(key,),
+        )
+    elif len(options) >= PICKER_MIN_OPTIONS and type == "str":
+        render_picker(key, key, options, help=help)
     elif len(options) > 0 and type == "str":
         st.selectbox(
-            key, options=options, key=key, label_visibility="collapsed", help=help
+            key,
+            options=options,
+            key=key,
+            label_visibility="collapsed",
+            help=help,
+            on_change=on_field_change,
+            args=(key,),
         )
     elif type == "List[str]":
-        if len(options) > 0 and ("len(options)" in column_lens[key]):
+        if len(options) >= PICKER_MIN_OPTIONS and ("len(options)" in column_lens[key]):
+            render_picker(key, key, options, multiple=True, help=help)
+        elif len(options) > 0 and ("len(options)" in column_lens[key]):
             st.multiselect(
-                key, options=options, key=key, label_visibility="collapsed", help=help
+                key,
+                options=options,
+                key=key,
+                label_visibility="collapsed",
+                help=help,
+                on_change=on_field_change,
+                args=(key,),
             )
         else:
             if key not in st.session_state:
                 st.session_state[key] = []
+            if len(options) >= PICKER_MIN_OPTIONS:
+                query = st.text_input(
+                    f"Search {key}",
+                    key=f"{key}__query",
+                    placeholder=f"Search the {len(options)} suggestions",
+                    label_visibility="collapsed",
+                )
+                options = get_index(options).search(query)
             st_tags(
                 label="",
                 key=key,
@@ -535,6 +992,8 @@ def create_element(
                 placeholder=placeholder,
                 help=help,
                 label_visibility="collapsed",
+                on_change=on_field_change,
+                args=(key,),
             )
         else:
             st.text_input(
@@ -544,6 +1003,8 @@ def create_element(
                 help=help,
                 value=value,
                 label_visibility="collapsed",
+                on_change=on_field_change,
+                args=(key,),
             )
 
 
@@ -561,78 +1022,334 @@ def fix_arxiv_link(link):
 def get_pdf(paper_url):
     if "arxiv.org" in paper_url:
         paper_url = fix_arxiv_link(paper_url)
-    response = requests.get(paper_url)
+    with timed("pdf_download"):
+        response = requests.get(paper_url)
     return response.content
 
 
-def download_button(config):
-    object_to_download = json.dumps(config, indent=4)
-    b64 = base64.b64encode(object_to_download.encode()).decode()
-
-    dl_link = f"""
-    <html>
-    <head>
-    <title>Start Auto Download file</title>
-    <script src="http://code.jquery.com/jquery-3.2.1.min.js"></script>
-    <script>
-    $('<a href="data:text/json;base64,{b64}" download="{create_name(config['Name'])}.json">')[0].click()
-    </script>
-    </head>
-    </html>
-    """
-    return dl_link
-
-
 def load_json(file=None, link=""):
     if file:
         return json.load(file)
     elif link:
-        response = requests.get(link)
-        response.raise_for_status()  # Raise an error for bad responses (e.g., 404)
-        return response.json()
+        metadata, _ = load_remote_json(resolve_dataset_link(link))
+        return metadata
     else:
         raise ("Error: can not load json")
 
 
-def download_json(config):
-    components.html(
-        download_button(config),
-        height=0,
+def queue_config(queue, config, max_size=None):
+    # keep one annotation per dataset name, the latest one wins
+    configs = [c for c in st.session_state.get(queue, []) if c["Name"] != config["Name"]]
+    configs.append(config)
+    st.session_state[queue] = configs[-max_size:] if max_size else configs
+
+
+def render_batch():
+    batch = st.session_state.get("batch", [])
+    if len(batch) == 0:
+        if st.session_state.get("batch_mode"):
+            st.caption("Submit datasets to add them to the batch.")
+        return
+    st.write(f"**Batch of {len(batch)} datasets:** " + ", ".join(c["Name"] for c in batch))
+    col1, col2 = st.columns(2)
+    with col1:
+        submit_batch = st.button("Submit batch")
+    with col2:
+        if st.button("Clear batch"):
+            st.session_state.batch = []
+            st.session_state.batch_extractions = {}
+            st.rerun()
+    if submit_batch:
+        try:
+            submit_batch_once(batch)
+        except AdmissionRejected as e:
+            show_rejection(e)
+        except GitHubError as e:
+            print("Error:", str(e))
+            st.error(f"Cannot create the pull request: {e}")
+
+
+def submit_batch_once(batch):
+    # a double click or a rerun while the batch is pushed gets the result of the first push
+    def submit():
+        with admit("submit", admission_keys()):
+            return update_batch_pr(batch)
+
+    key = idempotency_key({"batch": batch}, st.session_state["gh_username"])
+    try:
+        result, duplicate = get_submissions().run(key, submit)
+    except (SubmissionPending, TimeoutError) as e:
+        st.warning(str(e) or "The same batch is still being submitted, please wait.")
+        return
+    if duplicate:
+        st.caption("This batch was just submitted, here is the result of that submission.")
+    for message in result["skipped"]:
+        st.warning(message)
+    if result["status"] == "unchanged":
+        st.info("No changes made to the datasets")
+        return
+    if result["status"] == "created":
+        st.success(f"Pull request created: {result['url']}")
+    else:
+        st.success("Pull request updated")
+    st.session_state.batch = []
+    st.session_state.batch_extractions = {}
+    st.balloons()
+
+
+def render_downloads():
+    downloads = st.session_state.get("downloads", [])
+    if len(downloads) == 0:
+        return
+    config = downloads[-1]
+    st.download_button(
+        f"💾 Save {create_name(config['Name'])}.json",
+        data=serialize_config(config),
+        file_name=f"{create_name(config['Name'])}.json",
+        mime="application/json",
     )
+    if len(downloads) > 1:
+        # the archive is not kept in the session, the queue is cleared once it is saved
+        with zip_configs((create_name(c["Name"]), c) for c in downloads) as archive:
+            st.download_button(
+                f"🗂️ Save all {len(downloads)} annotations (zip)",
+                data=archive.read(),
+                file_name="masader_annotations.zip",
+                mime="application/zip",
+                on_click=clear_downloads,
+            )
+
 
+def clear_downloads():
+    st.session_state.downloads = []
 
-def displayPDF(link="", pdf=None, height=1200):
-    # Opening file from file path
-    if pdf:
-        base64_pdf = base64.b64encode(pdf).decode("utf-8")
-        pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="{height}px"></iframe>'
-    elif link != "":
-        pdf_display = f'<iframe src="{link}" width="100%" height="{height}px" type="application/pdf"></iframe>'
+
+def displayPDF(link="", height=1200):
+    pdf_display = f'<iframe src="{link}" width="100%" height="{height}px" type="application/pdf"></iframe>'
 
     # Displaying File
     st.markdown(pdf_display, unsafe_allow_html=True)
 
 
+def render_pdf_pages(handle, pdf, total):
+    # only the pages asked for so far are split out of the pdf and sent to the browser
+    shown_key = f"viewer_pages_{handle}"
+    shown = min(st.session_state.get(shown_key, VIEWER_PAGE_BATCH), total)
+    for start in range(0, shown, VIEWER_PAGE_BATCH):
+        stop = min(start + VIEWER_PAGE_BATCH, total)
+        pdf_viewer(
+            page_range(handle, pdf, start, stop),
+            key=f"pdf_viewer_{handle}_{start}",
+            render_text=True,
+        )
+    if shown < total:
+        next_stop = min(shown + VIEWER_PAGE_BATCH, total)
+        st.button(
+            f"Show pages {shown + 1}-{next_stop} of {total}",
+            key=f"pdf_viewer_more_{handle}",
+            on_click=lambda: st.session_state.update({shown_key: next_stop}),
+            use_container_width=True,
+        )
+
+
 @st.fragment
+def render_viewer(height=1200):
+    # a fragment, so showing more pages does not rerun the form
+    if st.session_state.paper_pdf:
+        handle = st.session_state.paper_pdf
+        pdf = get_session_memory().get(session_id(), handle)
+        if not pdf:
+            st.warning("The PDF has expired, please upload it again.")
+            return
+        total = None
+        if VIEWER_MODE == "lazy":
+            try:
+                total = page_count(handle, pdf)
+            except Exception as e:
+                print("Error:", str(e))
+        if total:
+            render_pdf_pages(handle, pdf, total)
+        else:
+            # the whole pdf through the viewer component, never inlined in the page
+            pdf_viewer(pdf, height=height, key=f"pdf_viewer_{handle}", render_text=True)
+    elif st.session_state.paper_url:
+        displayPDF(link=st.session_state.paper_url, height=height)
+    else:
+        st.warning("No PDF found")
+
+
+def prefill_shared_config():
+    # hydrate the form only once per shared link, otherwise edits are overwritten on rerun
+    key = prefill_key(st.query_params)
+    if key is None and st.query_params.get("json_url"):
+        key = f"json_url:{st.query_params['json_url']}"
+    if key is None or st.session_state.get("prefill_key") == key:
+        return
+    shared_mode = st.query_params.get("mode")
+    if shared_mode and shared_mode != mode:
+        # loaded once the user switches to the mode of the link
+        st.error(f"The shared annotation uses the {shared_mode} schema, switch the Mode to {shared_mode} to load it.")
+        return
+    st.session_state.prefill_key = key
+    try:
+        if key.startswith("json_url:"):
+            config = load_json(link=st.query_params["json_url"])
+        else:
+            config = resolve_prefill(st.query_params)
+        if config is None:
+            st.error("The shared annotation has expired or does not exist.")
+            return
+        fitted = fit_to_schema(config)
+        if fitted is None:
+            st.error(f"The shared annotation does not match the {mode} schema.")
+            return
+        update_config(fitted)
+    except Exception as e:
+        print("Error:", str(e))
+        st.error("Cannot load the shared annotation from the link.")
+
+
+def fit_to_schema(config):
+    """
+    Fits a shared config to the current schema, the columns it lacks or has with the wrong
+    type get their default value and the columns unknown to the schema are dropped.
+
+    Returns:
+        dict: The config, None if it has no column of the schema.
+    """
+    if isinstance(config, dict) and "metadata" in config:
+        config = config["metadata"]
+    types = compiled_schema["validator"].types
+    if not isinstance(config, dict) or not any(column in config for column in columns):
+        return None
+    fitted = create_default_json()
+    for column in columns:
+        value = config.get(column)
+        expected = types.get(column)
+        if column not in config or (expected and (not isinstance(value, expected) or isinstance(value, bool))):
+            continue
+        if "List[Dict[" in column_types[column]:
+            keys = dict_keys(column_types[column])
+            value = [{key: row[key] for key in keys if key in row} for row in value if isinstance(row, dict)]
+        fitted[column] = value
+    return fitted
+
+
+def record_submission(config, extraction=None):
+    # pairs the submitted form with the extraction it started from, for evaluate_extraction.py
+    journal = get_journal()
+    extraction = extraction or st.session_state.get("extraction_key")
+    if journal is None or not extraction:
+        return
+    kind, key = extraction
+    journal.record("submission", kind, key, 0, 200, {"schema": mode, "metadata": config})
+
+
+def share_config(config):
+    base_url = st.context.headers.get("Origin", "")
+    share_id = store_config(config)
+    st.write("Short link (stored on this server):")
+    st.code(f"{base_url}/?id={share_id}&mode={mode}", language=None)
+    st.write("Standalone link:")
+    st.code(f"{base_url}/?config={encode_config(config)}&mode={mode}", language=None)
+
+
+def submit_once(config):
+    # a double click or a rerun while the pull request is pushed gets the result of the first submission
+    def submit():
+        with admit("submit", admission_keys()):
+            result = update_pr(config)
+        # only the submission that ran is recorded, not its duplicates
+        record_submission(config)
+        return result
+
+    key = idempotency_key(config, st.session_state["gh_username"])
+    try:
+        result, duplicate = get_submissions().run(key, submit)
+    except (SubmissionPending, TimeoutError) as e:
+        st.warning(str(e) or "The same submission is still running, please wait.")
+        return
+    if duplicate:
+        st.caption("This dataset was just submitted, here is the result of that submission.")
+    if result["status"] == "unchanged":
+        st.info("No changes made to the dataset")
+        return
+    if result["status"] == "created":
+        st.success(f"Pull request created: {result['url']}")
+    else:
+        st.success(f"Pull request updated")
+    st.balloons()
+
+
 def submit_form():
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
-        submit = st.form_submit_button("Submit")
+        submit = st.button("Submit")
     with col2:
-        download = st.form_submit_button("Download")
+        download = st.button("Download")
+    with col3:
+        share = st.button("Share")
+
+    if share:
+        share_config(create_json())
+        return
+
+    num_errors = sum(len(messages) for messages in st.session_state.get("validation_errors", {}).values())
+    if num_errors:
+        st.error(f"Please fix the {num_errors} errors highlighted in the form.")
 
     if submit or download:
-        if validate_columns():
-            config = create_json()
+        config = create_json()
+        if not validate_columns(config):
+            # show the errors next to their fields
+            st.rerun(scope="app")
 
         if download:
-            download_json(config)
+            queue_config("downloads", config, max_size=EXPORT_MAX_DOWNLOADS)
+            # the download buttons are rendered after the form, outside of its fragment
+            st.rerun(scope="app")
+        elif submit and st.session_state.get("batch_mode"):
+            queue_config("batch", config)
+            # recorded once the batch is pushed, with the extraction the dataset started from
+            st.session_state.setdefault("batch_extractions", {})[config["Name"]] = st.session_state.get(
+                "extraction_key"
+            )
+            st.rerun(scope="app")
         elif submit:
-            update_pr(config)
+            try:
+                submit_once(config)
+            except AdmissionRejected as e:
+                show_rejection(e)
+            except GitHubError as e:
+                print("Error:", str(e))
+                st.error(f"Cannot create the pull request: {e}")
         else:
             raise ("error")
 
 
+@st.fragment
+def render_form():
+    # not a st.form, the fields are validated by their callbacks as they change
+    # and a change only reruns this fragment
+    refresh_validation()
+    create_element("GitHub username*", key="gh_username", value=DEFAULT_GH_USERNAME)
+    for key in columns:
+        if key == "annotations_from_paper":
+            continue
+        if "options" in schema[key]:
+            options = schema[key]["options"]
+        else:
+            options = []
+        create_element(
+            key,
+            options=options,
+            key=key,
+            help=schema[key]["question"],
+            type=schema[key]["output_type"],
+        )
+    submit_form()
+
+
 def main():
     st.info(
         """
@@ -655,12 +1372,16 @@ def main():
     if "show_form" not in st.session_state:
         reset_config()
 
+    quota = get_client(GITHUB_TOKEN).rate_limit()
+    if quota["remaining"] is not None:
+        st.sidebar.caption(f"GitHub API quota: {quota['remaining']}/{quota['limit']}")
+
     if "paper_pdf" not in st.session_state:
         st.session_state.paper_pdf = None
+    get_session_memory().touch(session_id())
 
-    # if st.query_params:
-    #     if st.query_params["json_url"]:
-    #         load_json(st.query_params["json_url"])
+    if st.query_params:
+        prefill_shared_config()
 
     options = st.selectbox(
         "Annotation Options",
@@ -675,19 +1396,31 @@ def main():
         )
         json_url = st.text_input(
             "Path to json",
-            placeholder="For example: https://raw.githubusercontent.com/ARBML/masader_form/refs/heads/main/shami.json",
+            placeholder="For example: https://raw.githubusercontent.com/ARBML/masader_form/refs/heads/main/shami.json or shami",
         )
 
         if upload_file:
-            metadata = load_json(file=upload_file)
-            update_config(metadata)
+            content_hash = hashlib.sha256(upload_file.getvalue()).hexdigest()
+            if st.session_state.get("loaded_hash") != content_hash:
+                update_loaded_config(load_json(file=upload_file), content_hash)
         elif json_url:
-            metadata = load_json(url=json_url)
-            update_config(metadata)
-        else:
+            try:
+                metadata, content_hash = load_remote_json(resolve_dataset_link(json_url))
+            except (requests.RequestException, ValueError) as e:
+                print("Error:", str(e))
+                st.error(f"Cannot load the annotation from {json_url}, please check the name or the link.")
+            else:
+                update_loaded_config(metadata, content_hash)
+        elif st.session_state.get("loaded_hash"):
             reset_config()
 
-    if options == "🤖 AI Annotation":
+    if options == "🤖 AI Annotation" and not get_breaker("bot").available():
+        # degraded mode, the bot is down but the form can still be filled by hand
+        st.warning(
+            "🤖 The AI annotation is unavailable right now, please fill the form manually or try again in a few minutes."
+        )
+        st.session_state.show_form = True
+    elif options == "🤖 AI Annotation":
         st.warning(
             "‼️ AI annotation uses LLMs to extract the metadata form papers. However, this approach\
                 is not reliable as LLMs can hellucinate and extract untrustworthy informations. \
@@ -696,29 +1429,53 @@ def main():
         upload_pdf = st.file_uploader(
             "Upload PDF of the paper",
             help="You can use this widget to preload any dataset from https://github.com/ARBML/masader/tree/main/datasets",
+            key=f"upload_pdf_{st.session_state.get('upload_key', 0)}",
         )
         paper_url = st.session_state.paper_url
         if upload_pdf:
             # Prepare the file for sending
             pdf = (upload_pdf.name, upload_pdf.getvalue(), upload_pdf.type)
-            st.session_state.paper_pdf = upload_pdf
-            metadata = get_metadata(pdf=pdf)
-            update_config(metadata, update_url=False)
+            content_hash = hashlib.sha256(pdf[1]).hexdigest()
+            if st.session_state.paper_pdf != content_hash:
+                if st.session_state.paper_pdf:
+                    get_session_memory().release(session_id(), st.session_state.paper_pdf)
+                # keep only a handle in the session, the pdf is spilled to the blob store
+                st.session_state.paper_pdf = get_session_memory().put(session_id(), pdf[1])
+                st.session_state.paper_pdf_name = upload_pdf.name
+            # a new uploader key drops the uploaded file from memory on the next rerun
+            st.session_state.upload_key = st.session_state.get("upload_key", 0) + 1
+            if st.session_state.get("loaded_hash") != content_hash:
+                metadata = get_metadata(pdf=pdf)
+                if metadata:
+                    update_loaded_config(metadata, content_hash, update_url=False)
+        elif st.session_state.paper_pdf:
+            st.caption(f"📄 {st.session_state.paper_pdf_name}")
+            if st.button("Remove PDF"):
+                reset_config()
+                st.rerun()
         elif paper_url:
-            if "arxiv" in paper_url:
+            if st.session_state.get("loaded_hash") == paper_url:
+                pass  # already extracted, keep the edits of the user
+            elif "arxiv" in paper_url:
                 metadata = get_metadata(link=paper_url)
-                update_config(metadata, update_url=False)
+                if metadata:
+                    update_loaded_config(metadata, paper_url, update_url=False)
             else:
-                response = requests.get(paper_url)
-                response.raise_for_status()  # Raise an error for bad responses (e.g., 404)
-                if response.headers.get("Content-Type") == "application/pdf":
-                    pdf = (
-                        paper_url.split("/")[-1],
-                        response.content,
-                        response.headers.get("Content-Type", "application/pdf"),
-                    )
+                content = None
+                with timed("pdf_download"):
+                    # only download the body once we know it is a pdf
+                    with requests.get(paper_url, stream=True, timeout=60) as response:
+                        response.raise_for_status()  # Raise an error for bad responses (e.g., 404)
+                        content_type = response.headers.get("Content-Type")
+                        if content_type == "application/pdf":
+                            content = response.content
+                if content is not None:
+                    pdf = (paper_url.split("/")[-1], content, content_type)
+                    del content
                     metadata = get_metadata(pdf=pdf)
-                    update_config(metadata)
+                    del pdf
+                    if metadata:
+                        update_loaded_config(metadata, paper_url, update_url=False)
                 else:
                     st.error(
                         f"Cannot retrieve a pdf from the link. Make sure {paper_url} is a direct link to a valid pdf"
@@ -738,39 +1495,22 @@ def main():
     if st.session_state.show_form:
         with col2:
             with st.container(height=height):
-                if st.session_state.paper_pdf:
-                    file_path = f"static/temp.pdf"
-                    with open(file_path, "wb") as f:
-                        f.write(st.session_state.paper_pdf.getbuffer())
-                    displayPDF(link=f"app/{file_path}")
-                elif st.session_state.paper_url:
-                    # pdf_viewer(pdf, height=height, render_text=True)
-                    displayPDF(link=st.session_state.paper_url, height=height)
-                else:
-                    st.warning("No PDF found")
+                render_viewer(height)
 
         with col1:
             with st.container(height=height):
-                with st.form(key="dataset_form", border=False):
-                    create_element(
-                        "GitHub username*", key="gh_username", value="zaidalyafeai"
-                    )
-                    for key in columns:
-                        if key == "annotations_from_paper":
-                            continue
-                        if "options" in schema[key]:
-                            options = schema[key]["options"]
-                        else:
-                            options = []
-                        create_element(
-                            key,
-                            options=options,
-                            key=key,
-                            help=schema[key]["question"],
-                            type=schema[key]["output_type"],
-                        )
-                    submit_form()
+                st.toggle(
+                    "Batch submission",
+                    key="batch_mode",
+                    help="Collect several datasets and submit them in one pull request.",
+                )
+                render_form()
+                render_batch()
+                render_downloads()
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        observe("script_rerun", time.perf_counter() - rerun_start)
@@ -0,0 +1,158 @@
+import json
+import time
+
+import requests
+
+from breaker import get_breaker
+from constants import *
+from journal import get_journal, input_hash, journal_mode
+
+
+def _post_run(link="", pdf=None, payload=None, stream=False, **kwargs):
+    url = f"{MASADER_BOT_URL}/run"
+    data = {"stream": "true"} if stream else {}
+    headers = {"Accept": f"{NDJSON_CONTENT_TYPE}, application/json"} if stream else {}
+    if link != "":
+        data["link"] = link
+        return requests.post(url, data=data, headers=headers, stream=stream, **kwargs)
+    elif payload and payload.kind == "text":
+        headers.update(
+            {
+                "Content-Type": "text/plain; charset=utf-8",
+                "Content-Encoding": "gzip",
+                "X-Content-Hash": payload.hash,
+            }
+        )
+        return requests.post(
+            f"{MASADER_BOT_URL}{BOT_TEXT_PATH}",
+            params=data,
+            data=payload.content,
+            headers=headers,
+            stream=stream,
+            **kwargs,
+        )
+    elif payload:
+        data["hash"] = payload.hash
+        file = (payload.name, payload.content, payload.content_type)
+        return requests.post(
+            url, data=data, files={"file": file}, headers=headers, stream=stream, **kwargs
+        )
+    elif pdf:
+        return requests.post(
+            url, data=data, files={"file": pdf}, headers=headers, stream=stream, **kwargs
+        )
+    return requests.get(url, headers=headers, stream=stream, **kwargs)
+
+
+def _parse_event(line: str):
+    line = line.strip()
+    if line.startswith("data:"):  # server-sent events
+        line = line[len("data:") :].strip()
+    if not line or line.startswith(":") or line.startswith("event:"):
+        return None
+    return json.loads(line)
+
+
+def extraction_key(link="", pdf=None, payload=None):
+    """
+    Returns the (mode, input hash) an extraction is recorded under in the journal.
+    """
+    if link != "":
+        return "link", input_hash(link)
+    elif payload:
+        return payload.kind, payload.hash
+    return "pdf", input_hash(pdf[1] if pdf else b"")
+
+
+def stream_metadata(link="", pdf=None, payload=None):
+    """
+    Extracts the metadata of a paper, yielding each field as soon as the bot decides it.
+
+    The bot streams one json object per line (NDJSON, or SSE "data:" lines):
+    {"field": "Name", "value": "Shami"} for each field, {"error": "..."} on failure
+    and optionally {"metadata": {...}} with the final result. A bot that does not
+    stream answers with a single json document, whose fields are yielded at once.
+
+    Args:
+        link (str): The link of the paper.
+        pdf (tuple): The (name, content, type) of the paper pdf.
+        payload (Payload): The preprocessed pdf from pdf_preprocess.prepare_pdf, sent instead of the pdf.
+
+    Yields:
+        tuple: The field name and its value.
+
+    Raises:
+        RuntimeError: If the bot returns an error, or in replay mode if the paper was not recorded.
+        CircuitOpen: If the bot is known to be down.
+    """
+    journal = get_journal()
+    mode, key = extraction_key(link=link, pdf=pdf, payload=payload)
+
+    if journal_mode() in ["cache", "replay"]:
+        recorded = journal.lookup("run", mode, key)
+        if recorded is not None:
+            yield from recorded.items()
+            return
+        if journal_mode() == "replay":
+            raise RuntimeError("No recorded extraction for this paper.")
+
+    breaker = get_breaker("bot")
+    breaker.check()
+    start = time.perf_counter()
+    call = {"status": None}
+    metadata = {}
+    try:
+        for field, value in _stream_run(link, pdf, payload, call):
+            metadata[field] = value
+            yield field, value
+    except Exception as e:
+        # no answer or a server error, an error about the paper does not mean the bot is down
+        if isinstance(e, requests.RequestException) or call["status"] is None or call["status"] >= 500:
+            breaker.failure()
+        else:
+            breaker.success()
+        if journal:
+            journal.record(
+                "run", mode, key, time.perf_counter() - start, call["status"], None, error=str(e)
+            )
+        raise
+    breaker.success()
+    if journal:
+        journal.record("run", mode, key, time.perf_counter() - start, call["status"], metadata)
+
+
+def _stream_run(link, pdf, payload, call):
+    timeout = (BOT_CONNECT_TIMEOUT, BOT_RUN_TIMEOUT)
+    response = _post_run(link=link, pdf=pdf, payload=payload, stream=True, timeout=timeout)
+    if response.status_code == 404 and payload and payload.kind == "text":
+        # a bot without the text endpoint, send the whole pdf
+        response.close()
+        response = _post_run(link=link, pdf=pdf, stream=True, timeout=timeout)
+
+    call["status"] = response.status_code
+    with response:
+        if response.status_code != 200:
+            raise RuntimeError(response.text)
+
+        content_type = response.headers.get("Content-Type", "")
+        if not (
+            content_type.startswith(NDJSON_CONTENT_TYPE)
+            or content_type.startswith("text/event-stream")
+        ):
+            metadata = response.json()
+            if "metadata" in metadata:
+                metadata = metadata["metadata"]
+            yield from metadata.items()
+            return
+
+        response.encoding = response.encoding or "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            event = _parse_event(line or "")
+            if event is None:
+                continue
+            if "error" in event:
+                raise RuntimeError(event["error"])
+            if "field" in event:
+                yield event["field"], event["value"]
+            elif "metadata" in event:
+                yield from event["metadata"].items()
@@ -0,0 +1,117 @@
+"""
+Circuit breakers for the services the app depends on, the bot and GitHub.
+
+A breaker opens after `failures` consecutive failures of its service (timeouts, connection
+errors, 5xx answers) and then fails fast for `reset_timeout` seconds, so the sessions stop
+waiting on a service that is known to be down. After that one call is let through (half
+open): its success closes the breaker, its failure opens it again.
+
+The limits of every service are in BREAKER_LIMITS.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from constants import *
+from metrics import Gauge, log_event
+
+CIRCUIT_OPEN = Gauge("masader_circuit_open", "1 while the circuit breaker of a service is open.")
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, failures, reset_timeout):
+        self.name = name
+        self.failure_threshold = failures
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._probe_started = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.time() >= self.opened_at + self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def available(self) -> bool:
+        """
+        Returns False while the breaker fails fast, without using up the half open call.
+        """
+        return self.state != "open"
+
+    def check(self):
+        """
+        Lets a call through, or raises CircuitOpen if the service is known to be down.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.time()
+            retry = self.opened_at + self.reset_timeout - now
+            # a probe that never reported back (an abandoned stream) is replaced
+            if retry <= 0 and (not self._probing or now - self._probe_started > self.reset_timeout):
+                self._probing = True
+                self._probe_started = now
+                return
+        raise CircuitOpen(
+            f"The {self.name} service is unavailable, retrying in {max(1, int(retry))} seconds."
+        )
+
+    def success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                log_event("circuit_closed", service=self.name)
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+        CIRCUIT_OPEN.set(0, service=self.name)
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if not self._probing and self.failures < self.failure_threshold:
+                return
+            self.opened_at = time.time()
+            self._probing = False
+        log_event("circuit_open", service=self.name, failures=self.failures)
+        CIRCUIT_OPEN.set(1, service=self.name)
+
+    @contextmanager
+    def guard(self, failure_types=(Exception,)):
+        """
+        Checks the breaker, then counts an exception of `failure_types` raised in the block
+        as a failure of the service and anything else as a success.
+        """
+        self.check()
+        try:
+            yield
+        except failure_types:
+            self.failure()
+            raise
+        except BaseException:
+            self.success()
+            raise
+        self.success()
+
+
+def get_breaker(name) -> CircuitBreaker:
+    """
+    Returns the breaker of a service, shared by every session of the process.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **BREAKER_LIMITS[name])
+        return _breakers[name]
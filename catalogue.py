@@ -0,0 +1,97 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from constants import *
+
+# url -> {"data", "hash", "etag", "last_modified", "checked_at"}, least recently used first
+_remote_cache = OrderedDict()
+_remote_cache_lock = threading.Lock()
+
+
+def data_file_name(name: str) -> str:
+    """
+    Creates the file name used for a dataset in the catalogue.
+
+    Args:
+        name (str): The name of the dataset.
+
+    Returns:
+        str: The name lower cased with punctuation replaced by underscores.
+    """
+    data_name = name.lower().strip()
+    for symbol in VALID_PUNCT_NAMES:
+        data_name = data_name.replace(symbol, "_")
+    return data_name
+
+
+def resolve_dataset_link(link: str) -> str:
+    """
+    Resolves a catalogue dataset name to the link of its json, urls are kept as is.
+
+    Args:
+        link (str): A url or the name of a dataset in the catalogue.
+
+    Returns:
+        str: The url of the json.
+    """
+    link = link.strip()
+    if "://" in link:
+        return link
+    if link.endswith(".json"):
+        link = link[: -len(".json")]
+    return f"{MASADER_RAW_URL}/datasets/{data_file_name(link)}.json"
+
+
+def load_remote_json(link: str):
+    """
+    Loads a remote json, revalidating the cached copy with ETag/Last-Modified.
+
+    The cached copy is served without any request for REMOTE_JSON_TTL seconds. At most
+    REMOTE_JSON_CACHE_SIZE jsons are cached, and a copy not revalidated for
+    REMOTE_JSON_CACHE_TTL seconds is downloaded again.
+
+    Args:
+        link (str): The url of the json.
+
+    Returns:
+        tuple: The parsed json and the hash of its content.
+    """
+    with _remote_cache_lock:
+        entry = _remote_cache.get(link)
+        if entry and time.time() - entry["checked_at"] >= REMOTE_JSON_CACHE_TTL:
+            del _remote_cache[link]
+            entry = None
+        elif entry:
+            _remote_cache.move_to_end(link)
+    if entry and time.time() - entry["checked_at"] < REMOTE_JSON_TTL:
+        return entry["data"], entry["hash"]
+
+    headers = {}
+    if entry:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    response = requests.get(link, headers=headers, timeout=10)
+
+    if response.status_code == 304 and entry:
+        entry = dict(entry, checked_at=time.time())
+    else:
+        response.raise_for_status()  # Raise an error for bad responses (e.g., 404)
+        entry = {
+            "data": response.json(),
+            "hash": hashlib.sha256(response.content).hexdigest(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked_at": time.time(),
+        }
+    with _remote_cache_lock:
+        _remote_cache[link] = entry
+        _remote_cache.move_to_end(link)
+        while len(_remote_cache) > REMOTE_JSON_CACHE_SIZE:
+            _remote_cache.popitem(last=False)
+    return entry["data"], entry["hash"]
@@ -0,0 +1,363 @@
+"""
+A columnar copy of the submitted datasets, as partitioned Parquet datasets for analytics.
+
+Layout:
+    <root>/<mode>/datasets/year=<Year>/part-*.parquet   one row per dataset
+    <root>/<mode>/subsets/year=<Year>/part-*.parquet    one row per subset of a dataset
+
+Every submission appends one small file to each table. The Subsets are flattened into their
+own table and the comma separated Volume strings ("117,805") are stored as integers. The
+compaction thread merges the small files every COLUMNAR_COMPACT_INTERVAL seconds and keeps
+only the latest submission of every dataset. A compaction holds a lease in the store, so
+replicas sharing the tables do not compact them at the same time.
+
+Queries read only the columns and partitions they need, for example:
+    read_table("ar", "subsets", columns=["Dialect", "Volume"], filter=ds.field("year") == "2024")
+
+Usage:
+    python columnar.py backfill ../masader/datasets --mode ar
+    python columnar.py compact --mode ar
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from constants import *
+from store import get_store
+from validation import dict_keys, validate_comma_separated_number
+
+TABLES = ["datasets", "subsets"]
+
+_compaction_thread = None
+_lock = threading.Lock()
+
+
+def columnar_root():
+    return os.getenv("MASADER_COLUMNAR_PATH", COLUMNAR_PATH)
+
+
+def normalize_volume(value):
+    """
+    Returns a volume as an integer, None if it is not a valid number.
+
+    Args:
+        value: The volume, a number or a string with commas separating thousands.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and validate_comma_separated_number(value.strip()):
+        return int(value.strip().replace(",", ""))
+    return None
+
+
+def _arrow_type(type):
+    import pyarrow as pa
+
+    if type in ["int", "date[year]"]:
+        return pa.int64()
+    if type == "float":
+        return pa.float64()
+    if type == "List[str]":
+        return pa.list_(pa.string())
+    return pa.string()
+
+
+def _coerce(value, type):
+    if type in ["int", "date[year]"]:
+        return int(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if type == "float":
+        return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if type == "List[str]":
+        return [str(v) for v in value] if isinstance(value, list) else None
+    if type in ["str", "url"]:
+        return value if isinstance(value, str) else None
+    return None if value is None else json.dumps(value)
+
+
+def _partition(year):
+    return str(year) if isinstance(year, int) and not isinstance(year, bool) else "unknown"
+
+
+def to_tables(config, column_types, name, submitted_at=None):
+    """
+    Flattens a config into a row of the datasets table and rows of the subsets table.
+
+    Args:
+        config (dict): The submitted config.
+        column_types (dict): The output type of every column of the schema.
+        name (str): The data file name of the dataset, its identity across submissions.
+        submitted_at (float): The time of the submission, now by default.
+
+    Returns:
+        tuple: The datasets and subsets pyarrow tables.
+    """
+    import pyarrow as pa
+
+    submission = uuid.uuid4().hex
+    submitted_at = int((submitted_at or time.time()) * 1000)
+    year = _partition(config.get("Year"))
+    meta_fields = [
+        pa.field("_name", pa.string()),
+        pa.field("_submission", pa.string()),
+        pa.field("_submitted_at", pa.timestamp("ms", tz="UTC")),
+        pa.field("year", pa.string()),
+    ]
+    meta = {"_name": name, "_submission": submission, "_submitted_at": submitted_at, "year": year}
+
+    fields, row = list(meta_fields), dict(meta)
+    subset_columns = []
+    for column, type in column_types.items():
+        if "List[Dict[" in type:
+            subset_columns.append(column)
+            continue
+        if column == "Volume":
+            fields.append(pa.field(column, pa.int64()))
+            row[column] = normalize_volume(config.get(column))
+        else:
+            fields.append(pa.field(column, _arrow_type(type)))
+            row[column] = _coerce(config.get(column), type)
+    datasets = pa.Table.from_pylist([row], schema=pa.schema(fields))
+
+    subset_fields = list(meta_fields) + [pa.field("_column", pa.string()), pa.field("_row", pa.int64())]
+    keys = []
+    for column in subset_columns:
+        keys += [key for key in dict_keys(column_types[column]) if key not in keys]
+    for key in keys:
+        type = pa.int64() if key == "Volume" else _arrow_type(column_types.get(key, "str"))
+        subset_fields.append(pa.field(key, type))
+    subset_rows = []
+    for column in subset_columns:
+        for i, subset in enumerate(config.get(column) or []):
+            if not isinstance(subset, dict):
+                continue
+            subset_row = dict(meta, _column=column, _row=i)
+            for key in keys:
+                if key == "Volume":
+                    subset_row[key] = normalize_volume(subset.get(key))
+                else:
+                    subset_row[key] = _coerce(subset.get(key), column_types.get(key, "str"))
+            subset_rows.append(subset_row)
+    subsets = pa.Table.from_pylist(subset_rows, schema=pa.schema(subset_fields))
+    return datasets, subsets
+
+
+def _write(table, directory):
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+    # files starting with a dot are ignored by readers until they are complete
+    temporary = os.path.join(directory, f".{name}")
+    pq.write_table(table.drop_columns(["year"]), temporary)
+    os.replace(temporary, os.path.join(directory, name))
+
+
+def append(config, column_types, mode, name, root=None):
+    """
+    Appends a submitted config to the tables of its mode.
+
+    Args:
+        config (dict): The submitted config.
+        column_types (dict): The output type of every column of the schema.
+        mode (str): The schema mode.
+        name (str): The data file name of the dataset.
+        root (str): The directory of the tables, columnar_root() by default.
+    """
+    root = root or columnar_root()
+    for table, rows in zip(TABLES, to_tables(config, column_types, name)):
+        if rows.num_rows:
+            year = rows["year"][0].as_py()
+            _write(rows, os.path.join(root, mode, table, f"year={year}"))
+
+
+def _dataset(path):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    files = glob.glob(os.path.join(path, "year=*", "part-*.parquet"))
+    if not files:
+        return None, []
+    # the schema can change between submissions, missing columns are read as nulls
+    partitioning = ds.partitioning(pa.schema([("year", pa.string())]), flavor="hive")
+    schemas = [ds.dataset(file, format="parquet").schema for file in files]
+    schema = pa.unify_schemas(schemas + [pa.schema([("year", pa.string())])], promote_options="permissive")
+    return ds.dataset(files, schema=schema, format="parquet", partitioning=partitioning, partition_base_dir=path), files
+
+
+def read_table(mode, table, columns=None, filter=None, root=None):
+    """
+    Reads a table, only the given columns and the partitions matching the filter.
+
+    Args:
+        mode (str): The schema mode.
+        table (str): "datasets" or "subsets".
+        columns (list): The columns to read, all by default.
+        filter (pyarrow.dataset.Expression): Filters the rows, on the year partition for example.
+        root (str): The directory of the tables, columnar_root() by default.
+
+    Returns:
+        pyarrow.Table: The rows, None if the table is empty.
+    """
+    dataset, _ = _dataset(os.path.join(root or columnar_root(), mode, table))
+    if dataset is None:
+        return None
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def compact(mode, root=None, min_files=COLUMNAR_COMPACT_MIN_FILES):
+    """
+    Merges the files of the tables of a mode into one file per partition, keeping only the
+    latest submission of every dataset.
+
+    Returns:
+        int: The number of files merged, 0 if another replica is compacting them.
+    """
+    root = root or columnar_root()
+    lease = f"{mode}:{os.path.abspath(root)}"
+    with _lock:
+        if not get_store().add("columnar_compaction", lease, b"", ttl=COLUMNAR_COMPACT_LEASE):
+            return 0
+        try:
+            return _compact(mode, root, min_files)
+        finally:
+            get_store().delete("columnar_compaction", lease)
+
+
+def _compact(mode, root, min_files):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    datasets, dataset_files = _dataset(os.path.join(root, mode, "datasets"))
+    if datasets is None or len(dataset_files) < min_files:
+        return 0
+    # read once, so the appends made meanwhile are left for the next compaction
+    dataset_rows = datasets.to_table()
+    subsets, subset_files = _dataset(os.path.join(root, mode, "subsets"))
+    subset_rows = subsets.to_table() if subsets is not None else None
+
+    latest = {}
+    for name, submission, submitted_at in zip(
+        dataset_rows["_name"].to_pylist(),
+        dataset_rows["_submission"].to_pylist(),
+        dataset_rows["_submitted_at"].to_pylist(),
+    ):
+        if name not in latest or submitted_at >= latest[name][1]:
+            latest[name] = (submission, submitted_at)
+    kept = pa.array([submission for submission, _ in latest.values()], pa.string())
+
+    for table, rows, files in [
+        ("datasets", dataset_rows, dataset_files),
+        ("subsets", subset_rows, subset_files),
+    ]:
+        if rows is None:
+            continue
+        rows = rows.filter(pc.is_in(rows["_submission"], value_set=kept))
+        _write_partitions(rows, os.path.join(root, mode, table))
+        for file in files:
+            os.remove(file)
+    return len(dataset_files) + len(subset_files)
+
+
+def _compaction_loop():
+    while True:
+        time.sleep(COLUMNAR_COMPACT_INTERVAL)
+        for mode in MODES:
+            try:
+                compact(mode)
+            except Exception as e:
+                print("Error:", f"cannot compact the {mode} tables", str(e))
+
+
+def start_compaction():
+    """
+    Compacts the tables in the background, once per process.
+    """
+    global _compaction_thread
+    with _lock:
+        if _compaction_thread is not None:
+            return
+        _compaction_thread = threading.Thread(
+            target=_compaction_loop, name="columnar-compaction", daemon=True
+        )
+    _compaction_thread.start()
+
+
+def _write_partitions(rows, directory):
+    import pyarrow.compute as pc
+
+    for year in pc.unique(rows["year"]).to_pylist():
+        _write(rows.filter(pc.equal(rows["year"], year)), os.path.join(directory, f"year={year}"))
+
+
+def backfill(directory, mode, column_types, root=None):
+    """
+    Appends every dataset json of a catalogue checkout in one file per partition, then
+    compacts the tables.
+
+    Returns:
+        int: The number of datasets appended.
+    """
+    import pyarrow as pa
+
+    root = root or columnar_root()
+    tables = {table: [] for table in TABLES}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not (entry.is_file() and entry.name.endswith(".json")):
+                continue
+            try:
+                with open(entry.path, "r") as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                print("Error:", f"cannot read {entry.path}", str(e))
+                continue
+            if not isinstance(config, dict):
+                continue
+            rows = to_tables(config, column_types, entry.name[: -len(".json")])
+            for table, table_rows in zip(TABLES, rows):
+                tables[table].append(table_rows)
+
+    for table, parts in tables.items():
+        if parts:
+            _write_partitions(pa.concat_tables(parts), os.path.join(root, mode, table))
+    compact(mode, root=root, min_files=1)
+    return len(tables["datasets"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["backfill", "compact"])
+    parser.add_argument("directory", nargs="?", help="The datasets directory of a masader checkout.")
+    parser.add_argument("--mode", default="ar", help="The schema mode of the datasets.")
+    parser.add_argument("--schema", help="Read the schema from a json file instead of the bot.")
+    parser.add_argument("--root", help="The directory of the tables.")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"Merged {compact(args.mode, root=args.root, min_files=1)} files")
+        return 0
+    if args.directory is None:
+        parser.error("backfill needs the datasets directory")
+
+    from schemas import compile_schema, fetch_schema
+
+    if args.schema:
+        with open(args.schema, "r") as f:
+            schema = json.load(f)
+    else:
+        schema = fetch_schema(args.mode)
+    column_types = compile_schema(schema)["column_types"]
+    print(f"Appended {backfill(args.directory, args.mode, column_types, root=args.root)} datasets")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+import os
+
 VALID_CHARS_NAMES = 'abcdefghijklmnopqrstuvwxyz0123456789'
 VALID_PUNCT_NAMES = '-_&.:()[] '
 VALID_SYMP_NAMES = VALID_CHARS_NAMES + VALID_PUNCT_NAMES
@@ -8,4 +10,116 @@ HF_API_URL = 'https://api-inference.huggingface.co'
 
 HF_FEATURE_EXTRACTION_TASK = 'feature-extraction'
 
-MASADER_GH_REPO = 'ARBML/masader'
\ No newline at end of file
+MASADER_GH_REPO = 'ARBML/masader'
+# the username the form starts with, sessions that keep it are not charged as a user
+DEFAULT_GH_USERNAME = 'zaidalyafeai'
+
+SHARED_ID_LENGTH = 12
+SHARED_TTL = 90 * 24 * 60 * 60
+SHARED_MAX_CONFIG_BYTES = 1024 * 1024
+
+MASADER_RAW_URL = f'https://raw.githubusercontent.com/{MASADER_GH_REPO}/main'
+REMOTE_JSON_TTL = 60
+REMOTE_JSON_CACHE_SIZE = 256
+REMOTE_JSON_CACHE_TTL = 60 * 60
+
+# the urls of the services can be overridden, for example to point the app to the stubs
+MASADER_BOT_URL = os.getenv('MASADER_BOT_URL', 'https://masaderbot-production.up.railway.app')
+MODES = ['ar', 'en', 'ru', 'jp', 'fr', 'multi']
+SCHEMA_REFRESH_INTERVAL = 15 * 60
+BOT_RUN_TIMEOUT = 10 * 60
+BOT_CONNECT_TIMEOUT = 5
+BOT_SCHEMA_TIMEOUT = 10
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+BOT_TEXT_PATH = '/run/text'
+
+METRICS_PORT = 9100
+METRICS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+# the successes of these frequent stages are only logged at this rate, their failures always
+METRICS_SAMPLED_STAGES = ['validate_url', 'validate_github', 'validate_config', 'script_rerun']
+METRICS_LOG_SAMPLE_RATE = 0.01
+
+GITHUB_API_URL = os.getenv('MASADER_GITHUB_API_URL', 'https://api.github.com')
+# {token} is replaced with the GitHub token
+MASADER_GH_REMOTE_URL = os.getenv('MASADER_GH_REMOTE_URL', f'https://{{token}}@github.com/{MASADER_GH_REPO}.git')
+GITHUB_TIMEOUT = 10
+GITHUB_RATE_LIMIT_RESERVE = 10
+GITHUB_MAX_RATE_LIMIT_WAIT = 60
+GITHUB_ETAG_CACHE_SIZE = 1024
+
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+# the annotations a session can queue for the zip download, the oldest are dropped
+EXPORT_MAX_DOWNLOADS = 50
+
+CRAWLER_LINK_FIELDS = ['Link', 'HF Link', 'Paper Link']
+CRAWLER_USER_AGENT = 'masader-link-crawler'
+CRAWLER_TIMEOUT = 10
+CRAWLER_CONCURRENCY = 64
+CRAWLER_PER_HOST = 4
+CRAWLER_MAX_REDIRECTS = 5
+CRAWLER_GET_FALLBACK_STATUSES = [403, 405, 501]
+
+# rate and burst are per GitHub username and per session, the rest is for the whole process
+ADMISSION_LIMITS = {
+    'extract': {'rate': 10 / 3600, 'burst': 5, 'max_concurrent': 4, 'max_queue': 8, 'queue_timeout': 60},
+    'submit': {'rate': 20 / 3600, 'burst': 5, 'max_concurrent': 2, 'max_queue': 8, 'queue_timeout': 120},
+}
+ADMISSION_MAX_BUCKETS = 10000
+
+STORE_URL = 'sqlite:///.cache/state.db'
+STORE_TIMEOUT = 5
+STORE_PURGE_INTERVAL = 10 * 60
+BLOB_TTL = 24 * 60 * 60
+
+SESSION_MEMORY_BUDGET = 64 * 1024 * 1024
+SESSION_BLOB_BUDGET = 100 * 1024 * 1024
+SESSION_IDLE_TTL = 30 * 60
+SESSION_EVICTION_INTERVAL = 60
+
+PDF_PREPROCESS = 'off'
+PDF_MAX_PAGES = 10
+PDF_MAX_APPENDIX_PAGES = 10
+PDF_MIN_TEXT_CHARS = 500
+PDF_PREPROCESS_WORKERS = 2
+PDF_PREPROCESS_TIMEOUT = 60
+
+# 'lazy' renders the pages of uploaded pdfs as the user asks for them, 'iframe' embeds the whole pdf
+VIEWER_MODE = 'lazy'
+VIEWER_PAGE_BATCH = 5
+VIEWER_CACHE_SIZE = 128 * 1024 * 1024
+
+BOT_JOURNAL_MODE = 'record'
+BOT_JOURNAL_PATH = '.cache/requests.jsonl'
+BOT_JOURNAL_MAX_BYTES = 50 * 1024 * 1024
+BOT_JOURNAL_BACKUPS = 5
+BOT_JOURNAL_BUFFER_SIZE = 20
+BOT_JOURNAL_FLUSH_INTERVAL = 5
+
+# the url and GitHub username checks of the form fields run in the background as the fields change
+VALIDATION_WORKERS = 8
+VALIDATION_CACHE_TTL = 5 * 60
+VALIDATION_CACHE_SIZE = 10000
+# seconds a field change waits for its network check before the result is left for the next rerun
+VALIDATION_FIELD_WAIT = 1
+
+# the columnar copy of the submitted datasets, see columnar.py
+COLUMNAR_PATH = '.cache/catalogue'
+COLUMNAR_COMPACT_INTERVAL = 60 * 60
+COLUMNAR_COMPACT_MIN_FILES = 16
+COLUMNAR_COMPACT_LEASE = 10 * 60
+
+# option sets this large are searched on the server, only the matches are sent to the browser
+PICKER_MIN_OPTIONS = 20
+PICKER_MAX_MATCHES = 20
+
+# consecutive failures before a service is considered down, and seconds before it is tried again
+BREAKER_LIMITS = {
+    'bot': {'failures': 3, 'reset_timeout': 30},
+    'github': {'failures': 5, 'reset_timeout': 30},
+}
+
+# results of submissions are reused for identical submissions sent within the ttl
+SUBMISSION_RESULT_TTL = 2 * 60
+SUBMISSION_LEASE = 10 * 60
+SUBMISSION_WAIT = 5 * 60
+SUBMISSION_POLL_INTERVAL = 1
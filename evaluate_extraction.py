@@ -0,0 +1,175 @@
+"""
+Compares the metadata extracted by the bot with the metadata submitted by the annotators for
+the same papers, per field and per validation_group of the schema.
+
+Usage:
+    python evaluate_extraction.py .cache/requests.jsonl --mode ar --output report.json
+
+The app records every extraction ("run") and the form submitted after it ("submission") in
+the bot journal under the same input hash, the latest of each are paired. A field agrees
+when both values are equal once normalized: strings are stripped and case folded, lists
+are compared as sets, numbers as floats and subsets row by row. The report sorts the groups
+and fields from the least to the most agreement, so reviewers know where to look first.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from journal import read_journal
+from schemas import compile_schema, fetch_schema
+
+
+def load_pairs(paths, mode):
+    """
+    Pairs the latest extraction and submission of every paper in journals.
+
+    Args:
+        paths (list): The journal files, their rotated files are read too.
+        mode (str): The schema mode of the submissions to keep.
+
+    Returns:
+        list: The (extracted, submitted) metadata of every paper.
+    """
+    runs, submissions = {}, {}
+    for path in paths:
+        for entry in read_journal(path):
+            if entry.get("status") != 200 or not isinstance(entry.get("response"), dict):
+                continue
+            key = (entry["mode"], entry["input_hash"])
+            if entry["endpoint"] == "run":
+                runs[key] = entry["response"]
+            elif entry["endpoint"] == "submission" and entry["response"].get("schema") == mode:
+                submissions[key] = entry["response"]["metadata"]
+    return [(runs[key], submitted) for key, submitted in submissions.items() if key in runs]
+
+
+def normalize(value):
+    # a hashable canonical form, so the frames compare with ==
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, list):
+        if all(isinstance(v, str) for v in value):
+            return tuple(sorted({normalize(v) for v in value}))
+        return json.dumps([normalize_row(v) for v in value], sort_keys=True)
+    if isinstance(value, dict):
+        return json.dumps(normalize_row(value), sort_keys=True)
+    return str(value)
+
+
+def normalize_row(row):
+    if not isinstance(row, dict):
+        return normalize(row)
+    return {key: normalize(value) for key, value in row.items()}
+
+
+def evaluate(pairs, compiled_schema):
+    """
+    Computes the agreement between extracted and submitted metadata.
+
+    Args:
+        pairs (list): The (extracted, submitted) metadata of every paper.
+        compiled_schema (dict): The schema from schemas.compile_schema.
+
+    Returns:
+        dict: The agreement per validation group and per field.
+    """
+    fields = compiled_schema["validation_columns"]
+    groups = compiled_schema["evaluation_subsets"]
+    if not pairs or not fields:
+        return {"pairs": len(pairs), "agreement": None, "groups": [], "fields": []}
+
+    extracted = pd.DataFrame.from_records([p[0] for p in pairs], columns=fields)
+    submitted = pd.DataFrame.from_records([p[1] for p in pairs], columns=fields)
+    extracted = extracted.astype(object).where(extracted.notna(), None).map(normalize)
+    submitted = submitted.astype(object).where(submitted.notna(), None).map(normalize)
+
+    # a field missing from the submission was not annotated, it does not count
+    annotated = submitted.notna().to_numpy()
+    agree = (extracted.to_numpy() == submitted.to_numpy()) & annotated
+
+    counts = annotated.sum(axis=0)
+    agreements = np.divide(agree.sum(axis=0), counts, out=np.full(len(fields), np.nan), where=counts > 0)
+    index = {field: i for i, field in enumerate(fields)}
+
+    field_report = []
+    for group, group_fields in groups.items():
+        for field in group_fields:
+            i = index[field]
+            field_report.append(
+                {
+                    "field": field,
+                    "group": group,
+                    "pairs": int(counts[i]),
+                    "agreement": None if np.isnan(agreements[i]) else round(float(agreements[i]), 4),
+                }
+            )
+
+    group_report = []
+    for group, group_fields in groups.items():
+        columns = [index[field] for field in group_fields]
+        group_annotated = annotated[:, columns]
+        group_agree = agree[:, columns]
+        cells = int(group_annotated.sum())
+        # papers whose annotated fields of the group all agree
+        complete = (group_agree == group_annotated).all(axis=1) & group_annotated.any(axis=1)
+        group_report.append(
+            {
+                "group": group,
+                "fields": group_fields,
+                "agreement": round(float(group_agree.sum()) / cells, 4) if cells else None,
+                "all_fields_agree": round(float(complete.sum()) / len(pairs), 4),
+            }
+        )
+
+    def worst_first(item):
+        return (item["agreement"] is None, item["agreement"] if item["agreement"] is not None else 0)
+
+    return {
+        "pairs": len(pairs),
+        "agreement": round(float(agree.sum()) / int(annotated.sum()), 4) if annotated.any() else None,
+        "groups": sorted(group_report, key=worst_first),
+        "fields": sorted(field_report, key=worst_first),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("journals", nargs="+", help="The bot journal files.")
+    parser.add_argument("--mode", default="ar", help="The schema mode of the submissions.")
+    parser.add_argument("--schema", help="Read the schema from a json file instead of the bot.")
+    parser.add_argument("--output", help="Write the report to a file instead of stdout.")
+    args = parser.parse_args()
+
+    if args.schema:
+        with open(args.schema, "r") as f:
+            schema = json.load(f)
+    else:
+        schema = fetch_schema(args.mode)
+
+    start = time.perf_counter()
+    pairs = load_pairs(args.journals, args.mode)
+    report = evaluate(pairs, compile_schema(schema))
+    report["mode"] = args.mode
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
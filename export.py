@@ -0,0 +1,36 @@
+import json
+import tempfile
+import zipfile
+
+from constants import *
+
+
+def serialize_config(config: dict) -> bytes:
+    return json.dumps(config, indent=4).encode("utf-8")
+
+
+def zip_configs(named_configs):
+    """
+    Zips many annotations into one archive, serializing and compressing them one at a time.
+
+    The archive is spooled to disk once it grows beyond EXPORT_SPOOL_SIZE, so only one
+    serialized annotation is held in memory at any time.
+
+    Args:
+        named_configs: An iterable of (file name, config) pairs.
+
+    Returns:
+        file: The zip archive, positioned at its start.
+    """
+    archive = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    used_names = set()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for name, config in named_configs:
+            file_name, i = f"{name}.json", 1
+            while file_name in used_names:
+                file_name, i = f"{name}_{i}.json", i + 1
+            used_names.add(file_name)
+            with zip_file.open(file_name, "w") as f:
+                f.write(serialize_config(config))
+    archive.seek(0)
+    return archive
@@ -0,0 +1,192 @@
+import base64
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+import requests
+
+from breaker import CircuitOpen, get_breaker
+from constants import *
+from metrics import Gauge, log_event
+
+GITHUB_RATE_LIMIT_REMAINING = Gauge(
+    "masader_github_ratelimit_remaining", "GitHub API requests left in the current window."
+)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class GitHubError(Exception):
+    pass
+
+
+class RateLimitExceeded(GitHubError):
+    pass
+
+
+class GitHubUnavailable(GitHubError):
+    pass
+
+
+class GitHubClient:
+    """
+    A GitHub REST client that authenticates every call, sends conditional requests
+    and waits for the rate limit window to reset before the quota runs out.
+    """
+
+    def __init__(self, token=None):
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+            }
+        )
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        self.limit = None
+        self.remaining = None
+        self.reset = 0
+        # url -> (etag, status code, json)
+        self._etags = OrderedDict()
+        self._lock = threading.Lock()
+        # callers queue on this lock while the quota is exhausted
+        self._quota_lock = threading.Lock()
+
+    def rate_limit(self) -> dict:
+        return {"limit": self.limit, "remaining": self.remaining, "reset": self.reset}
+
+    def _wait_for_quota(self):
+        with self._quota_lock:
+            if self.remaining is None or self.remaining > GITHUB_RATE_LIMIT_RESERVE:
+                return
+            wait = self.reset - time.time()
+            if wait <= 0:
+                return
+            if wait > GITHUB_MAX_RATE_LIMIT_WAIT:
+                raise RateLimitExceeded(
+                    f"GitHub rate limit almost exhausted, it resets in {int(wait)} seconds."
+                )
+            log_event("github_rate_limit_wait", seconds=round(wait, 3))
+            time.sleep(wait)
+            self.remaining = None
+
+    def _update_rate_limit(self, response):
+        headers = response.headers
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        with self._lock:
+            self.limit = int(headers.get("X-RateLimit-Limit", 0))
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+            self.reset = int(headers.get("X-RateLimit-Reset", 0))
+        GITHUB_RATE_LIMIT_REMAINING.set(self.remaining)
+
+    def request(self, method, path, **kwargs):
+        """
+        Sends a request to the GitHub API, GET requests are revalidated with ETags so
+        unchanged resources (304) do not count against the rate limit.
+
+        Args:
+            method (str): The http method.
+            path (str): The api path, for example /users/zaidalyafeai.
+
+        Returns:
+            tuple: The status code and the json body of the response.
+
+        Raises:
+            RateLimitExceeded: If the quota is exhausted for longer than we are willing to wait.
+            GitHubUnavailable: If GitHub does not answer, or is known to be down.
+        """
+        url = path if path.startswith("https://") else f"{GITHUB_API_URL}{path}"
+        headers = kwargs.pop("headers", {})
+        with self._lock:
+            cached = self._etags.get(url) if method == "GET" else None
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        breaker = get_breaker("github")
+        try:
+            breaker.check()
+        except CircuitOpen as e:
+            raise GitHubUnavailable(str(e))
+        self._wait_for_quota()
+        try:
+            response = self.session.request(
+                method, url, headers=headers, timeout=GITHUB_TIMEOUT, **kwargs
+            )
+        except requests.RequestException as e:
+            breaker.failure()
+            raise GitHubUnavailable(f"GitHub is unreachable: {e}")
+        if response.status_code >= 500:
+            breaker.failure()
+        else:
+            breaker.success()
+        self._update_rate_limit(response)
+
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self._etags.move_to_end(url)
+            return cached[1], cached[2]
+        if response.status_code in [403, 429] and (
+            self.remaining == 0 or "Retry-After" in response.headers
+        ):
+            raise RateLimitExceeded(f"GitHub rate limit exceeded: {response.text}")
+
+        data = response.json() if response.content else None
+        if method == "GET" and "ETag" in response.headers:
+            with self._lock:
+                self._etags[url] = (response.headers["ETag"], response.status_code, data)
+                self._etags.move_to_end(url)
+                while len(self._etags) > GITHUB_ETAG_CACHE_SIZE:
+                    self._etags.popitem(last=False)
+        return response.status_code, data
+
+    def _checked(self, method, path, **kwargs):
+        status, data = self.request(method, path, **kwargs)
+        if status >= 400:
+            raise GitHubError(f"GitHub {method} {path} failed with {status}: {data}")
+        return data
+
+    def user_exists(self, username: str) -> bool:
+        status, _ = self.request("GET", f"/users/{quote(username, safe='')}")
+        return status == 200
+
+    def get_repo(self, repo_name: str) -> dict:
+        return self._checked("GET", f"/repos/{repo_name}")
+
+    def get_pull(self, repo_name: str, number: int) -> dict:
+        return self._checked("GET", f"/repos/{repo_name}/pulls/{number}")
+
+    def get_file(self, repo_name: str, path: str, ref: str):
+        """
+        Returns the blob sha and the content of a file on a branch, None if the file or the
+        branch is missing. An unchanged file is revalidated with its ETag.
+        """
+        status, data = self.request(
+            "GET", f"/repos/{repo_name}/contents/{quote(path)}?ref={quote(ref, safe='')}"
+        )
+        if status == 404:
+            return None
+        if status >= 400:
+            raise GitHubError(f"GitHub GET {path} failed with {status}: {data}")
+        return {"sha": data["sha"], "content": base64.b64decode(data["content"])}
+
+    def create_pull(self, repo_name: str, title: str, body: str, head: str, base: str) -> dict:
+        return self._checked(
+            "POST",
+            f"/repos/{repo_name}/pulls",
+            json={"title": title, "body": body, "head": head, "base": base},
+        )
+
+
+def get_client(token=None) -> GitHubClient:
+    """
+    Returns the client of a token, shared by every session of the process so the
+    rate limit and the ETag cache are tracked in one place.
+    """
+    with _clients_lock:
+        if token not in _clients:
+            _clients[token] = GitHubClient(token)
+        return _clients[token]
@@ -0,0 +1,230 @@
+"""
+An append-only journal of the requests sent to the bot and of its responses.
+
+Every line is a json object:
+    {"time": ..., "endpoint": "schema" or "run", "mode": ..., "input_hash": ...,
+     "latency": ..., "status": ..., "response": ..., "error": ...}
+
+A failed request has an error message and no response, only successful responses with
+an object body are served back by lookup.
+
+The app also records the form submitted after an extraction under the endpoint "submission"
+and the input hash of the extraction, for evaluate_extraction.py to pair them.
+
+The journal mode is set with BOT_JOURNAL_MODE (or the MASADER_BOT_JOURNAL environment variable):
+    off      nothing is recorded
+    record   the bot is called and every request is recorded
+    cache    like record, but extractions of papers seen before are served from the journal
+    replay   responses are only served from the journal, nothing is sent to the bot
+
+The replay mode runs the app offline, for tests and benchmarks with real recorded payloads,
+the cache mode warms the extractions of a new deployment with the journal of the previous one.
+
+Writes are buffered and the file is rotated to <path>.1, <path>.2, ... once it is larger
+than BOT_JOURNAL_MAX_BYTES. The lookup index only keeps the file and offset of every
+response, a hit reads it back from the file.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+
+from constants import *
+
+JOURNAL_MODES = ["off", "record", "cache", "replay"]
+
+
+def input_hash(value) -> str:
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return hashlib.sha256(value).hexdigest()
+
+
+def _journal_files(path, backups):
+    # oldest first, the number of a file is its rotation, 0 for the current file
+    return [(i, f"{path}.{i}" if i else path) for i in range(backups, -1, -1)]
+
+
+def _scan(file):
+    # yields the byte offset and entry of every line of a journal file
+    offset = 0
+    with open(file, "rb") as f:
+        for line in f:
+            try:
+                yield offset, json.loads(line)
+            except ValueError:
+                # a line cut by a crash
+                pass
+            offset += len(line)
+
+
+def read_journal(path, backups=BOT_JOURNAL_BACKUPS):
+    """
+    Yields the entries of a journal and of its rotated files, oldest first.
+    """
+    for _, file in _journal_files(path, backups):
+        if os.path.exists(file):
+            for _, entry in _scan(file):
+                yield entry
+
+
+def _servable(entry):
+    return entry.get("status") == 200 and not entry.get("error") and isinstance(entry.get("response"), dict)
+
+
+class Journal:
+    def __init__(
+        self,
+        path,
+        max_bytes=BOT_JOURNAL_MAX_BYTES,
+        backups=BOT_JOURNAL_BACKUPS,
+        buffer_size=BOT_JOURNAL_BUFFER_SIZE,
+        flush_interval=BOT_JOURNAL_FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.time()
+        self._index = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _load_index(self):
+        # key -> (rotation, byte offset) of the latest servable entry
+        index = {}
+        for rotation, file in _journal_files(self.path, self.backups):
+            if not os.path.exists(file):
+                continue
+            for offset, entry in _scan(file):
+                if _servable(entry):
+                    index[(entry["endpoint"], entry["mode"], entry["input_hash"])] = (rotation, offset)
+        return index
+
+    def _read(self, position):
+        if isinstance(position, str):
+            # a buffered line, not written yet
+            return json.loads(position)
+        rotation, offset = position
+        file = f"{self.path}.{rotation}" if rotation else self.path
+        try:
+            with open(file, "rb") as f:
+                f.seek(offset)
+                return json.loads(f.readline())
+        except (OSError, ValueError) as e:
+            print("Error:", f"cannot read the bot journal {file}", str(e))
+            return None
+
+    def lookup(self, endpoint, mode, input_hash):
+        """
+        Returns the latest successful response recorded for an input, None if there is none.
+        """
+        key = (endpoint, mode, input_hash)
+        with self._lock:
+            if self._index is None:
+                # the buffered records are only in the index once they are written
+                self._flush()
+                self._index = self._load_index()
+            position = self._index.get(key)
+            entry = None if position is None else self._read(position)
+        if entry is None or (entry["endpoint"], entry["mode"], entry["input_hash"]) != key:
+            # the file changed under the index, another process rotated it
+            return None
+        return entry["response"]
+
+    def record(self, endpoint, mode, input_hash, latency, status, response, error=None):
+        entry = {
+            "time": time.time(),
+            "endpoint": endpoint,
+            "mode": mode,
+            "input_hash": input_hash,
+            "latency": round(latency, 6),
+            "status": status,
+            "response": response,
+            "error": error,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        key = (endpoint, mode, input_hash) if _servable(entry) else None
+        with self._lock:
+            self._buffer.append((line, key))
+            if self._index is not None and key is not None:
+                self._index[key] = line
+            if (
+                len(self._buffer) >= self.buffer_size
+                or time.time() - self._last_flush >= self.flush_interval
+            ):
+                self._flush()
+
+    def _rotate(self):
+        for i in range(self.backups, 0, -1):
+            source = self.path if i == 1 else f"{self.path}.{i - 1}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i}")
+        if self._index is not None:
+            self._index = {
+                key: (position[0] + 1, position[1]) if isinstance(position, tuple) else position
+                for key, position in self._index.items()
+                if isinstance(position, str) or position[0] < self.backups
+            }
+
+    def _flush(self):
+        self._last_flush = time.time()
+        if not self._buffer:
+            return
+        buffer, self._buffer = self._buffer, []
+        data = "".join(line for line, _ in buffer).encode("utf-8")
+        written = False
+        try:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(data)
+            written = True
+        except OSError as e:
+            print("Error:", f"cannot write the bot journal {self.path}", str(e))
+        if self._index is None:
+            return
+        for line, key in buffer:
+            if key is not None and self._index.get(key) is line:
+                if written:
+                    self._index[key] = (0, offset)
+                else:
+                    del self._index[key]
+            if written:
+                offset += len(line.encode("utf-8"))
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def journal_mode():
+    mode = os.getenv("MASADER_BOT_JOURNAL", BOT_JOURNAL_MODE)
+    if mode not in JOURNAL_MODES:
+        raise ValueError(f"Unknown bot journal mode {mode}")
+    return mode
+
+
+def get_journal():
+    """
+    Returns the journal of the process, None if journaling is off.
+    """
+    global _journal
+    if journal_mode() == "off":
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = Journal(os.getenv("MASADER_BOT_JOURNAL_PATH", BOT_JOURNAL_PATH))
+        return _journal
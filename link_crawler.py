@@ -0,0 +1,267 @@
+"""
+Checks that the links of every dataset in the catalogue are still alive.
+
+Usage:
+    python link_crawler.py ../masader/datasets --db links.db --report dead_links.json
+
+Results are stored in a SQLite database as they complete, so an interrupted crawl
+resumes where it stopped and only links older than --max-age-days are checked again.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+from constants import *
+
+_local = threading.local()
+
+
+def _session():
+    # requests sessions are not thread-safe, keep one per worker thread
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+        _local.session.headers["User-Agent"] = CRAWLER_USER_AGENT
+    return _local.session
+
+
+def iter_catalogue_links(directory):
+    """
+    Yields the (file name, field, url) of every link in the dataset jsons of a directory.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not (entry.is_file() and entry.name.endswith(".json")):
+                continue
+            try:
+                with open(entry.path, "r") as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                print("Error:", entry.path, str(e))
+                continue
+            for field in CRAWLER_LINK_FIELDS:
+                url = config.get(field, "")
+                if isinstance(url, str) and url.startswith(("http://", "https://")):
+                    yield entry.name, field, url.strip()
+
+
+class LinkStore:
+    """
+    Persists the result of every checked url with the time it was checked.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS links (
+                url TEXT PRIMARY KEY,
+                alive INTEGER NOT NULL,
+                status INTEGER,
+                final_url TEXT,
+                error TEXT,
+                checked_at REAL NOT NULL
+            )"""
+        )
+        self.db.commit()
+
+    def fresh_urls(self, max_age):
+        rows = self.db.execute(
+            "SELECT url FROM links WHERE checked_at >= ?", (time.time() - max_age,)
+        )
+        return {url for (url,) in rows}
+
+    def save(self, results):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO links VALUES (:url, :alive, :status, :final_url, :error, :checked_at)",
+            results,
+        )
+        self.db.commit()
+
+    def get(self, url):
+        row = self.db.execute(
+            "SELECT alive, status, final_url, error, checked_at FROM links WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ["alive", "status", "final_url", "error", "checked_at"]
+        return dict(zip(keys, row), url=url)
+
+    def close(self):
+        self.db.close()
+
+
+def _request(method, url):
+    response = _session().request(
+        method, url, allow_redirects=False, stream=True, timeout=CRAWLER_TIMEOUT
+    )
+    response.close()
+    return response.status_code, response.headers.get("Location")
+
+
+def _dead(url, error):
+    return {"alive": 0, "status": None, "final_url": url, "error": error, "checked_at": time.time()}
+
+
+class LinkCrawler:
+    """
+    Checks urls concurrently, at most `concurrency` at once and `per_host` per host.
+
+    Every url is tried with HEAD first and GET when HEAD fails or is not allowed.
+    Redirects are followed by hand so every hop is cached: urls that redirect to an
+    already checked url reuse its result. A chain longer than CRAWLER_MAX_REDIRECTS is
+    dead with the error "TooManyRedirects", a cycle with "RedirectLoop".
+    """
+
+    def __init__(self, concurrency=CRAWLER_CONCURRENCY, per_host=CRAWLER_PER_HOST):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.redirects = {}
+        self.results = {}
+        self._host_limits = {}
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def _probe(self, loop, executor, url):
+        async with self._host_limit(url):
+            try:
+                status, location = await loop.run_in_executor(executor, _request, "HEAD", url)
+                if status in CRAWLER_GET_FALLBACK_STATUSES:
+                    status, location = await loop.run_in_executor(executor, _request, "GET", url)
+            except requests.RequestException:
+                try:
+                    status, location = await loop.run_in_executor(executor, _request, "GET", url)
+                except requests.RequestException as e:
+                    return None, None, type(e).__name__
+        return status, location, None
+
+    async def check(self, loop, executor, url):
+        hops = [url]
+        current = url
+        result = None
+        while result is None:
+            if current in self.results:
+                result = self.results[current]
+            elif current in self.redirects:
+                # cached hops count against the limit like probed ones
+                target = self.redirects[current]
+                if target in hops:
+                    result = _dead(target, "RedirectLoop")
+                elif len(hops) > CRAWLER_MAX_REDIRECTS:
+                    result = _dead(current, "TooManyRedirects")
+                else:
+                    hops.append(target)
+                    current = target
+            else:
+                status, location, error = await self._probe(loop, executor, current)
+                if status is not None and 300 <= status < 400 and location:
+                    self.redirects[current] = urljoin(current, location)
+                    continue
+                result = {
+                    "alive": int(status is not None and status < 400),
+                    "status": status,
+                    "final_url": current,
+                    "error": error,
+                    "checked_at": time.time(),
+                }
+        for hop in hops:
+            self.results[hop] = result
+        return dict(result, url=url)
+
+    async def crawl(self, urls, store=None, batch_size=100):
+        """
+        Checks the urls, saving the results to the store in batches as they complete.
+
+        Returns:
+            list: The result of every url.
+        """
+        loop = asyncio.get_running_loop()
+        limit = asyncio.Semaphore(self.concurrency)
+        results, pending = [], []
+
+        async def check(url):
+            async with limit:
+                return await self.check(loop, executor, url)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for future in asyncio.as_completed([check(url) for url in urls]):
+                result = await future
+                results.append(result)
+                pending.append(result)
+                if store and len(pending) >= batch_size:
+                    store.save(pending)
+                    pending = []
+        if store and pending:
+            store.save(pending)
+        return results
+
+
+def crawl_catalogue(directory, db_path, max_age, concurrency, per_host):
+    store = LinkStore(db_path)
+    try:
+        links = list(iter_catalogue_links(directory))
+        fresh = store.fresh_urls(max_age)
+        urls = {url for _, _, url in links}
+        stale = sorted(urls - fresh)
+        crawler = LinkCrawler(concurrency=concurrency, per_host=per_host)
+        start = time.perf_counter()
+        asyncio.run(crawler.crawl(stale, store=store))
+
+        dead = []
+        for file_name, field, url in links:
+            result = store.get(url)
+            if result and not result["alive"]:
+                dead.append(dict(result, file=file_name, field=field))
+        return {
+            "links": len(links),
+            "urls": len(urls),
+            "checked": len(stale),
+            "skipped_fresh": len(urls) - len(stale),
+            "dead": len(dead),
+            "seconds": round(time.perf_counter() - start, 3),
+            "results": dead,
+        }
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="The datasets directory of a masader checkout.")
+    parser.add_argument("--db", default="links.db", help="The SQLite file of the results.")
+    parser.add_argument("--max-age-days", type=float, default=7, help="Recheck older results.")
+    parser.add_argument("--concurrency", type=int, default=CRAWLER_CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=CRAWLER_PER_HOST)
+    parser.add_argument("--report", help="Write the dead links to a file instead of stdout.")
+    args = parser.parse_args()
+
+    report = crawl_catalogue(
+        args.directory,
+        args.db,
+        args.max_age_days * 24 * 60 * 60,
+        args.concurrency,
+        args.per_host,
+    )
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    return 1 if report["dead"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
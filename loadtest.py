@@ -0,0 +1,311 @@
+"""
+Load tests the form end to end against local stand-ins for the bot and GitHub.
+
+Usage:
+    python loadtest.py --sessions 50 --concurrency 10 --bot-latency 2 --payload-size 20000
+
+Every simulated session runs the app with streamlit's AppTest, goes through the manual,
+AI or load flow (in turns) and submits a pull request. The bot is stubs.bot, the GitHub
+REST API is stubs.github and the catalogue is a bare git repository in a temporary
+directory, so nothing leaves the machine. The report has the throughput, the p50/p95/p99
+latency of every step of the flows and of every stage timed by the app, and the peak memory.
+
+AppTest swaps a process-wide runtime on every run, so concurrent sessions run in separate
+worker processes that share the stubs and the store. The in-process limits of the app
+(admission control, caches) therefore apply per worker, like per replica.
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import get_context
+
+FLOWS = ["manual", "ai", "load"]
+OPTIONS = {
+    "manual": "🦚 Manual Annotation",
+    "ai": "🤖 AI Annotation",
+    "load": "🚥 Load Annotation",
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, q):
+    # nearest rank
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+
+def summarize(durations):
+    summary = {}
+    for name, values in sorted(durations.items()):
+        summary[name] = {
+            "count": len(values),
+            "p50": round(percentile(values, 50), 4),
+            "p95": round(percentile(values, 95), 4),
+            "p99": round(percentile(values, 99), 4),
+            "max": round(max(values), 4),
+        }
+    return summary
+
+
+class StageRecorder(logging.Handler):
+    """
+    Collects the stages the app reports through metrics.log_event.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stages = []
+
+    def emit(self, record):
+        event = json.loads(record.getMessage())
+        if event.get("event") == "stage":
+            self.stages.append((event["stage"], event["seconds"], event["status"]))
+
+    def pop(self):
+        stages, self.stages = self.stages, []
+        return stages
+
+
+class Session:
+    """
+    One simulated user going through a flow of the form up to the submission.
+    """
+
+    def __init__(self, number, flow, args, github_url):
+        from streamlit.testing.v1 import AppTest
+
+        self.number = number
+        self.flow = flow
+        self.github_url = github_url
+        self.steps = {}
+        self.at = AppTest.from_file(args.app, default_timeout=args.timeout)
+
+    def _step(self, name, action):
+        start = time.perf_counter()
+        action()
+        self.steps[name] = time.perf_counter() - start
+        if self.at.exception:
+            raise RuntimeError(f"{name}: {self.at.exception[0].value}")
+
+    def _fill(self, config):
+        for column, value in config.items():
+            if isinstance(value, (str, int, float)) or (
+                isinstance(value, list) and all(isinstance(v, str) for v in value)
+            ):
+                self.at.session_state[column] = value
+
+    def _edits(self):
+        # a unique name per session so every session opens its own pull request,
+        # links to the stub so the link checks of the form stay on this machine
+        link = f"{self.github_url}/raw/main/datasets/shami.json"
+        return {
+            "Name": f"Loadtest {self.number}",
+            "Link": link,
+            "HF Link": "",
+            "Paper Link": link,
+        }
+
+    def run(self):
+        from stubs.bot import METADATA
+
+        at = self.at
+        self._step("page_load", lambda: at.run())
+        self._step("select_flow", lambda: at.selectbox[1].set_value(OPTIONS[self.flow]).run())
+        if self.flow == "manual":
+            config = dict(METADATA, **self._edits())
+        elif self.flow == "ai":
+            link = f"https://arxiv.org/abs/2401.{self.number:05d}"
+            self._step("extract", lambda: at.text_input(key="paper_url").set_value(link).run())
+            config = self._edits()
+        else:
+            json_url = f"{self.github_url}/raw/main/datasets/shami.json"
+            path = [t for t in at.text_input if t.label == "Path to json"][0]
+            self._step("load_json", lambda: path.set_value(json_url).run())
+            config = self._edits()
+
+        self._fill(config)
+        at.session_state["gh_username"] = f"loadtest-{self.number}"
+        submit = [b for b in at.button if b.label == "Submit"][0]
+        self._step("submit", lambda: submit.click().run())
+
+        successes = [s.value for s in at.success]
+        if not any(str(s).startswith("Pull request") for s in successes):
+            messages = [e.value for e in at.error] + [w.value for w in at.warning]
+            raise RuntimeError(f"submission failed: {messages}")
+
+
+_worker = {}
+
+
+def _init_worker(args, github_url):
+    # one recorder per worker process, the app logs its stages to it
+    import metrics
+
+    recorder = StageRecorder()
+    if not args.verbose:
+        for handler in list(metrics.logger.handlers):
+            metrics.logger.removeHandler(handler)
+    metrics.logger.addHandler(recorder)
+    # every stage is reported, not a sample of the frequent ones
+    metrics.METRICS_LOG_SAMPLE_RATE = 1.0
+    _worker.update({"args": args, "github_url": github_url, "recorder": recorder})
+
+
+def _run_session(task):
+    number, flow = task
+    start = time.perf_counter()
+    session = None
+    try:
+        session = Session(number, flow, _worker["args"], _worker["github_url"])
+        session.run()
+        error = None
+    except Exception as e:
+        error = str(e)
+    return {
+        "session": number,
+        "flow": flow,
+        "seconds": time.perf_counter() - start,
+        "steps": session.steps if session else {},
+        "stages": _worker["recorder"].pop(),
+        "error": error,
+        # ru_maxrss is in kilobytes on linux
+        "memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def stub_environment(workdir):
+    """
+    Points the app at stubs on free ports and at state in `workdir`.
+
+    The app reads the urls of the services from the environment on import, so this runs
+    before anything imports constants.
+
+    Returns:
+        tuple: The bot port, the GitHub port and the path of the catalogue remote.
+    """
+    bot_port, github_port = free_port(), free_port()
+    remote = os.path.join(workdir, "masader.git")
+    os.environ.update(
+        {
+            "MASADER_BOT_URL": f"http://127.0.0.1:{bot_port}",
+            "MASADER_GITHUB_API_URL": f"http://127.0.0.1:{github_port}",
+            "MASADER_GH_REMOTE_URL": f"file://{remote}",
+            "MASADER_STORE_URL": f"sqlite:///{os.path.join(workdir, 'state.db')}",
+            "MASADER_BOT_JOURNAL_PATH": os.path.join(workdir, "requests.jsonl"),
+            "MASADER_COLUMNAR_PATH": os.path.join(workdir, "catalogue"),
+            "METRICS_PORT": "0",
+            "GITHUB_TOKEN": "loadtest",
+            "GIT_USER_NAME": "loadtest",
+            "GIT_USER_EMAIL": "loadtest@localhost",
+        }
+    )
+    return bot_port, github_port, remote
+
+
+def start_stubs(args, workdir):
+    bot_port, github_port, remote = stub_environment(workdir)
+    from stubs import bot, github
+
+    servers = [
+        bot.make_server(
+            "127.0.0.1",
+            bot_port,
+            field_delay=args.field_delay,
+            latency=args.bot_latency,
+            payload_size=args.payload_size,
+        ),
+        github.make_server("127.0.0.1", github_port, remote=remote, latency=args.github_latency),
+    ]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers, f"http://127.0.0.1:{github_port}"
+
+
+def run_load_test(args):
+    with tempfile.TemporaryDirectory(prefix="masader-loadtest-") as workdir:
+        servers, github_url = start_stubs(args, workdir)
+        flows = args.flows.split(",")
+        tasks = [(number, flows[number % len(flows)]) for number in range(args.sessions)]
+        # AppTest runs the app as __main__ in the workers, so the worker functions are
+        # referenced through this module's name rather than through __main__
+        import loadtest
+
+        start = time.perf_counter()
+        # spawn, the stub servers run in threads of this process
+        with get_context("spawn").Pool(
+            args.concurrency, initializer=loadtest._init_worker, initargs=(args, github_url)
+        ) as pool:
+            sessions = list(pool.imap_unordered(loadtest._run_session, tasks))
+        seconds = time.perf_counter() - start
+        for server in servers:
+            server.shutdown()
+
+    steps, stages, stage_errors = {}, {}, {}
+    for session in sessions:
+        for stage, value, status in session["stages"]:
+            stages.setdefault(stage, []).append(value)
+            if status != "ok":
+                stage_errors[stage] = stage_errors.get(stage, 0) + 1
+        if session["error"] is None:
+            steps.setdefault(f"{session['flow']}_session", []).append(session["seconds"])
+            for step, value in session["steps"].items():
+                steps.setdefault(f"{session['flow']}_{step}", []).append(value)
+    completed = [s for s in sessions if s["error"] is None]
+    failed = [s for s in sessions if s["error"] is not None]
+    return {
+        "sessions": len(sessions),
+        "concurrency": args.concurrency,
+        "completed": len(completed),
+        "failed": len(failed),
+        "seconds": round(seconds, 3),
+        "throughput_per_minute": round(len(completed) / seconds * 60, 2),
+        "steps": summarize(steps),
+        "stages": summarize(stages),
+        "stage_errors": stage_errors,
+        # the largest app process, and the stubs with the driver
+        "peak_memory_mb": round(max(s["memory_mb"] for s in sessions), 1),
+        "driver_memory_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "errors": [{"session": s["session"], "flow": s["flow"], "error": s["error"]} for s in failed],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="The number of simulated sessions.")
+    parser.add_argument("--concurrency", type=int, default=5, help="The sessions running at once.")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="The flows, run in turns.")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="Seconds before the bot answers.")
+    parser.add_argument("--field-delay", type=float, default=0.0, help="Seconds between streamed fields.")
+    parser.add_argument("--payload-size", type=int, default=0, help="Bytes of the bot answer.")
+    parser.add_argument("--github-latency", type=float, default=0.0, help="Seconds per GitHub request.")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds allowed per app rerun.")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+    parser.add_argument("--report", help="Write the report to a file instead of stdout.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the json logs of the app.")
+    args = parser.parse_args()
+
+    report = run_load_test(args)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
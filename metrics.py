@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from constants import *
+
+logger = logging.getLogger("masader.metrics")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_registry = []
+_server = None
+_server_lock = threading.Lock()
+
+
+def _escape(value):
+    # the escapes of label values in the Prometheus text format
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in labels]
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric(ABC):
+    type = ""
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    @abstractmethod
+    def _samples(self):
+        pass
+
+    def render(self):
+        help = self.help.replace("\\", "\\\\").replace("\n", "\\n")
+        lines = [f"# HELP {self.name} {help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            lines += self._samples()
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=METRICS_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = sorted(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts, _, _ = sample = self._values[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def _samples(self):
+        samples = []
+        for key, (counts, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                samples.append(
+                    f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {bucket_count}"
+                )
+            samples.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            samples.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            samples.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return samples
+
+
+STAGE_SECONDS = Histogram(
+    "masader_stage_duration_seconds", "Duration of each stage of the request lifecycle."
+)
+STAGE_TOTAL = Counter(
+    "masader_stage_total", "Number of times each stage ran, by outcome."
+)
+
+
+def log_event(event, **fields):
+    logger.info(json.dumps({"event": event, "time": time.time(), **fields}))
+
+
+def observe(stage, seconds, status="ok"):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    STAGE_TOTAL.inc(stage=stage, status=status)
+    if status == "ok" and stage in METRICS_SAMPLED_STAGES:
+        if random.random() >= METRICS_LOG_SAMPLE_RATE:
+            return
+        log_event("stage", stage=stage, seconds=round(seconds, 6), status=status, sample_rate=METRICS_LOG_SAMPLE_RATE)
+        return
+    log_event("stage", stage=stage, seconds=round(seconds, 6), status=status)
+
+
+class timed(ContextDecorator):
+    """
+    Records the duration and outcome of a stage, as a context manager or a decorator.
+
+    Example:
+        with timed("git_push"):
+            local_repo.git.push("origin", BRANCH_NAME)
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def _recreate_cm(self):
+        # a fresh timer per call keeps decorated functions thread-safe
+        return timed(self.stage)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        status = "ok" if exc_type is None else "error"
+        observe(self.stage, time.perf_counter() - self._start, status)
+        return False
+
+
+def render_metrics():
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        content = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """
+    Serves the metrics in the Prometheus text format on a side port, once per process.
+
+    The port is read from the METRICS_PORT environment variable, set it to 0 to disable.
+    """
+    global _server
+    if port is None:
+        port = int(os.getenv("METRICS_PORT", METRICS_PORT))
+    with _server_lock:
+        if _server is not None or port == 0:
+            return
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        except OSError as e:
+            print("Error:", f"cannot serve metrics on port {port}", str(e))
+            _server = False
+            return
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
@@ -0,0 +1,69 @@
+"""
+Splits a paper pdf into small pdfs of a few pages, so the viewer only sends the browser
+the pages the user has scrolled to.
+
+The split pages are cached by the hash of the document, across sessions and reruns.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+from constants import *
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_lock = threading.Lock()
+
+
+def _cached(key, compute):
+    global _cache_bytes
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    value = compute()
+    with _lock:
+        if key not in _cache:
+            _cache[key] = value
+            _cache_bytes += len(value) if isinstance(value, bytes) else 0
+            while _cache_bytes > VIEWER_CACHE_SIZE and len(_cache) > 1:
+                _, evicted = _cache.popitem(last=False)
+                _cache_bytes -= len(evicted) if isinstance(evicted, bytes) else 0
+    return value
+
+
+def _reader(content):
+    from pypdf import PdfReader
+
+    return PdfReader(io.BytesIO(content))
+
+
+def page_count(content_hash: str, content: bytes) -> int:
+    return _cached((content_hash, "pages"), lambda: len(_reader(content).pages))
+
+
+def page_range(content_hash: str, content: bytes, start: int, stop: int) -> bytes:
+    """
+    Returns a pdf of the pages [start, stop) of a document.
+
+    Args:
+        content_hash (str): The hash of the document, used as the cache key.
+        content (bytes): The document.
+        start (int): The first page, from 0.
+        stop (int): The page after the last one.
+    """
+
+    def split():
+        from pypdf import PdfWriter
+
+        reader = _reader(content)
+        writer = PdfWriter()
+        for number in range(start, min(stop, len(reader.pages))):
+            writer.add_page(reader.pages[number])
+        writer.compress_identical_objects()
+        output = io.BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+    return _cached((content_hash, start, stop), split)
@@ -0,0 +1,164 @@
+"""
+Reduces a paper pdf to a compact payload before it is sent to the bot.
+
+The mode is set with PDF_PREPROCESS (or the MASADER_PDF_PREPROCESS environment variable):
+    off     the whole pdf is sent, as before
+    text    the text of the pdf is sent, gzip compressed, to the text endpoint of the bot
+    pages   a pdf of the first PDF_MAX_PAGES pages and the appendix is sent
+
+Parsing runs in a worker process so a large pdf does not block the server. Pdfs that
+cannot be reduced (encrypted, scanned without a text layer) are sent whole.
+"""
+
+import gzip
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from constants import *
+
+# kind is "text" or "pdf", content is the bytes to send, hash is the sha256 of the original pdf
+Payload = namedtuple("Payload", ["kind", "name", "content", "content_type", "hash"])
+
+APPENDIX_PATTERN = re.compile(r"^\s*(?:[A-Z]\.?\s+|\d+\.?\s+)?Append(?:ix|ices)\b", re.MULTILINE)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, forking the threads of the streamlit server is not safe
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_PREPROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor(executor, terminate=False):
+    # a worker that crashed (out of memory on a huge pdf) breaks the whole pool, and a
+    # worker stuck on a pdf would hold its slot forever, the pool is replaced
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    if terminate:
+        # shutdown does not stop running workers, the pool has no public way to kill them
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def preprocess_mode():
+    mode = os.getenv("MASADER_PDF_PREPROCESS", PDF_PREPROCESS)
+    if mode not in ["off", "text", "pages"]:
+        raise ValueError(f"Unknown pdf preprocessing mode {mode}")
+    return mode
+
+
+def _appendix_start(pages_text):
+    # the appendix starts at the last page with an appendix heading in the second half
+    half = len(pages_text) // 2
+    for number in range(len(pages_text) - 1, half - 1, -1):
+        if APPENDIX_PATTERN.search(pages_text[number]):
+            # headings repeat on following pages, find the first one
+            while number - 1 >= half and APPENDIX_PATTERN.search(pages_text[number - 1]):
+                number -= 1
+            return number
+    return None
+
+
+def select_pages(pages_text, max_pages=PDF_MAX_PAGES, max_appendix_pages=PDF_MAX_APPENDIX_PAGES):
+    """
+    Returns the numbers of the pages to keep: the first `max_pages` and the appendix.
+    """
+    pages = list(range(min(max_pages, len(pages_text))))
+    start = _appendix_start(pages_text)
+    if start is not None:
+        appendix = range(max(start, len(pages)), min(start + max_appendix_pages, len(pages_text)))
+        pages.extend(appendix)
+    return pages
+
+
+def reduce_pdf(content: bytes, mode: str):
+    """
+    Extracts the text or the selected pages of a pdf, runs in the worker process.
+
+    Returns:
+        tuple: The kind ("text" or "pdf") and the reduced content, None if the pdf can not be reduced.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(content))
+    if reader.is_encrypted:
+        return None
+    pages_text = [page.extract_text() or "" for page in reader.pages]
+    if sum(len(text.strip()) for text in pages_text) < PDF_MIN_TEXT_CHARS:
+        # a scanned pdf, the bot has to parse the images
+        return None
+
+    if mode == "text":
+        text = "\n\f".join(pages_text)
+        return "text", gzip.compress(text.encode("utf-8"))
+
+    writer = PdfWriter()
+    for number in select_pages(pages_text):
+        writer.add_page(reader.pages[number])
+    writer.compress_identical_objects()
+    output = io.BytesIO()
+    writer.write(output)
+    return "pdf", output.getvalue()
+
+
+def prepare_pdf(pdf, mode=None) -> Payload:
+    """
+    Prepares the payload sent to the bot for a pdf.
+
+    Args:
+        pdf (tuple): The (name, content, type) of the paper pdf.
+        mode (str): The preprocessing mode, defaults to preprocess_mode().
+
+    Returns:
+        Payload: The reduced payload, or the whole pdf if it can not be reduced.
+    """
+    name, content, content_type = pdf
+    content_hash = hashlib.sha256(content).hexdigest()
+    whole = Payload("pdf", name, content, content_type, content_hash)
+    mode = mode or preprocess_mode()
+    if mode == "off":
+        return whole
+
+    executor = _get_executor()
+    try:
+        future = executor.submit(reduce_pdf, content, mode)
+        reduced = future.result(timeout=PDF_PREPROCESS_TIMEOUT)
+    except TimeoutError:
+        print("Error:", f"pdf preprocessing took longer than {PDF_PREPROCESS_TIMEOUT} seconds")
+        _reset_executor(executor, terminate=True)
+        return whole
+    except BrokenProcessPool as e:
+        print("Error:", "pdf preprocessing failed,", str(e))
+        _reset_executor(executor)
+        return whole
+    except ImportError as e:
+        print("Error:", "pdf preprocessing needs pypdf,", str(e))
+        return whole
+    except Exception as e:
+        print("Error:", "pdf preprocessing failed,", str(e))
+        return whole
+    if reduced is None or len(reduced[1]) >= len(content):
+        return whole
+
+    kind, reduced_content = reduced
+    if kind == "text":
+        return Payload("text", os.path.splitext(name)[0] + ".txt.gz", reduced_content, "text/plain", content_hash)
+    return Payload("pdf", name, reduced_content, content_type, content_hash)
@@ -0,0 +1,74 @@
+"""
+Searches large option sets on the server, so the form only sends the browser the options
+that match what the user typed instead of every option of every field.
+"""
+
+import re
+import threading
+from bisect import bisect_left
+
+from constants import *
+
+WORD_PATTERN = re.compile(r"\w+")
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _words(text):
+    return WORD_PATTERN.findall(text.casefold())
+
+
+class PrefixIndex:
+    """
+    A sorted list of the words of the options, an option matches a query when every word
+    of the query is a prefix of one of its words.
+    """
+
+    def __init__(self, options):
+        self.options = list(options)
+        self._words = sorted(
+            (word, i) for i, option in enumerate(self.options) for word in set(_words(option))
+        )
+        self._keys = [word for word, _ in self._words]
+
+    def _prefix(self, prefix):
+        matches = set()
+        for position in range(bisect_left(self._keys, prefix), len(self._keys)):
+            if not self._keys[position].startswith(prefix):
+                break
+            matches.add(self._words[position][1])
+        return matches
+
+    def search(self, query, limit=PICKER_MAX_MATCHES):
+        """
+        Returns the options matching a query, in the order of the options.
+
+        Args:
+            query (str): The words typed by the user, all options match an empty query.
+            limit (int): The maximum number of options returned.
+        """
+        words = _words(query)
+        if not words:
+            return self.options[:limit]
+        matches = None
+        for word in words:
+            found = self._prefix(word)
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+        return [self.options[i] for i in sorted(matches)[:limit]]
+
+
+def get_index(options) -> PrefixIndex:
+    """
+    Returns the index of an option set, built once per process.
+    """
+    key = tuple(options)
+    with _lock:
+        index = _indexes.get(key)
+    if index is None:
+        index = PrefixIndex(key)
+        with _lock:
+            _indexes[key] = index
+    return index
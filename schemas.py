@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from constants import *
+from breaker import CircuitOpen, get_breaker
+from journal import get_journal, input_hash, journal_mode
+from metrics import timed
+from validation import Validator
+
+# mode -> compiled schema
+_schemas = {}
+_schemas_lock = threading.Lock()
+_refresh_thread = None
+
+
+@timed("schema_fetch")
+def fetch_schema(mode: str) -> dict:
+    journal = get_journal()
+    key = input_hash(mode)
+    if journal_mode() == "replay":
+        schema = journal.lookup("schema", mode, key)
+        if schema is None:
+            raise RuntimeError(f"No recorded schema for {mode}.")
+        return schema
+
+    start = time.perf_counter()
+    try:
+        with get_breaker("bot").guard((requests.RequestException,)):
+            response = requests.post(
+                f"{MASADER_BOT_URL}/schema",
+                data={"name": mode},
+                timeout=(BOT_CONNECT_TIMEOUT, BOT_SCHEMA_TIMEOUT),
+            )
+            if response.status_code >= 500:
+                response.raise_for_status()
+    except (CircuitOpen, requests.RequestException) as e:
+        # the bot is down, serve the last schema it answered
+        schema = journal.lookup("schema", mode, key) if journal else None
+        if schema is None:
+            raise
+        print("Error:", f"using the last recorded {mode} schema,", str(e))
+        return schema
+    if journal:
+        latency = time.perf_counter() - start
+        if response.status_code == 200:
+            journal.record("schema", mode, key, latency, 200, response.json())
+        else:
+            journal.record("schema", mode, key, latency, response.status_code, None, error=response.text)
+    response.raise_for_status()
+    return response.json()
+
+
+def compile_schema(schema: dict) -> dict:
+    """
+    Precomputes the structures the form derives from a schema.
+
+    Args:
+        schema (dict): The schema returned by the bot.
+
+    Returns:
+        dict: The schema with its columns, types, lengths, required columns, evaluation subsets
+            and validator.
+    """
+    evaluation_subsets = {}
+    for c in schema:
+        if "validation_group" in schema[c]:
+            group = schema[c]["validation_group"]
+            if group not in evaluation_subsets:
+                evaluation_subsets[group] = []
+            evaluation_subsets[group].append(c)
+
+    validation_columns = []
+    for c in evaluation_subsets:
+        validation_columns += evaluation_subsets[c]
+
+    required_columns = []
+    for c in schema:
+        if (
+            "N=0" not in schema[c]["output_len"] and "N>=0" not in schema[c]["output_len"]
+        ):  # find required columns using N=0
+            required_columns.append(c)
+
+    return {
+        "schema": schema,
+        "columns": list(schema.keys()),
+        "column_types": {c: schema[c]["output_type"] for c in schema},
+        "column_lens": {c: schema[c]["output_len"] for c in schema},
+        "required_columns": required_columns,
+        "evaluation_subsets": evaluation_subsets,
+        "validation_columns": validation_columns,
+        "validator": Validator(schema, required_columns),
+    }
+
+
+def refresh_schemas(modes=MODES):
+    """
+    Fetches the schemas of all modes concurrently and swaps in the compiled ones.
+
+    A mode that fails to fetch keeps its previous compiled schema.
+    """
+    with ThreadPoolExecutor(max_workers=len(modes)) as executor:
+        futures = {mode: executor.submit(fetch_schema, mode) for mode in modes}
+    for mode, future in futures.items():
+        try:
+            compiled = compile_schema(future.result())
+        except Exception as e:
+            print("Error:", f"cannot fetch the {mode} schema", str(e))
+            continue
+        with _schemas_lock:
+            _schemas[mode] = compiled
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(SCHEMA_REFRESH_INTERVAL)
+        refresh_schemas()
+
+
+def start_schema_prefetch():
+    """
+    Prefetches all schemas once per process and keeps them fresh in the background.
+    """
+    global _refresh_thread
+    with _schemas_lock:
+        if _refresh_thread is not None:
+            return
+        _refresh_thread = threading.Thread(
+            target=_refresh_loop, name="schema-refresh", daemon=True
+        )
+    refresh_schemas()
+    _refresh_thread.start()
+
+
+def get_schema(mode: str) -> dict:
+    with _schemas_lock:
+        compiled = _schemas.get(mode)
+    if compiled is None:
+        compiled = compile_schema(fetch_schema(mode))
+        with _schemas_lock:
+            _schemas[mode] = compiled
+    return compiled
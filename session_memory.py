@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+
+from constants import *
+from metrics import Gauge
+from store import BlobStore, get_store
+
+HOT_BLOB_BYTES = Gauge(
+    "masader_hot_blob_bytes", "Bytes of blobs kept in memory across all sessions."
+)
+SESSION_BLOB_BYTES = Gauge(
+    "masader_session_blob_bytes", "Bytes of blobs referenced by live sessions."
+)
+
+
+class SessionMemory:
+    """
+    Accounts the large payloads (pdfs) each session references by handle.
+
+    Payloads are written to the disk-backed blob store, only the most recently used ones
+    are kept in memory, within `memory_budget` bytes for the whole process. A session
+    references at most `session_budget` bytes, its oldest payloads are released first,
+    and the payloads of sessions idle for `idle_ttl` seconds are evicted.
+    """
+
+    def __init__(
+        self,
+        blob_store,
+        memory_budget=SESSION_MEMORY_BUDGET,
+        session_budget=SESSION_BLOB_BUDGET,
+        idle_ttl=SESSION_IDLE_TTL,
+    ):
+        self.blob_store = blob_store
+        self.memory_budget = memory_budget
+        self.session_budget = session_budget
+        self.idle_ttl = idle_ttl
+        # session id -> {"handles": OrderedDict(handle -> size), "last_seen": time}
+        self._sessions = {}
+        self._hot = OrderedDict()
+        self._hot_bytes = 0
+        self._last_eviction = 0
+        self._lock = threading.Lock()
+
+    def _session(self, session_id):
+        if session_id not in self._sessions:
+            self._sessions[session_id] = {"handles": OrderedDict(), "last_seen": time.time()}
+        session = self._sessions[session_id]
+        session["last_seen"] = time.time()
+        return session
+
+    def _keep_hot(self, handle, data):
+        if handle in self._hot:
+            self._hot.move_to_end(handle)
+            return
+        if len(data) > self.memory_budget:
+            return
+        self._hot[handle] = data
+        self._hot_bytes += len(data)
+        while self._hot_bytes > self.memory_budget:
+            _, evicted = self._hot.popitem(last=False)
+            self._hot_bytes -= len(evicted)
+
+    def _is_referenced(self, handle):
+        return any(handle in s["handles"] for s in self._sessions.values())
+
+    def _drop(self, session_id, handle):
+        # the blob store keeps the payload while a session of another replica references it
+        self.blob_store.release(handle, session_id)
+        if self._is_referenced(handle):
+            return
+        data = self._hot.pop(handle, None)
+        if data is not None:
+            self._hot_bytes -= len(data)
+
+    def _update_gauges(self):
+        HOT_BLOB_BYTES.set(self._hot_bytes)
+        SESSION_BLOB_BYTES.set(
+            sum(sum(s["handles"].values()) for s in self._sessions.values())
+        )
+
+    def put(self, session_id, data: bytes) -> str:
+        handle = self.blob_store.put(data, session_id)
+        with self._lock:
+            session = self._session(session_id)
+            session["handles"][handle] = len(data)
+            session["handles"].move_to_end(handle)
+            self._keep_hot(handle, data)
+            while (
+                len(session["handles"]) > 1
+                and sum(session["handles"].values()) > self.session_budget
+            ):
+                oldest, _ = session["handles"].popitem(last=False)
+                self._drop(session_id, oldest)
+            self._update_gauges()
+        self.evict_idle()
+        return handle
+
+    def get(self, session_id, handle):
+        with self._lock:
+            self._session(session_id)
+            if handle in self._hot:
+                self._hot.move_to_end(handle)
+                return self._hot[handle]
+        data = self.blob_store.get(handle)
+        if data is not None:
+            with self._lock:
+                self._keep_hot(handle, data)
+                self._update_gauges()
+        return data
+
+    def release(self, session_id, handle):
+        with self._lock:
+            session = self._session(session_id)
+            if session["handles"].pop(handle, None) is not None:
+                self._drop(session_id, handle)
+            self._update_gauges()
+
+    def usage(self, session_id) -> int:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return sum(session["handles"].values()) if session else 0
+
+    def touch(self, session_id):
+        with self._lock:
+            self._session(session_id)
+        self.evict_idle()
+
+    def evict_idle(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_eviction < SESSION_EVICTION_INTERVAL:
+                return
+            self._last_eviction = now
+            idle = [
+                session_id
+                for session_id, session in self._sessions.items()
+                if now - session["last_seen"] > self.idle_ttl
+            ]
+            for session_id in idle:
+                handles = self._sessions.pop(session_id)["handles"]
+                for handle in handles:
+                    self._drop(session_id, handle)
+            self._update_gauges()
+
+
+_session_memory = None
+_session_memory_lock = threading.Lock()
+
+
+def get_session_memory() -> SessionMemory:
+    global _session_memory
+    with _session_memory_lock:
+        if _session_memory is None:
+            _session_memory = SessionMemory(BlobStore(get_store()))
+        return _session_memory
@@ -0,0 +1,100 @@
+import base64
+import hashlib
+import json
+import zlib
+
+from constants import SHARED_ID_LENGTH, SHARED_MAX_CONFIG_BYTES, SHARED_TTL
+from store import get_store
+
+
+def canonical_json(config: dict) -> str:
+    """
+    Serializes a config in a stable form, so equal configs give equal strings.
+
+    Args:
+        config (dict): The form config.
+
+    Returns:
+        str: The compact, key-sorted json string.
+    """
+    return json.dumps(config, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def config_hash(config: dict) -> str:
+    return hashlib.sha256(canonical_json(config).encode("utf-8")).hexdigest()
+
+
+def encode_config(config: dict) -> str:
+    """
+    Encodes a config into a url-safe string that can be used as a query parameter.
+
+    Args:
+        config (dict): The form config.
+
+    Returns:
+        str: The compressed, base64 encoded config.
+    """
+    compressed = zlib.compress(canonical_json(config).encode("utf-8"), 9)
+    return base64.urlsafe_b64encode(compressed).decode("ascii").rstrip("=")
+
+
+def decode_config(encoded: str) -> dict:
+    padding = "=" * (-len(encoded) % 4)
+    compressed = base64.urlsafe_b64decode(encoded + padding)
+    # a few bytes of a shared link must not inflate to gigabytes
+    decompressor = zlib.decompressobj()
+    data = decompressor.decompress(compressed, SHARED_MAX_CONFIG_BYTES)
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        raise ValueError(f"The shared config is larger than {SHARED_MAX_CONFIG_BYTES} bytes.")
+    return json.loads(data.decode("utf-8"))
+
+
+def store_config(config: dict) -> str:
+    """
+    Stores a config in the server cache and returns its short id.
+
+    Args:
+        config (dict): The form config.
+
+    Returns:
+        str: The content hash prefix used as the share id.
+    """
+    share_id = config_hash(config)[:SHARED_ID_LENGTH]
+    get_store().set("shared", share_id, canonical_json(config).encode("utf-8"), ttl=SHARED_TTL)
+    return share_id
+
+
+def load_shared_config(share_id: str):
+    if not share_id.isalnum():
+        return None
+    return get_store().get_json("shared", share_id.lower())
+
+
+def prefill_key(query_params):
+    """
+    Returns a key identifying the config referenced by the query parameters of a shared
+    link, None if there is none. It is cheap, so the config is only resolved when it changes.
+    """
+    if query_params.get("config"):
+        encoded = query_params["config"]
+        return "config:" + hashlib.sha256(encoded.encode("ascii")).hexdigest()[:SHARED_ID_LENGTH]
+    if query_params.get("id"):
+        return f"id:{query_params['id']}"
+    return None
+
+
+def resolve_prefill(query_params):
+    """
+    Resolves the config referenced by the query parameters of a shared link.
+
+    Args:
+        query_params: The page query parameters.
+
+    Returns:
+        dict: The config, None if there is none or it has expired.
+    """
+    if query_params.get("config"):
+        return decode_config(query_params["config"])
+    if query_params.get("id"):
+        return load_shared_config(query_params["id"])
+    return None
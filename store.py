@@ -0,0 +1,285 @@
+"""
+Shared state of the app behind a pluggable key-value store.
+
+The backend is chosen with the MASADER_STORE_URL environment variable:
+    sqlite:///.cache/state.db   a SQLite file, for a single node (the default)
+    http://host:port            a network key-value service, shared by every replica
+
+Values are bytes grouped in namespaces, the helpers below keep the pull request
+registry, the pdf blobs, the share links, the jobs and the caches in separate namespaces.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from urllib.parse import quote
+
+import requests
+
+from constants import *
+
+
+class Store(ABC):
+    @abstractmethod
+    def get(self, namespace: str, key: str):
+        """Returns the value of a key, None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: bytes, ttl=None):
+        pass
+
+    @abstractmethod
+    def add(self, namespace: str, key: str, value: bytes, ttl=None) -> bool:
+        """Sets a key only if it is missing, returns True if it was set."""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        pass
+
+    @abstractmethod
+    def items(self, namespace: str):
+        """Returns the (key, value) pairs of a namespace."""
+
+    def get_json(self, namespace, key):
+        value = self.get(namespace, key)
+        return None if value is None else json.loads(value)
+
+    def set_json(self, namespace, key, value, ttl=None):
+        self.set(namespace, key, json.dumps(value).encode("utf-8"), ttl=ttl)
+
+    def add_json(self, namespace, key, value, ttl=None) -> bool:
+        return self.add(namespace, key, json.dumps(value).encode("utf-8"), ttl=ttl)
+
+
+class SQLiteStore(Store):
+    """
+    Expired rows are invisible to reads and purged by the writes every
+    `purge_interval` seconds.
+    """
+
+    def __init__(self, path, purge_interval=STORE_PURGE_INTERVAL):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.purge_interval = purge_interval
+        self._last_purge = time.time()
+        self._purge_lock = threading.Lock()
+        self._local = threading.local()
+        self._db().execute(
+            """CREATE TABLE IF NOT EXISTS kv (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        self._db().execute("CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at)")
+
+    def _db(self):
+        # sqlite connections cannot be shared between threads
+        if not hasattr(self._local, "db"):
+            self._local.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.db.execute("PRAGMA journal_mode=WAL")
+        return self._local.db
+
+    def purge(self) -> int:
+        """Deletes the expired rows, returns their number."""
+        cursor = self._db().execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+    def _maybe_purge(self):
+        now = time.time()
+        with self._purge_lock:
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        try:
+            self.purge()
+        except sqlite3.Error as e:
+            print("Error:", "cannot purge the expired rows of the store", str(e))
+
+    def get(self, namespace, key):
+        row = self._db().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def set(self, namespace, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        self._db().execute(
+            "INSERT OR REPLACE INTO kv VALUES (?, ?, ?, ?)", (namespace, key, value, expires_at)
+        )
+        self._maybe_purge()
+
+    def add(self, namespace, key, value, ttl=None):
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "DELETE FROM kv WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                (namespace, key, now),
+            )
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO kv VALUES (?, ?, ?, ?)",
+                (namespace, key, value, now + ttl if ttl else None),
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self._maybe_purge()
+        return cursor.rowcount == 1
+
+    def delete(self, namespace, key):
+        self._db().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def items(self, namespace):
+        rows = self._db().execute(
+            "SELECT key, value FROM kv WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time()),
+        )
+        return [(key, bytes(value)) for key, value in rows]
+
+
+class HTTPStore(Store):
+    """
+    A client of a network key-value service with the following protocol:
+        GET    /kv/<namespace>/<key>   200 with the value, 404 if missing
+        PUT    /kv/<namespace>/<key>   stores the body, X-TTL sets the expiry in seconds,
+                                       If-None-Match: * only stores a missing key (412 otherwise)
+        DELETE /kv/<namespace>/<key>
+        GET    /kv/<namespace>         200 with a json object of keys to hex values
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+
+    def _url(self, namespace, key=None):
+        url = f"{self.url}/kv/{quote(namespace, safe='')}"
+        return url if key is None else f"{url}/{quote(key, safe='')}"
+
+    def get(self, namespace, key):
+        response = self.session.get(self._url(namespace, key), timeout=STORE_TIMEOUT)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    def _put(self, namespace, key, value, ttl, only_missing):
+        headers = {"X-TTL": str(ttl)} if ttl else {}
+        if only_missing:
+            headers["If-None-Match"] = "*"
+        return self.session.put(
+            self._url(namespace, key), data=value, headers=headers, timeout=STORE_TIMEOUT
+        )
+
+    def set(self, namespace, key, value, ttl=None):
+        self._put(namespace, key, value, ttl, only_missing=False).raise_for_status()
+
+    def add(self, namespace, key, value, ttl=None):
+        response = self._put(namespace, key, value, ttl, only_missing=True)
+        if response.status_code == 412:
+            return False
+        response.raise_for_status()
+        return True
+
+    def delete(self, namespace, key):
+        response = self.session.delete(self._url(namespace, key), timeout=STORE_TIMEOUT)
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    def items(self, namespace):
+        response = self.session.get(self._url(namespace), timeout=STORE_TIMEOUT)
+        response.raise_for_status()
+        return [(key, bytes.fromhex(value)) for key, value in response.json().items()]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Store:
+    global _store
+    with _store_lock:
+        if _store is None:
+            url = os.getenv("MASADER_STORE_URL", STORE_URL)
+            if url.startswith("sqlite:///"):
+                _store = SQLiteStore(url[len("sqlite:///") :])
+            elif url.startswith(("http://", "https://")):
+                _store = HTTPStore(url)
+            else:
+                raise ValueError(f"Unknown store url {url}")
+        return _store
+
+
+class PRRegistry:
+    """
+    The pull requests created by the form, one key per branch so replicas do not
+    overwrite each other's updates.
+    """
+
+    namespace = "prs"
+
+    def __init__(self, store):
+        self.store = store
+
+    def all(self) -> list:
+        prs = [json.loads(value) for _, value in self.store.items(self.namespace)]
+        return sorted(prs, key=lambda pr: pr["number"])
+
+    def get(self, branch):
+        return self.store.get_json(self.namespace, branch)
+
+    def save(self, pr):
+        self.store.set_json(self.namespace, pr["branch"], pr)
+
+    def import_json(self, path):
+        # one-off migration of the prs.json of older deployments
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            for pr in json.load(f):
+                if self.get(pr["branch"]) is None:
+                    self.save(pr)
+
+
+class BlobStore:
+    """
+    Content-addressed blobs (pdfs), referenced by the sha256 of their content.
+
+    Every owner (a session) of a blob has a reference key in the shared store, so a blob
+    is only deleted once no session of any replica references it.
+    """
+
+    namespace = "blobs"
+    refs_namespace = "blob_refs"
+
+    def __init__(self, store, ttl=BLOB_TTL):
+        self.store = store
+        self.ttl = ttl
+
+    def put(self, data: bytes, owner: str) -> str:
+        handle = hashlib.sha256(data).hexdigest()
+        # the reference first, a concurrent release then sees it and keeps the blob
+        self.store.set(self.refs_namespace, f"{handle}/{owner}", b"", ttl=self.ttl)
+        self.store.set(self.namespace, handle, data, ttl=self.ttl)
+        return handle
+
+    def get(self, handle: str):
+        return self.store.get(self.namespace, handle)
+
+    def release(self, handle: str, owner: str):
+        """
+        Drops the reference of an owner, and the blob if it was the last one.
+        """
+        self.store.delete(self.refs_namespace, f"{handle}/{owner}")
+        if not any(key.startswith(f"{handle}/") for key, _ in self.store.items(self.refs_namespace)):
+            self.store.delete(self.namespace, handle)
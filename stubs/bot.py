@@ -0,0 +1,147 @@
+"""
+A local stand-in for the masader bot, serving /schema, /run and /run/text.
+
+Usage:
+    python -m stubs.bot --port 8080 --field-delay 0.5 --latency 2 --payload-size 100000
+
+--latency delays the start of every /run answer, --payload-size pads the description of
+the answer to about that many bytes. A streamed extraction of the link ERROR_LINK fails
+with an error event after its first field.
+
+Then run the app with MASADER_BOT_URL=http://0.0.0.0:8080.
+"""
+
+import argparse
+import gzip
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from constants import NDJSON_CONTENT_TYPE
+
+SCHEMA = {
+    "Name": {"question": "What is the name of the dataset?", "output_type": "str", "output_len": "1<=N<=5", "validation_group": "DIVERSITY"},
+    "Subsets": {"question": "What are the dialect subsets of the dataset?", "output_type": "List[Dict[Name, Volume, Unit, Dialect]]", "output_len": "N>=0", "validation_group": "DIVERSITY"},
+    "Link": {"question": "What is the link to the dataset?", "output_type": "url", "output_len": "N=1", "validation_group": "ACCESSABILITY"},
+    "HF Link": {"question": "What is the Huggingface link of the dataset?", "output_type": "url", "output_len": "N=0", "validation_group": "ACCESSABILITY"},
+    "License": {"question": "What is the license of the dataset?", "output_type": "str", "output_len": "N=1", "options": ["Apache-2.0", "CC BY 4.0", "MIT", "custom", "unknown"], "validation_group": "ACCESSABILITY"},
+    "Year": {"question": "What year was the dataset published?", "output_type": "date[year]", "output_len": "N=1", "validation_group": "CONTENT"},
+    "Dialect": {"question": "What is the dialect of the dataset?", "output_type": "str", "output_len": "N=1", "options": ["Levant", "Jordan", "Palestine", "Syria", "Lebanon", "mixed"], "validation_group": "DIVERSITY"},
+    "Volume": {"question": "What is the size of the dataset?", "output_type": "float", "output_len": "N=1", "validation_group": "CONTENT"},
+    "Unit": {"question": "What kind of examples does the dataset include?", "output_type": "str", "output_len": "N=1", "options": ["tokens", "sentences", "documents", "hours", "images"], "validation_group": "CONTENT"},
+    "Tasks": {"question": "What are the tasks of the dataset?", "output_type": "List[str]", "output_len": "1<=N<=5", "options": ["dialect identification", "machine translation", "sentiment analysis", "other"], "validation_group": "CONTENT"},
+    "Description": {"question": "Describe the dataset.", "output_type": "str", "output_len": "N>50", "validation_group": "CONTENT"},
+    "Paper Title": {"question": "What is the title of the paper?", "output_type": "str", "output_len": "N=1"},
+    "Paper Link": {"question": "What is the link to the paper?", "output_type": "url", "output_len": "N=1"},
+}
+
+ERROR_LINK = "https://stub.invalid/error"
+
+METADATA = {
+    "Name": "Shami",
+    "Subsets": [
+        {"Name": "Jordanian", "Volume": 32078.0, "Unit": "sentences", "Dialect": "Jordan"},
+        {"Name": "Syrian", "Volume": 48159.0, "Unit": "sentences", "Dialect": "Syria"},
+    ],
+    "Link": "https://github.com/GU-CLASP/shami-corpus",
+    "HF Link": "https://hf.co/datasets/arbml/Shami",
+    "License": "Apache-2.0",
+    "Year": 2018,
+    "Dialect": "Levant",
+    "Volume": 117805.0,
+    "Unit": "sentences",
+    "Tasks": ["dialect identification"],
+    "Description": "the first Levantine Dialect Corpus covering data from the four dialects spoken in Palestine, Jordan, Lebanon and Syria.",
+    "Paper Title": "Shami: A Corpus of Levantine Arabic Dialects",
+    "Paper Link": "https://aclanthology.org/L18-1576.pdf",
+}
+
+
+class BotHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    field_delay = 0.0
+    latency = 0.0
+    payload_size = 0
+
+    def _metadata(self):
+        padding = self.payload_size - len(json.dumps(METADATA))
+        if padding <= 0:
+            return METADATA
+        description = METADATA["Description"]
+        return dict(METADATA, Description=(description + " ") * (padding // (len(description) + 1) + 1))
+
+    def _send_json(self, body):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _stream_metadata(self, fail=False):
+        self.send_response(200)
+        self.send_header("Content-Type", NDJSON_CONTENT_TYPE)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for field, value in self._metadata().items():
+            time.sleep(self.field_delay)
+            self._write_chunk(json.dumps({"field": field, "value": value}) + "\n")
+            if fail:
+                self._write_chunk(json.dumps({"error": "Cannot read the paper."}) + "\n")
+                break
+        self._write_chunk("")
+
+    def _write_chunk(self, text):
+        content = text.encode("utf-8")
+        self.wfile.write(f"{len(content):x}\r\n".encode("ascii") + content + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = urlsplit(self.path).path
+        if path == "/run/text" and self.headers.get("Content-Encoding") == "gzip":
+            gzip.decompress(body)
+        if path == "/schema":
+            self._send_json(SCHEMA)
+        elif path in ["/run", "/run/text"]:
+            time.sleep(self.latency)
+            if NDJSON_CONTENT_TYPE in self.headers.get("Accept", ""):
+                form = {}
+                if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                    form = parse_qs(body.decode("utf-8"))
+                self._stream_metadata(fail=form.get("link") == [ERROR_LINK])
+            else:
+                time.sleep(self.field_delay * len(METADATA))
+                self._send_json({"metadata": self._metadata()})
+        else:
+            self.send_error(404)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="0.0.0.0", port=8080, field_delay=0.0, latency=0.0, payload_size=0):
+    handler = type(
+        "Handler",
+        (BotHandler,),
+        {"field_delay": field_delay, "latency": latency, "payload_size": payload_size},
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host="0.0.0.0", port=8080, field_delay=0.0, latency=0.0, payload_size=0):
+    make_server(host, port, field_delay, latency, payload_size).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--field-delay", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--payload-size", type=int, default=0)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.field_delay, args.latency, args.payload_size)
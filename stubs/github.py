@@ -0,0 +1,218 @@
+"""
+A local stand-in for the GitHub REST API and the catalogue repository, backed by a bare
+git repository that the app clones from and pushes to.
+
+Paths:
+    GET  /users/<username>                      200, 404 for usernames starting with "missing"
+    GET  /repos/<owner>/<repo>                  the repository, its default branch is main
+    GET  /repos/<owner>/<repo>/pulls/<number>
+    POST /repos/<owner>/<repo>/pulls            422 if an open pull request has the same head
+    GET  /repos/<owner>/<repo>/contents/<path>  ?ref=<branch>, read from the bare repository,
+                                                with the blob sha as ETag
+    GET  /raw/<branch>/<path>                   the raw file, like raw.githubusercontent.com
+    GET  /rate_limit
+    HEAD on any of the above, so stub urls pass the link checks of the form
+
+Usage:
+    python -m stubs.github --port 8083 --remote /tmp/masader.git --latency 0.05
+
+Then run the app with MASADER_GITHUB_API_URL=http://0.0.0.0:8083 and
+MASADER_GH_REMOTE_URL=file:///tmp/masader.git. The remote is created with the
+shami dataset of stubs.bot if it does not exist.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from stubs.bot import METADATA
+
+
+def _git(*args, cwd=None):
+    return subprocess.run(
+        ["git", *args], cwd=cwd, check=True, capture_output=True
+    ).stdout
+
+
+def make_remote(path, datasets=None):
+    """
+    Creates a bare repository with a main branch holding datasets/<name>.json files.
+
+    Args:
+        path (str): The directory of the bare repository.
+        datasets (dict): The file names and configs of the datasets, the shami dataset by default.
+    """
+    datasets = datasets or {"shami": METADATA}
+    _git("init", "--bare", "--initial-branch=main", path)
+    with tempfile.TemporaryDirectory() as work:
+        _git("clone", path, work)
+        os.makedirs(os.path.join(work, "datasets"))
+        for name, config in datasets.items():
+            with open(os.path.join(work, "datasets", f"{name}.json"), "w") as f:
+                json.dump(config, f, indent=4)
+        _git("add", "datasets", cwd=work)
+        _git(
+            "-c", "user.name=stub", "-c", "user.email=stub@localhost",
+            "commit", "-m", "Initial catalogue", cwd=work,
+        )
+        _git("push", "origin", "HEAD:main", cwd=work)
+
+
+class GitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    remote = None
+    latency = 0.0
+    pulls = {}
+    lock = threading.Lock()
+    requests_made = [0]
+
+    def _send_json(self, status, body, etag=None):
+        content = json.dumps(body).encode("utf-8")
+        with self.lock:
+            self.requests_made[0] += 1
+            remaining = max(1000, 5000 - self.requests_made[0])
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            status, content = 304, b""
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-RateLimit-Limit", "5000")
+        self.send_header("X-RateLimit-Remaining", str(remaining))
+        self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(content)
+
+    def _send_raw(self, status, content):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(content)
+
+    def _read_file(self, ref, path):
+        try:
+            return _git("--git-dir", self.remote, "show", f"{ref}:{path}")
+        except subprocess.CalledProcessError:
+            return None
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlsplit(self.path)
+        path = url.path
+        if path == "/rate_limit":
+            core = {"limit": 5000, "remaining": 5000, "reset": int(time.time()) + 3600}
+            self._send_json(200, {"resources": {"core": core}, "rate": core})
+        elif match := re.fullmatch(r"/users/([^/]+)", path):
+            if match.group(1).startswith("missing"):
+                self._send_json(404, {"message": "Not Found"})
+            else:
+                self._send_json(200, {"login": match.group(1)})
+        elif match := re.fullmatch(r"/repos/([^/]+/[^/]+)", path):
+            self._send_json(200, {"full_name": match.group(1), "default_branch": "main"})
+        elif match := re.fullmatch(r"/repos/[^/]+/[^/]+/pulls/(\d+)", path):
+            with self.lock:
+                pull = self.pulls.get(int(match.group(1)))
+            if pull is None:
+                self._send_json(404, {"message": "Not Found"})
+            else:
+                self._send_json(200, pull)
+        elif match := re.fullmatch(r"/repos/[^/]+/[^/]+/contents/(.+)", path):
+            ref = parse_qs(url.query).get("ref", ["main"])[0]
+            content = self._read_file(ref, match.group(1))
+            if content is None:
+                self._send_json(404, {"message": "Not Found"})
+            else:
+                sha = hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+                self._send_json(
+                    200,
+                    {
+                        "path": match.group(1),
+                        "sha": sha,
+                        "encoding": "base64",
+                        "content": base64.b64encode(content).decode("ascii"),
+                    },
+                    etag=f'"{sha}"',
+                )
+        elif match := re.fullmatch(r"/raw/([^/]+)/(.+)", path):
+            content = self._read_file(match.group(1), match.group(2))
+            if content is None:
+                self._send_raw(404, b"404: Not Found")
+            else:
+                self._send_raw(200, content)
+        else:
+            self._send_json(404, {"message": "Not Found"})
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        match = re.fullmatch(r"/repos/([^/]+/[^/]+)/pulls", urlsplit(self.path).path)
+        if match is None:
+            self._send_json(404, {"message": "Not Found"})
+            return
+        with self.lock:
+            if any(p["head"]["ref"] == body["head"] and p["state"] == "open" for p in self.pulls.values()):
+                pull = None
+            else:
+                number = len(self.pulls) + 1
+                pull = {
+                    "number": number,
+                    "state": "open",
+                    "title": body["title"],
+                    "head": {"ref": body["head"]},
+                    "base": {"ref": body["base"]},
+                    "html_url": f"https://github.com/{match.group(1)}/pull/{number}",
+                }
+                self.pulls[number] = pull
+        if pull is None:
+            self._send_json(422, {"message": "A pull request already exists."})
+        else:
+            self._send_json(201, pull)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="0.0.0.0", port=8083, remote=None, latency=0.0):
+    if not os.path.exists(remote):
+        make_remote(remote)
+    handler = type(
+        "Handler",
+        (GitHubHandler,),
+        {
+            "remote": remote,
+            "latency": latency,
+            "pulls": {},
+            "lock": threading.Lock(),
+            "requests_made": [0],
+        },
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host="0.0.0.0", port=8083, remote=None, latency=0.0):
+    make_server(host, port, remote, latency).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8083)
+    parser.add_argument("--remote", default=os.path.join(tempfile.gettempdir(), "masader.git"))
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.remote, args.latency)
@@ -0,0 +1,93 @@
+"""
+A local, in-memory stand-in for the network key-value service of store.HTTPStore.
+
+Usage:
+    python -m stubs.kvstore --port 8082
+
+Then run the app with MASADER_STORE_URL=http://0.0.0.0:8082.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+
+class KVHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    data = {}
+    lock = threading.Lock()
+
+    def _path(self):
+        parts = [unquote(part) for part in self.path.split("/")[2:]]
+        return parts[0], parts[1] if len(parts) > 1 else None
+
+    def _live(self, namespace, key):
+        entry = self.data.get((namespace, key))
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self.data[(namespace, key)]
+            return None
+        return entry
+
+    def _send(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        namespace, key = self._path()
+        with self.lock:
+            if key is None:
+                items = {}
+                for (ns, k) in list(self.data):
+                    entry = self._live(ns, k)
+                    if ns == namespace and entry:
+                        items[k] = entry[0].hex()
+                self._send(200, json.dumps(items).encode("utf-8"))
+                return
+            entry = self._live(namespace, key)
+        if entry is None:
+            self._send(404)
+        else:
+            self._send(200, entry[0])
+
+    def do_PUT(self):
+        namespace, key = self._path()
+        value = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        ttl = self.headers.get("X-TTL")
+        expires_at = time.time() + float(ttl) if ttl else None
+        with self.lock:
+            if self.headers.get("If-None-Match") == "*" and self._live(namespace, key):
+                self._send(412)
+                return
+            self.data[(namespace, key)] = (value, expires_at)
+        self._send(204)
+
+    def do_DELETE(self):
+        namespace, key = self._path()
+        with self.lock:
+            existed = self.data.pop((namespace, key), None) is not None
+        self._send(204 if existed else 404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="0.0.0.0", port=8082):
+    handler = type("Handler", (KVHandler,), {"data": {}, "lock": threading.Lock()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host="0.0.0.0", port=8082):
+    make_server(host, port).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8082)
+    args = parser.parse_args()
+    serve(args.host, args.port)
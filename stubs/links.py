@@ -0,0 +1,85 @@
+"""
+A local stand-in for the hosts of catalogue links, to run the link crawler offline.
+
+Paths:
+    /ok/<id>        200
+    /dead/<id>      404
+    /no-head/<id>   405 for HEAD, 200 for GET
+    /redirect/<id>  301 to /ok/<id>
+    /chain/<n>/<id> 301 to /chain/<n - 1>/<id>, /chain/0/<id> is /ok/<id>
+    /loop/<id>      301 to itself
+    /cycle/a/<id>   301 to /cycle/b/<id>, which redirects back
+
+Usage:
+    python -m stubs.links --port 8081 --latency 0.05
+"""
+
+import argparse
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LinksHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+
+    def _respond(self, include_body):
+        time.sleep(self.latency)
+        parts = self.path.strip("/").split("/")
+        kind = parts[0]
+        location = None
+        if kind == "redirect":
+            location = "/ok/" + "/".join(parts[1:])
+        elif kind == "chain":
+            remaining = int(parts[1])
+            rest = "/".join(parts[2:])
+            location = f"/chain/{remaining - 1}/{rest}" if remaining > 0 else f"/ok/{rest}"
+        elif kind == "loop":
+            location = self.path
+        elif kind == "cycle":
+            other = "b" if parts[1] == "a" else "a"
+            location = f"/cycle/{other}/" + "/".join(parts[2:])
+        if location is not None:
+            self.send_response(301)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if kind == "no-head" and not include_body:
+            status = 405
+        else:
+            status = {"ok": 200, "no-head": 200}.get(kind, 404)
+        body = b"ok" if status == 200 else b"not found"
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._respond(include_body=False)
+
+    def do_GET(self):
+        self._respond(include_body=True)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="0.0.0.0", port=8081, latency=0.0):
+    handler = type("Handler", (LinksHandler,), {"latency": latency})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host="0.0.0.0", port=8081, latency=0.0):
+    make_server(host, port, latency).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.latency)
@@ -0,0 +1,134 @@
+"""
+Runs every submission once, however many times it is sent.
+
+A submission is keyed by the hash of its canonical config and the GitHub username. A
+duplicate sent while the submission runs (a double click, a rerun) waits for it and gets
+its result, and the results are kept in the store for SUBMISSION_RESULT_TTL seconds so a
+duplicate sent shortly after gets the result without cloning and pushing again.
+
+The running submissions are claimed in the store, so replicas sharing the store run a
+submission once too, the claim expires after SUBMISSION_LEASE seconds if its replica dies.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+from constants import *
+from metrics import Counter
+from share import config_hash
+from store import get_store
+
+SUBMISSIONS_DEDUPLICATED = Counter(
+    "masader_submissions_deduplicated_total", "Duplicate submissions answered with a known result."
+)
+
+
+class SubmissionPending(Exception):
+    pass
+
+
+def idempotency_key(config: dict, username: str) -> str:
+    return config_hash({"config": config, "username": username.strip().lower()})
+
+
+class Submissions:
+    namespace = "submissions"
+
+    def __init__(self, store, ttl=SUBMISSION_RESULT_TTL, lease=SUBMISSION_LEASE):
+        self.store = store
+        self.ttl = ttl
+        self.lease = lease
+        # key -> Future of the submissions running in this process
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def _done(self, key):
+        entry = self.store.get_json(self.namespace, key)
+        if entry is not None and entry["state"] == "done":
+            return entry
+        return None
+
+    def _release(self, key):
+        try:
+            self.store.delete(self.namespace, key)
+        except Exception as e:
+            print("Error:", "cannot release the claim of a submission", str(e))
+
+    def _finish(self, key, result):
+        try:
+            self.store.set_json(self.namespace, key, {"state": "done", "result": result}, ttl=self.ttl)
+        except Exception as e:
+            print("Error:", "cannot save the result of a submission", str(e))
+            # without its result the claim would hold the resends for the whole lease
+            self._release(key)
+
+    def run(self, key: str, submit):
+        """
+        Runs a submission unless it is running or ran recently.
+
+        Args:
+            key (str): The idempotency key of the submission.
+            submit (callable): Runs the submission, returns a json serializable result.
+
+        Returns:
+            tuple: The result, and True if it is the result of an earlier submission.
+
+        Raises:
+            SubmissionPending: If another replica runs the submission for longer than SUBMISSION_WAIT.
+        """
+        done = self._done(key)
+        if done is not None:
+            SUBMISSIONS_DEDUPLICATED.inc(source="store")
+            return done["result"], True
+
+        with self._lock:
+            future = self._running.get(key)
+            owner = future is None
+            if owner:
+                future = self._running[key] = Future()
+        if not owner:
+            SUBMISSIONS_DEDUPLICATED.inc(source="running")
+            return future.result(timeout=SUBMISSION_WAIT), True
+
+        try:
+            deadline = time.time() + SUBMISSION_WAIT
+            while not self.store.add_json(self.namespace, key, {"state": "running"}, ttl=self.lease):
+                # another replica runs it, or finished it meanwhile
+                done = self._done(key)
+                if done is not None:
+                    SUBMISSIONS_DEDUPLICATED.inc(source="store")
+                    future.set_result(done["result"])
+                    return done["result"], True
+                if time.time() > deadline:
+                    raise SubmissionPending("The same submission is still running, please wait.")
+                time.sleep(SUBMISSION_POLL_INTERVAL)
+
+            try:
+                result = submit()
+            except BaseException:
+                # a failed submission can be sent again right away
+                self._release(key)
+                raise
+            self._finish(key, result)
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+
+
+_submissions = None
+_submissions_lock = threading.Lock()
+
+
+def get_submissions() -> Submissions:
+    global _submissions
+    with _submissions_lock:
+        if _submissions is None:
+            _submissions = Submissions(get_store())
+        return _submissions
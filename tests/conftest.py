@@ -0,0 +1,84 @@
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import loadtest
+
+# before any test imports constants, the app reads the service urls on import
+WORKDIR = tempfile.mkdtemp(prefix="masader-tests-")
+BOT_PORT, GITHUB_PORT, REMOTE = loadtest.stub_environment(WORKDIR)
+
+
+@pytest.fixture
+def serve():
+    """
+    Runs stub servers in background threads, returns their base urls.
+    """
+    servers = []
+
+    def start(server):
+        servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope="session")
+def services():
+    """
+    Runs the bot and GitHub stubs the app is configured with, returns the GitHub url.
+    """
+    from stubs import bot, github
+
+    servers = [
+        bot.make_server("127.0.0.1", BOT_PORT),
+        github.make_server("127.0.0.1", GITHUB_PORT, remote=REMOTE),
+    ]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{GITHUB_PORT}"
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def app(services):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    at.run()
+    assert not at.exception
+    return at
+
+
+_session_numbers = itertools.count(1)
+
+
+@pytest.fixture
+def session(services):
+    """
+    Runs a flow of the form up to its submission like the load test, returns the session.
+    """
+
+    def run(flow):
+        args = argparse.Namespace(app=os.path.join(ROOT, "app.py"), timeout=60)
+        session = loadtest.Session(next(_session_numbers), flow, args, services)
+        session.run()
+        return session
+
+    return run
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+LIMITS = {"extract": {"rate": 1 / 3600, "burst": 2, "max_concurrent": 1, "max_queue": 0, "queue_timeout": 0.05}}
+
+
+def test_rate_limited_per_key():
+    controller = AdmissionController(LIMITS)
+    for _ in range(2):
+        with controller.admit("extract", ["user:a", "session:1"]):
+            pass
+    with pytest.raises(AdmissionRejected) as rejected:
+        with controller.admit("extract", ["user:a", "session:2"]):
+            pass
+    assert rejected.value.wait > 0
+    # another user is not charged
+    with controller.admit("extract", ["user:b", "session:3"]):
+        pass
+
+
+def test_burst_of_one_admits_the_first_request():
+    controller = AdmissionController({"extract": dict(LIMITS["extract"], burst=1)})
+    with controller.admit("extract", ["session:1"]):
+        pass
+    with pytest.raises(AdmissionRejected):
+        with controller.admit("extract", ["session:1"]):
+            pass
+
+
+def test_saturation_does_not_use_the_quota():
+    controller = AdmissionController(LIMITS)
+    running, done = threading.Event(), threading.Event()
+
+    def hold():
+        with controller.admit("extract", ["user:holder"]):
+            running.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    running.wait(5)
+    for _ in range(3):
+        with pytest.raises(AdmissionRejected, match="busy"):
+            with controller.admit("extract", ["user:a"]):
+                pass
+    done.set()
+    thread.join(5)
+    # the rejected requests left the whole burst
+    for _ in range(2):
+        with controller.admit("extract", ["user:a"]):
+            pass
+
+
+def test_slot_released_on_error():
+    controller = AdmissionController(LIMITS)
+    with pytest.raises(RuntimeError):
+        with controller.admit("extract", ["user:a"]):
+            raise RuntimeError
+    with controller.admit("extract", ["user:b"]):
+        pass
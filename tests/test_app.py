@@ -0,0 +1,308 @@
+from stubs.bot import METADATA
+
+
+def test_extraction_shows_fields_as_they_stream(app):
+    app.selectbox[1].set_value("🤖 AI Annotation").run()
+    app.text_input(key="paper_url").set_value("https://arxiv.org/abs/1801.00001").run()
+    assert not app.exception
+
+    # one line per field, in the order the bot streamed them
+    streamed = [text.value for text in app.text if text.value.startswith("✅")]
+    assert [line[2:].split(":")[0] for line in streamed] == list(METADATA)
+    assert "✅ Name: Shami" in streamed
+    assert "✅ Tasks: dialect identification" in streamed
+    assert "✅ Subsets: 2 rows" in streamed
+    # and the form is filled with the streamed values
+    assert app.text_input(key="Name").value == "Shami"
+
+
+def test_extraction_timed_once(app):
+    from metrics import STAGE_SECONDS
+
+    def extractions():
+        sample = STAGE_SECONDS._values.get((("stage", "get_metadata"),))
+        return sample[2] if sample else 0
+
+    before = extractions()
+    app.selectbox[1].set_value("🤖 AI Annotation").run()
+    app.text_input(key="paper_url").set_value("https://arxiv.org/abs/1801.00002").run()
+    assert not app.exception
+    assert extractions() == before + 1
+
+
+def test_default_username_sessions_do_not_share_tokens(services, monkeypatch):
+    import admission
+    from constants import ADMISSION_LIMITS
+    from streamlit.testing.v1 import AppTest
+
+    from conftest import ROOT
+
+    limits = dict(ADMISSION_LIMITS, extract=dict(ADMISSION_LIMITS["extract"], rate=1 / 3600, burst=1))
+    monkeypatch.setattr(admission, "admission", admission.AdmissionController(limits))
+
+    def extract(at, url):
+        at.selectbox[1].set_value("🤖 AI Annotation").run()
+        # the username field as the form leaves it
+        at.session_state["gh_username"] = "zaidalyafeai"
+        at.text_input(key="paper_url").set_value(url).run()
+        assert not at.exception
+        return [w.value for w in at.warning]
+
+    first, second = [AppTest.from_file(f"{ROOT}/app.py", default_timeout=60) for _ in range(2)]
+    for at in [first, second]:
+        at.run()
+    assert not any("try again" in w for w in extract(first, "https://arxiv.org/abs/1801.00003"))
+    assert not any("try again" in w for w in extract(second, "https://arxiv.org/abs/1801.00004"))
+    # the session itself is still limited
+    first.text_input(key="paper_url").set_value("https://arxiv.org/abs/1801.00005").run()
+    assert any("try again" in w.value for w in first.warning)
+
+
+def test_zip_download_not_kept_in_the_session(app):
+    app.selectbox[1].set_value("🦚 Manual Annotation").run()
+    app.session_state["downloads"] = [dict(METADATA, Name=f"Export {i}") for i in range(3)]
+    app.run()
+    assert not app.exception
+    labels = [button.proto.label for button in app.get("download_button")]
+    assert "🗂️ Save all 3 annotations (zip)" in labels
+    assert "downloads_zip" not in app.session_state
+
+
+def test_missing_annotation_shows_an_error(services, app):
+    app.selectbox[1].set_value("🚥 Load Annotation").run()
+    path = [t for t in app.text_input if t.label == "Path to json"][0]
+    link = f"{services}/raw/main/datasets/no_such_dataset.json"
+    path.set_value(link).run()
+    assert not app.exception
+    assert [e.value for e in app.error] == [
+        f"Cannot load the annotation from {link}, please check the name or the link."
+    ]
+
+
+def shared_app(**params):
+    from streamlit.testing.v1 import AppTest
+
+    from conftest import ROOT
+
+    at = AppTest.from_file(f"{ROOT}/app.py", default_timeout=60)
+    for name, value in params.items():
+        at.query_params[name] = value
+    at.run()
+    assert not at.exception
+    return at
+
+
+def test_shared_link_of_an_older_schema(services):
+    from share import encode_config
+
+    config = {key: value for key, value in METADATA.items() if key != "Tasks"}
+    config["Removed Column"] = "x"
+    config["Subsets"] = [dict(METADATA["Subsets"][0], Extra="y"), "not a row"]
+    at = shared_app(config=encode_config(config))
+    assert not at.error
+    assert at.session_state["Name"] == "Shami"
+    assert at.session_state["Subsets_0_Dialect"] == "Jordan"
+    assert "Subsets_0_Extra" not in at.session_state
+
+
+def test_shared_link_of_another_schema(services):
+    from share import encode_config
+
+    at = shared_app(config=encode_config({"Name": "Shami"}), mode="en")
+    assert [e.value for e in at.error] == [
+        "The shared annotation uses the en schema, switch the Mode to en to load it."
+    ]
+    at = shared_app(config=encode_config({"Nom": "Shami"}))
+    assert [e.value for e in at.error] == ["The shared annotation does not match the ar schema."]
+
+
+def test_pdf_download_times_the_body(serve, app):
+    import io
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from pypdf import PdfWriter
+
+    from metrics import STAGE_SECONDS
+
+    writer = PdfWriter()
+    writer.add_blank_page(width=200, height=200)
+    content = io.BytesIO()
+    writer.write(content)
+
+    class SlowPdf(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(content.getvalue())))
+            self.end_headers()
+            self.wfile.flush()
+            # the headers come right away, the body later
+            time.sleep(0.5)
+            self.wfile.write(content.getvalue())
+
+        def log_message(self, format, *args):
+            pass
+
+    url = serve(ThreadingHTTPServer(("127.0.0.1", 0), SlowPdf))
+
+    def downloads():
+        return STAGE_SECONDS._values.get((("stage", "pdf_download"),), [None, 0.0, 0])[1:]
+
+    total, count = downloads()
+    app.selectbox[1].set_value("🤖 AI Annotation").run()
+    app.text_input(key="paper_url").set_value(f"{url}/paper.pdf").run()
+    assert not app.exception
+    assert not app.error
+    new_total, new_count = downloads()
+    assert new_count == count + 1
+    assert new_total - total >= 0.5
+
+
+def submit(at):
+    # streamlit-tags widgets do not keep their value between AppTest runs
+    at.session_state["Tasks"] = ["dialect identification"]
+    [button for button in at.button if button.label == "Submit"][0].click().run()
+    assert not at.exception
+
+
+def test_duplicate_submission_is_recorded_once(services, session):
+    import journal
+
+    at = session("ai").at
+    kind, key = at.session_state["extraction_key"]
+    submit(at)
+    assert any("just submitted" in caption.value for caption in at.caption)
+
+    journal.get_journal().flush()
+    submissions = [
+        entry
+        for entry in journal.read_journal(journal.get_journal().path)
+        if entry["endpoint"] == "submission" and entry["input_hash"] == key
+    ]
+    assert len(submissions) == 1
+
+
+def submit_batch(at, batch):
+    at.session_state["batch"] = batch
+    at.run()
+    [button for button in at.button if button.label == "Submit batch"][0].click().run()
+    assert not at.exception
+    return [s.value for s in at.success], [w.value for w in at.warning], [i.value for i in at.info]
+
+
+def test_edited_batch_updates_its_pull_request(app):
+    app.selectbox[1].set_value("🦚 Manual Annotation").run()
+    app.session_state["gh_username"] = "batcher"
+    first = [dict(METADATA, Name="Batch A"), dict(METADATA, Name="Batch B")]
+
+    successes, _, _ = submit_batch(app, first)
+    assert any(s.startswith("Pull request created") for s in successes)
+
+    # same names, edited configs
+    edited = [dict(first[0], Description="edited " * 10), first[1]]
+    successes, _, _ = submit_batch(app, edited)
+    assert "Pull request updated" in successes
+
+    # sent again, the result of the first push is shown
+    successes, _, _ = submit_batch(app, edited)
+    assert "Pull request updated" in successes
+    assert any("just submitted" in caption.value for caption in app.caption)
+
+    # another user sending the same batch is not deduplicated, and nothing changed
+    app.session_state["gh_username"] = "batcher-2"
+    successes, _, infos = submit_batch(app, edited)
+    assert "No changes made to the datasets" in infos
+
+
+def test_closed_batch_can_be_sent_again(app):
+    import hashlib
+
+    from store import PRRegistry, get_store
+
+    app.selectbox[1].set_value("🦚 Manual Annotation").run()
+    app.session_state["gh_username"] = "batcher"
+    batch = [dict(METADATA, Name="Batch F"), dict(METADATA, Name="Batch G")]
+    successes, _, _ = submit_batch(app, batch)
+    assert any(s.startswith("Pull request created") for s in successes)
+
+    # the pull request is closed on GitHub
+    batch_id = hashlib.sha1("Batch F\nBatch G".encode("utf-8")).hexdigest()[:8]
+    registry = PRRegistry(get_store())
+    pr = registry.get(f"add-batch-{batch_id}")
+    registry.save(dict(pr, state="closed"))
+
+    app.session_state["gh_username"] = "batcher-2"
+    successes, _, _ = submit_batch(app, batch)
+    assert any(s.startswith("Pull request created") for s in successes)
+    assert registry.get(f"add-batch-{batch_id}-1")["state"] == "open"
+
+
+def test_batch_skips_datasets_of_open_batches(app):
+    app.selectbox[1].set_value("🦚 Manual Annotation").run()
+    app.session_state["gh_username"] = "batcher"
+    submit_batch(app, [dict(METADATA, Name="Batch C"), dict(METADATA, Name="Batch D")])
+
+    successes, warnings, _ = submit_batch(app, [dict(METADATA, Name="Batch C"), dict(METADATA, Name="Batch E")])
+    assert any(s.startswith("Pull request created") for s in successes)
+    assert "Batch C already has an open pull request, update it instead." in warnings
+    assert not any("Batch E" in w for w in warnings)
+
+
+def submissions_of(key):
+    import journal
+
+    journal.get_journal().flush()
+    return [
+        entry["response"]["metadata"]
+        for entry in journal.read_journal(journal.get_journal().path)
+        if entry["endpoint"] == "submission" and entry["input_hash"] == key
+    ]
+
+
+def test_batch_recorded_once_pushed(services, app):
+    app.selectbox[1].set_value("🤖 AI Annotation").run()
+    app.text_input(key="paper_url").set_value("https://arxiv.org/abs/1801.00006").run()
+    kind, key = app.session_state["extraction_key"]
+    link = f"{services}/raw/main/datasets/shami.json"
+    for column, value in {"Name": "Batch Recorded", "Link": link, "HF Link": "", "Paper Link": link}.items():
+        app.session_state[column] = value
+    app.session_state["gh_username"] = "batcher"
+    app.session_state["batch_mode"] = True
+    submit(app)
+    assert [c["Name"] for c in app.session_state["batch"]] == ["Batch Recorded"]
+    # queued, not submitted yet
+    assert submissions_of(key) == []
+
+    successes, _, _ = submit_batch(app, app.session_state["batch"])
+    assert any(s.startswith("Pull request created") for s in successes)
+    assert [metadata["Name"] for metadata in submissions_of(key)] == ["Batch Recorded"]
+
+
+def test_branch_edited_elsewhere_is_updated(session, tmp_path):
+    import json
+    import subprocess
+
+    from catalogue import data_file_name
+    from store import get_store
+
+    from conftest import REMOTE
+
+    at = session("manual").at
+    name = data_file_name(at.session_state["Name"])
+
+    # someone else pushes to the branch of the pull request
+    clone = str(tmp_path / "clone")
+    git = ["git", "-c", "user.name=maintainer", "-c", "user.email=maintainer@localhost"]
+    subprocess.run(["git", "clone", "-q", "-b", f"add-{name}", REMOTE, clone], check=True)
+    path = tmp_path / "clone" / "datasets" / f"{name}.json"
+    path.write_text(json.dumps(dict(json.loads(path.read_text()), License="MIT"), indent=4))
+    subprocess.run(git + ["-C", clone, "commit", "-qam", "Fix the license"], check=True)
+    subprocess.run(git + ["-C", clone, "push", "-q"], check=True)
+
+    # the same form again, past the deduplication window
+    for key, _ in get_store().items("submissions"):
+        get_store().delete("submissions", key)
+    submit(at)
+    assert "Pull request updated" in [s.value for s in at.success]
+    assert not any("No changes" in i.value for i in at.info)
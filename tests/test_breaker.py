@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from breaker import CircuitBreaker, CircuitOpen
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failures=2, reset_timeout=60)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.available()
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker("test", failures=1, reset_timeout=0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.available()
+    breaker.check()
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+    # a failed probe opens it again, a successful one closes it
+    breaker.failure()
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    breaker.check()
+    breaker.success()
+    assert breaker.state == "closed"
+    breaker.check()
+
+
+def test_abandoned_probe_is_replaced():
+    breaker = CircuitBreaker("test", failures=1, reset_timeout=0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    breaker.check()
+    time.sleep(0.06)
+    breaker.check()
+
+
+def test_guard_counts_only_service_failures():
+    breaker = CircuitBreaker("test", failures=1, reset_timeout=60)
+    with pytest.raises(ValueError):
+        with breaker.guard((ConnectionError,)):
+            raise ValueError("a bad answer, the service is up")
+    assert breaker.state == "closed"
+    with pytest.raises(ConnectionError):
+        with breaker.guard((ConnectionError,)):
+            raise ConnectionError
+    assert breaker.state == "open"
+
+
+def test_degraded_mode_when_the_bot_is_down(app, monkeypatch):
+    import breaker
+
+    monkeypatch.setattr(breaker, "_breakers", {})
+    bot = breaker.get_breaker("bot")
+    for _ in range(bot.failure_threshold):
+        bot.failure()
+    app.selectbox[1].set_value("🤖 AI Annotation").run()
+    assert not app.exception
+    assert any("AI annotation is unavailable" in w.value for w in app.warning)
+    # the form can still be filled by hand
+    assert app.text_input(key="Name") is not None
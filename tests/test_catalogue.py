@@ -0,0 +1,35 @@
+import catalogue
+from catalogue import data_file_name, load_remote_json, resolve_dataset_link
+
+
+def test_data_file_name():
+    assert data_file_name(" Shami Corpus ") == data_file_name("shami corpus")
+
+
+def test_resolve_dataset_link():
+    assert resolve_dataset_link("https://example.com/a.json") == "https://example.com/a.json"
+    assert resolve_dataset_link("Shami.json") == resolve_dataset_link("shami")
+    assert resolve_dataset_link("shami").endswith("/datasets/shami.json")
+
+
+def test_remote_cache_is_bounded(services, monkeypatch):
+    monkeypatch.setattr(catalogue, "_remote_cache", catalogue.OrderedDict())
+    monkeypatch.setattr(catalogue, "REMOTE_JSON_CACHE_SIZE", 2)
+    links = [f"{services}/raw/main/datasets/shami.json?copy={i}" for i in range(3)]
+    for link in links:
+        load_remote_json(link)
+    assert list(catalogue._remote_cache) == links[1:]
+    # a hit is the most recently used
+    load_remote_json(links[1])
+    load_remote_json(links[0])
+    assert list(catalogue._remote_cache) == [links[1], links[0]]
+
+
+def test_remote_cache_expires(services, monkeypatch):
+    monkeypatch.setattr(catalogue, "_remote_cache", catalogue.OrderedDict())
+    link = f"{services}/raw/main/datasets/shami.json"
+    data, content_hash = load_remote_json(link)
+    # too old to revalidate, a 304 must not serve it
+    entry = catalogue._remote_cache[link]
+    entry.update(data={"stale": True}, checked_at=entry["checked_at"] - catalogue.REMOTE_JSON_CACHE_TTL)
+    assert load_remote_json(link) == (data, content_hash)
@@ -0,0 +1,55 @@
+import glob
+import os
+
+import pytest
+
+from columnar import append, compact, normalize_volume, read_table
+from schemas import compile_schema
+from store import get_store
+from stubs.bot import METADATA, SCHEMA
+
+COLUMN_TYPES = compile_schema(SCHEMA)["column_types"]
+
+
+def files(root):
+    return sorted(glob.glob(os.path.join(root, "ar", "*", "year=*", "*.parquet")))
+
+
+def test_normalize_volume():
+    assert normalize_volume("117,805") == 117805
+    assert normalize_volume(32078.0) == 32078
+    assert normalize_volume("many") is None
+    assert normalize_volume(True) is None
+
+
+def test_compaction_keeps_the_latest_submission(tmp_path):
+    root = str(tmp_path)
+    append(METADATA, COLUMN_TYPES, "ar", "shami", root=root)
+    append(dict(METADATA, Description="edited"), COLUMN_TYPES, "ar", "shami", root=root)
+    append(dict(METADATA, Name="Other", Year=2020, Volume="1,000"), COLUMN_TYPES, "ar", "other", root=root)
+    assert len(files(root)) == 6
+
+    assert compact("ar", root=root, min_files=1) == 6
+    # one file per table and year
+    assert len(files(root)) == 4
+    datasets = read_table("ar", "datasets", columns=["_name", "Description", "Volume"], root=root)
+    rows = {row["_name"]: row for row in datasets.to_pylist()}
+    assert set(rows) == {"shami", "other"}
+    assert rows["shami"]["Description"] == "edited"
+    assert rows["other"]["Volume"] == 1000
+    subsets = read_table("ar", "subsets", columns=["_name", "Dialect"], root=root)
+    assert sorted(row["Dialect"] for row in subsets.to_pylist()) == ["Jordan", "Jordan", "Syria", "Syria"]
+
+
+def test_compaction_waits_for_the_lease(tmp_path):
+    root = str(tmp_path)
+    append(METADATA, COLUMN_TYPES, "ar", "shami", root=root)
+    # another replica is compacting the same tables
+    lease = f"ar:{os.path.abspath(root)}"
+    assert get_store().add("columnar_compaction", lease, b"", ttl=60)
+    try:
+        assert compact("ar", root=root, min_files=1) == 0
+        assert len(files(root)) == 2
+    finally:
+        get_store().delete("columnar_compaction", lease)
+    assert compact("ar", root=root, min_files=1) == 2
@@ -0,0 +1,54 @@
+from evaluate_extraction import evaluate, load_pairs
+from journal import Journal
+from schemas import compile_schema
+from stubs.bot import METADATA, SCHEMA
+
+COMPILED = compile_schema(SCHEMA)
+
+
+def submission(metadata, mode="ar"):
+    return {"schema": mode, "metadata": metadata}
+
+
+def test_load_pairs_keeps_the_latest(tmp_path):
+    path = str(tmp_path / "requests.jsonl")
+    log = Journal(path)
+    log.record("run", "ar", "a", 0.1, 200, {"Name": "old"})
+    log.record("run", "ar", "a", 0.1, 200, {"Name": "new"})
+    log.record("submission", "ar", "a", 0, 200, submission({"Name": "final"}))
+    # no extraction, a failed extraction, another mode
+    log.record("submission", "ar", "b", 0, 200, submission({"Name": "b"}))
+    log.record("run", "ar", "c", 0.1, 500, None, error="Bot error")
+    log.record("submission", "ar", "c", 0, 200, submission({"Name": "c"}))
+    log.record("run", "en", "d", 0.1, 200, {"Name": "d"})
+    log.record("submission", "en", "d", 0, 200, submission({"Name": "d"}, mode="en"))
+    log.flush()
+    assert load_pairs([path], "ar") == [({"Name": "new"}, {"Name": "final"})]
+
+
+def test_agreement_per_field_and_group():
+    extracted = dict(METADATA, Name="  shami ", License="MIT", Tasks=["dialect identification"], Volume=117805)
+    other = dict(METADATA, License="MIT", Year=2019)
+    report = evaluate([(extracted, METADATA), (other, METADATA)], COMPILED)
+    assert report["pairs"] == 2
+    fields = {field["field"]: field for field in report["fields"]}
+    # normalized strings and numbers agree
+    assert fields["Name"]["agreement"] == 1.0
+    assert fields["Volume"]["agreement"] == 1.0
+    assert fields["License"]["agreement"] == 0.0
+    assert fields["Year"]["agreement"] == 0.5
+    # least agreement first
+    assert report["fields"][0]["field"] == "License"
+    groups = {group["group"]: group for group in report["groups"]}
+    assert groups["ACCESSABILITY"]["all_fields_agree"] == 0.0
+    assert groups["DIVERSITY"]["all_fields_agree"] == 1.0
+    assert groups["CONTENT"]["all_fields_agree"] == 0.5
+
+
+def test_fields_missing_from_the_submission_do_not_count():
+    submitted = {"Name": "Shami"}
+    report = evaluate([({"Name": "Shami", "License": "MIT"}, submitted)], COMPILED)
+    fields = {field["field"]: field for field in report["fields"]}
+    assert fields["License"] == {"field": "License", "group": "ACCESSABILITY", "pairs": 0, "agreement": None}
+    assert report["agreement"] == 1.0
+    assert evaluate([], COMPILED)["agreement"] is None
@@ -0,0 +1,21 @@
+import json
+import zipfile
+
+import export
+from export import serialize_config, zip_configs
+from stubs.bot import METADATA
+
+
+def test_serialize_config():
+    assert json.loads(serialize_config(METADATA)) == METADATA
+
+
+def test_zip_configs_names_duplicates(monkeypatch):
+    # spooled to disk past the limit
+    monkeypatch.setattr(export, "EXPORT_SPOOL_SIZE", 100)
+    configs = [("shami", METADATA), ("shami", dict(METADATA, Year=2019)), ("other", {"Name": "Other"})]
+    archive = zip_configs(iter(configs))
+    assert archive._rolled
+    with zipfile.ZipFile(archive) as zip_file:
+        assert zip_file.namelist() == ["shami.json", "shami_1.json", "other.json"]
+        assert json.loads(zip_file.read("shami_1.json"))["Year"] == 2019
@@ -0,0 +1,15 @@
+from gh_client import GitHubClient
+
+
+def test_user_exists(services):
+    client = GitHubClient("test")
+    assert client.user_exists("zaidalyafeai")
+    assert not client.user_exists("missing-user")
+
+
+def test_username_is_quoted(monkeypatch):
+    paths = []
+    client = GitHubClient("test")
+    monkeypatch.setattr(client, "request", lambda method, path: paths.append(path) or (404, None))
+    assert not client.user_exists("missing/../../repos/ARBML/masader")
+    assert paths == ["/users/missing%2F..%2F..%2Frepos%2FARBML%2Fmasader"]
@@ -0,0 +1,75 @@
+import pytest
+
+import bot
+import breaker
+import journal
+from journal import Journal
+from stubs.bot import ERROR_LINK, METADATA, make_server
+
+
+@pytest.fixture
+def bot_url(serve, monkeypatch, tmp_path):
+    url = serve(make_server("127.0.0.1", 0))
+    monkeypatch.setattr(bot, "MASADER_BOT_URL", url)
+    monkeypatch.setattr(breaker, "_breakers", {})
+    monkeypatch.setenv("MASADER_BOT_JOURNAL", "cache")
+    monkeypatch.setattr(journal, "_journal", Journal(str(tmp_path / "requests.jsonl")))
+    return url
+
+
+def test_lookup_skips_failures(tmp_path):
+    log = Journal(str(tmp_path / "requests.jsonl"))
+    log.record("run", "ar", "a", 0.1, 200, None, error="Cannot read the paper.")
+    log.record("run", "ar", "b", 0.1, 200, "not an object")
+    log.record("run", "ar", "c", 0.1, 200, {"Name": "Shami"})
+    log.flush()
+    reopened = Journal(str(tmp_path / "requests.jsonl"))
+    assert reopened.lookup("run", "ar", "a") is None
+    assert reopened.lookup("run", "ar", "b") is None
+    assert reopened.lookup("run", "ar", "c") == {"Name": "Shami"}
+
+
+def test_failed_extraction_is_not_replayed(bot_url):
+    with pytest.raises(RuntimeError):
+        list(bot.stream_metadata(link=ERROR_LINK))
+    # the failure is recorded, but the paper is extracted again instead of served the error
+    with pytest.raises(RuntimeError):
+        list(bot.stream_metadata(link=ERROR_LINK))
+    journal.get_journal().flush()
+    entries = list(journal.read_journal(journal.get_journal().path))
+    assert len(entries) == 2
+    assert all(entry["error"] and entry["response"] is None for entry in entries)
+
+
+def test_extraction_is_cached(bot_url):
+    link = "https://aclanthology.org/L18-1576.pdf"
+    assert dict(bot.stream_metadata(link=link)) == METADATA
+    assert dict(bot.stream_metadata(link=link)) == METADATA
+    journal.get_journal().flush()
+    entries = list(journal.read_journal(journal.get_journal().path))
+    assert len(entries) == 1
+
+
+def test_index_reads_responses_from_disk(tmp_path):
+    log = Journal(str(tmp_path / "requests.jsonl"), buffer_size=1)
+    assert log.lookup("run", "ar", "a") is None
+    log.record("run", "ar", "a", 0.1, 200, {"Name": "Shami", "Description": "ش" * 10})
+    log.record("run", "ar", "b", 0.1, 200, {"Name": "Other"})
+    # only positions are indexed, not the responses
+    assert all(isinstance(position, tuple) for position in log._index.values())
+    assert log.lookup("run", "ar", "a") == {"Name": "Shami", "Description": "ش" * 10}
+    assert log.lookup("run", "ar", "b") == {"Name": "Other"}
+
+
+def test_index_follows_rotation(tmp_path):
+    log = Journal(str(tmp_path / "requests.jsonl"), max_bytes=300, backups=2, buffer_size=1)
+    assert log.lookup("run", "ar", "a") is None
+    for i in range(6):
+        log.record("run", "ar", str(i), 0.1, 200, {"Name": "x" * 100, "i": i})
+    assert log.lookup("run", "ar", "5") == {"Name": "x" * 100, "i": 5}
+    assert log.lookup("run", "ar", "4") == {"Name": "x" * 100, "i": 4}
+    # dropped with the oldest rotated file
+    assert log.lookup("run", "ar", "0") is None
+    reopened = Journal(str(tmp_path / "requests.jsonl"), max_bytes=300, backups=2)
+    for i in range(6):
+        assert reopened.lookup("run", "ar", str(i)) == log.lookup("run", "ar", str(i))
@@ -0,0 +1,60 @@
+import asyncio
+
+from constants import CRAWLER_MAX_REDIRECTS
+from link_crawler import LinkCrawler
+from stubs.links import make_server
+
+
+def crawl(urls):
+    return {result["url"]: result for result in asyncio.run(LinkCrawler().crawl(urls))}
+
+
+def test_dead_link(serve):
+    base = serve(make_server("127.0.0.1", 0))
+    results = crawl([f"{base}/ok/1", f"{base}/dead/1", f"{base}/no-head/1"])
+    assert results[f"{base}/ok/1"]["alive"] == 1
+    assert results[f"{base}/no-head/1"]["alive"] == 1
+    assert results[f"{base}/dead/1"]["alive"] == 0
+    assert results[f"{base}/dead/1"]["status"] == 404
+
+
+def test_redirect_cycle(serve):
+    base = serve(make_server("127.0.0.1", 0))
+    urls = [f"{base}/loop/1", f"{base}/cycle/a/1", f"{base}/cycle/b/1"]
+    results = crawl(urls)
+    for url in urls:
+        assert results[url]["alive"] == 0
+        assert results[url]["error"] == "RedirectLoop"
+
+
+def test_cached_redirect_cycle(serve):
+    base = serve(make_server("127.0.0.1", 0))
+    crawler = LinkCrawler()
+    asyncio.run(crawler.crawl([f"{base}/cycle/a/1"]))
+    # the hops are cached now, a new url into the cycle must not loop on them
+    crawler.results.clear()
+    result = asyncio.run(crawler.crawl([f"{base}/cycle/b/1"]))[0]
+    assert result["error"] == "RedirectLoop"
+
+
+def test_redirect_chain_limit(serve):
+    base = serve(make_server("127.0.0.1", 0))
+    # /chain/n redirects n + 1 times before reaching /ok
+    at_limit = f"{base}/chain/{CRAWLER_MAX_REDIRECTS - 1}/1"
+    over_limit = f"{base}/chain/{CRAWLER_MAX_REDIRECTS}/2"
+    results = crawl([at_limit, over_limit])
+    assert results[at_limit]["alive"] == 1
+    assert results[at_limit]["final_url"] == f"{base}/ok/1"
+    assert results[over_limit]["alive"] == 0
+    assert results[over_limit]["error"] == "TooManyRedirects"
+
+
+def test_cached_hops_count_against_limit(serve):
+    base = serve(make_server("127.0.0.1", 0))
+    crawler = LinkCrawler()
+    asyncio.run(crawler.crawl([f"{base}/chain/{CRAWLER_MAX_REDIRECTS - 1}/1"]))
+    crawler.results.clear()
+    # one more hop in front of a chain already at the limit
+    crawler.redirects[f"{base}/start"] = f"{base}/chain/{CRAWLER_MAX_REDIRECTS - 1}/1"
+    result = asyncio.run(crawler.crawl([f"{base}/start"]))[0]
+    assert result["error"] == "TooManyRedirects"
@@ -0,0 +1,32 @@
+import pytest
+
+from loadtest import FLOWS, StageRecorder, percentile, summarize
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_summarize():
+    summary = summarize({"submit": [0.3, 0.1, 0.2]})
+    assert summary["submit"]["count"] == 3
+    assert summary["submit"]["p50"] == 0.2
+    assert summary["submit"]["max"] == 0.3
+
+
+@pytest.mark.parametrize("flow", FLOWS)
+def test_flow_submits_a_pull_request(session, flow):
+    import metrics
+
+    recorder = StageRecorder()
+    metrics.logger.addHandler(recorder)
+    try:
+        done = session(flow)
+    finally:
+        metrics.logger.removeHandler(recorder)
+    assert set(done.steps) >= {"page_load", "select_flow", "submit"}
+    stages = {stage for stage, _, status in recorder.pop() if status == "ok"}
+    assert {"git_clone", "git_push", "github_create_pull"} <= stages
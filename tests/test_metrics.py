@@ -0,0 +1,51 @@
+import json
+import logging
+
+import pytest
+
+import metrics
+from metrics import Counter, Metric, observe
+
+
+def test_metric_is_abstract():
+    with pytest.raises(TypeError):
+        Metric("masader_test_abstract", "An abstract metric.")
+
+
+def test_label_values_are_escaped():
+    counter = Counter("masader_test_escaped_total", "Escaped\nhelp.")
+    counter.inc(path='C:\\dir "quoted"\nnext')
+    assert counter.render().splitlines() == [
+        "# HELP masader_test_escaped_total Escaped\\nhelp.",
+        "# TYPE masader_test_escaped_total counter",
+        'masader_test_escaped_total{path="C:\\\\dir \\"quoted\\"\\nnext"} 1',
+    ]
+
+
+@pytest.fixture
+def events(monkeypatch):
+    records = []
+
+    class Recorder(logging.Handler):
+        def emit(self, record):
+            records.append(json.loads(record.getMessage()))
+
+    handler = Recorder()
+    metrics.logger.addHandler(handler)
+    yield records
+    metrics.logger.removeHandler(handler)
+
+
+def test_frequent_stages_are_sampled(events, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_LOG_SAMPLE_RATE", 0)
+    observe("validate_url", 0.01)
+    observe("validate_url", 0.01, status="error")
+    observe("git_push", 0.5)
+    assert [(event["stage"], event["status"]) for event in events] == [
+        ("validate_url", "error"),
+        ("git_push", "ok"),
+    ]
+
+    monkeypatch.setattr(metrics, "METRICS_LOG_SAMPLE_RATE", 1)
+    observe("validate_url", 0.01)
+    assert events[-1]["stage"] == "validate_url" and events[-1]["sample_rate"] == 1
@@ -0,0 +1,39 @@
+import io
+
+from pypdf import PdfReader, PdfWriter
+
+import pdf_pages
+from pdf_pages import page_count, page_range
+
+
+def sized_pdf(pages):
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_blank_page(width=100 + i, height=100)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def test_page_range():
+    content = sized_pdf(5)
+    assert page_count("five", content) == 5
+    pages = PdfReader(io.BytesIO(page_range("five", content, 3, 10))).pages
+    assert [int(page.mediabox.width) for page in pages] == [103, 104]
+
+
+def test_pages_cached_by_hash():
+    content = sized_pdf(2)
+    first = page_range("two", content, 0, 1)
+    # the content is not read again for the same hash
+    assert page_range("two", b"", 0, 1) is first
+    assert page_count("two", content) == page_count("two", b"") == 2
+
+
+def test_cache_bounded(monkeypatch):
+    monkeypatch.setattr(pdf_pages, "VIEWER_CACHE_SIZE", 1)
+    content = sized_pdf(3)
+    page_range("bounded", content, 0, 1)
+    page_range("bounded", content, 1, 2)
+    assert ("bounded", 0, 1) not in pdf_pages._cache
+    assert ("bounded", 1, 2) in pdf_pages._cache
@@ -0,0 +1,53 @@
+import io
+
+import pdf_preprocess
+from pdf_preprocess import prepare_pdf, select_pages
+
+
+def blank_pdf(pages=1):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def test_select_pages_keeps_the_appendix():
+    pages = ["text"] * 30
+    pages[24] = "A Appendix\nmore details"
+    assert select_pages(pages, max_pages=10, max_appendix_pages=3) == list(range(10)) + [24, 25, 26]
+    assert select_pages(["text"] * 4, max_pages=10) == [0, 1, 2, 3]
+
+
+def test_off_sends_the_whole_pdf():
+    pdf = ("paper.pdf", blank_pdf(), "application/pdf")
+    assert prepare_pdf(pdf, mode="off").content == pdf[1]
+
+
+def test_timeout_replaces_the_pool(monkeypatch):
+    monkeypatch.setattr(pdf_preprocess, "PDF_PREPROCESS_TIMEOUT", 0.01)
+    pdf = ("paper.pdf", blank_pdf(), "application/pdf")
+    stuck = pdf_preprocess._get_executor()
+    processes = []
+    reset = pdf_preprocess._reset_executor
+
+    def reset_executor(executor, terminate=False):
+        processes.extend(executor._processes.values())
+        reset(executor, terminate)
+
+    monkeypatch.setattr(pdf_preprocess, "_reset_executor", reset_executor)
+    payload = prepare_pdf(pdf, mode="text")
+    assert payload.kind == "pdf" and payload.content == pdf[1]
+    assert pdf_preprocess._get_executor() is not stuck
+    assert processes
+    for process in processes:
+        process.join(10)
+        assert not process.is_alive()
+
+    # the new pool works
+    monkeypatch.setattr(pdf_preprocess, "PDF_PREPROCESS_TIMEOUT", 60)
+    assert prepare_pdf(pdf, mode="text").content == pdf[1]
+    pdf_preprocess._reset_executor(pdf_preprocess._get_executor())
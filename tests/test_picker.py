@@ -0,0 +1,24 @@
+from picker import PrefixIndex, get_index
+
+OPTIONS = ["Modern Standard Arabic", "Classical Arabic", "Egyptian Arabic", "Moroccan Darija", "mixed"]
+
+
+def test_every_word_of_the_query_is_a_prefix():
+    index = PrefixIndex(OPTIONS)
+    assert index.search("arab") == ["Modern Standard Arabic", "Classical Arabic", "Egyptian Arabic"]
+    assert index.search("ARAB egy") == ["Egyptian Arabic"]
+    assert index.search("dar mor") == ["Moroccan Darija"]
+    assert index.search("rabic") == []
+    assert index.search("arabic french") == []
+
+
+def test_empty_query_and_limit():
+    index = PrefixIndex(OPTIONS)
+    assert index.search("") == OPTIONS
+    assert index.search("  ", limit=2) == OPTIONS[:2]
+    assert index.search("arabic", limit=1) == ["Modern Standard Arabic"]
+
+
+def test_index_built_once_per_option_set():
+    assert get_index(OPTIONS) is get_index(list(OPTIONS))
+    assert get_index(OPTIONS) is not get_index(OPTIONS[:2])
@@ -0,0 +1,43 @@
+import pytest
+
+import breaker
+import schemas
+from schemas import compile_schema, get_schema, refresh_schemas
+from stubs.bot import SCHEMA, make_server
+
+
+@pytest.fixture
+def bot_url(serve, monkeypatch):
+    url = serve(make_server("127.0.0.1", 0))
+    monkeypatch.setattr(schemas, "MASADER_BOT_URL", url)
+    monkeypatch.setattr(breaker, "_breakers", {})
+    monkeypatch.setattr(schemas, "_schemas", {})
+    return url
+
+
+def test_compile_schema():
+    compiled = compile_schema(SCHEMA)
+    assert compiled["columns"] == list(SCHEMA)
+    assert compiled["column_types"]["Year"] == "date[year]"
+    assert "Name" in compiled["required_columns"]
+    assert "HF Link" not in compiled["required_columns"]
+    assert "Subsets" not in compiled["required_columns"]
+    assert compiled["evaluation_subsets"]["ACCESSABILITY"] == ["Link", "HF Link", "License"]
+    assert "Paper Title" not in compiled["validation_columns"]
+
+
+def test_refresh_compiles_every_mode(bot_url):
+    refresh_schemas(["ar", "en"])
+    compiled = schemas._schemas["ar"]
+    assert set(schemas._schemas) == {"ar", "en"}
+    # served from the prefetched schemas
+    assert get_schema("ar") is compiled
+
+
+def test_failed_mode_keeps_its_schema(bot_url, monkeypatch):
+    refresh_schemas(["ar"])
+    compiled = schemas._schemas["ar"]
+    monkeypatch.setattr(schemas, "MASADER_BOT_URL", "http://127.0.0.1:9")
+    monkeypatch.setattr(schemas, "get_journal", lambda: None)
+    refresh_schemas(["ar"])
+    assert schemas._schemas["ar"] is compiled
@@ -0,0 +1,27 @@
+from session_memory import SessionMemory
+from store import BlobStore, SQLiteStore
+
+
+def test_blob_kept_while_another_replica_references_it(tmp_path):
+    store = SQLiteStore(str(tmp_path / "state.db"))
+    first, second = SessionMemory(BlobStore(store)), SessionMemory(BlobStore(store))
+    data = b"%PDF-1.4 paper"
+    handle = first.put("session-1", data)
+    assert second.put("session-2", data) == handle
+
+    first.release("session-1", handle)
+    assert first.get("session-3", handle) == data
+    assert second.get("session-2", handle) == data
+
+    second.release("session-2", handle)
+    assert BlobStore(store).get(handle) is None
+
+
+def test_session_budget_releases_oldest(tmp_path):
+    blobs = BlobStore(SQLiteStore(str(tmp_path / "state.db")))
+    memory = SessionMemory(blobs, session_budget=10)
+    old = memory.put("session", b"a" * 8)
+    new = memory.put("session", b"b" * 8)
+    assert memory.usage("session") == 8
+    assert blobs.get(old) is None
+    assert blobs.get(new) == b"b" * 8
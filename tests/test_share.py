@@ -0,0 +1,41 @@
+import base64
+import zlib
+
+import pytest
+
+from constants import SHARED_MAX_CONFIG_BYTES
+from share import config_hash, decode_config, encode_config, prefill_key, resolve_prefill, store_config
+
+CONFIG = {"Name": "Shami", "Tasks": ["dialect identification"], "Year": 2018, "Description": "ش" * 20}
+
+
+def test_encode_decode_round_trip():
+    encoded = encode_config(CONFIG)
+    assert "=" not in encoded
+    assert decode_config(encoded) == CONFIG
+    # canonical, the key order does not matter
+    assert encode_config(dict(reversed(CONFIG.items()))) == encoded
+    assert config_hash(dict(reversed(CONFIG.items()))) == config_hash(CONFIG)
+
+
+def test_decode_rejects_oversized_configs():
+    bomb = zlib.compress(b'{"Name": "' + b"a" * (SHARED_MAX_CONFIG_BYTES + 1) + b'"}', 9)
+    encoded = base64.urlsafe_b64encode(bomb).decode("ascii")
+    assert len(encoded) < 10000
+    with pytest.raises(ValueError):
+        decode_config(encoded)
+
+
+def test_prefill_key_does_not_resolve():
+    assert prefill_key({}) is None
+    assert prefill_key({"id": "abc"}) == "id:abc"
+    encoded = encode_config(CONFIG)
+    assert prefill_key({"config": encoded}) == prefill_key({"config": encoded})
+    assert prefill_key({"config": encoded}) != prefill_key({"config": encode_config({"Name": "Other"})})
+
+
+def test_resolve_prefill():
+    assert resolve_prefill({"config": encode_config(CONFIG)}) == CONFIG
+    assert resolve_prefill({"id": store_config(CONFIG)}) == CONFIG
+    assert resolve_prefill({"id": "missing"}) is None
+    assert resolve_prefill({"id": "../etc"}) is None
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from store import BlobStore, HTTPStore, SQLiteStore, Store
+from stubs.kvstore import make_server
+
+
+@pytest.fixture(params=["sqlite", "http"])
+def store(request, tmp_path, serve):
+    if request.param == "http":
+        return HTTPStore(serve(make_server("127.0.0.1", 0)))
+    return SQLiteStore(str(tmp_path / "state.db"))
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        Store()
+
+
+def test_add_only_sets_missing_keys(store):
+    assert store.add("jobs", "a", b"1")
+    assert not store.add("jobs", "a", b"2")
+    assert store.get("jobs", "a") == b"1"
+    store.delete("jobs", "a")
+    assert store.add("jobs", "a", b"3")
+    assert store.get("jobs", "a") == b"3"
+
+
+def test_ttl(store):
+    store.set("cache", "a", b"1", ttl=0.05)
+    assert store.add_json("cache", "b", {"state": "running"}, ttl=0.05)
+    assert store.get("cache", "a") == b"1"
+    time.sleep(0.1)
+    assert store.get("cache", "a") is None
+    assert store.items("cache") == []
+    # an expired key is missing for add too
+    assert store.add_json("cache", "b", {"state": "done"})
+    assert store.get_json("cache", "b") == {"state": "done"}
+
+
+def test_get_set_items(store):
+    assert store.get("cache", "missing") is None
+    store.set("cache", "a", b"\x00binary")
+    store.set("cache", "a/b c", b"2")
+    store.set("other", "a", b"3")
+    store.set_json("cache", "c", {"state": "done"})
+    assert store.get("cache", "a") == b"\x00binary"
+    assert store.get("cache", "a/b c") == b"2"
+    assert sorted(store.items("cache")) == [("a", b"\x00binary"), ("a/b c", b"2"), ("c", b'{"state": "done"}')]
+    store.delete("cache", "a/b c")
+    store.delete("cache", "missing")
+    assert store.get("cache", "a/b c") is None
+    assert store.get_json("cache", "c") == {"state": "done"}
+
+
+def test_blob_refs_with_slashes(store):
+    blobs = BlobStore(store)
+    handle = blobs.put(b"%PDF", "session/1")
+    assert blobs.put(b"%PDF", "session/2") == handle
+    blobs.release(handle, "session/1")
+    assert blobs.get(handle) == b"%PDF"
+    blobs.release(handle, "session/2")
+    assert blobs.get(handle) is None
+    assert store.items("blob_refs") == []
+
+
+def test_expired_rows_are_purged(tmp_path):
+    store = SQLiteStore(str(tmp_path / "state.db"), purge_interval=0)
+    store.set("cache", "a", b"1", ttl=0.05)
+    store.set("cache", "kept", b"1")
+    time.sleep(0.1)
+    store.set("cache", "b", b"1", ttl=60)
+    rows = store._db().execute("SELECT key FROM kv ORDER BY key").fetchall()
+    assert rows == [("b",), ("kept",)]
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from store import SQLiteStore
+from submissions import Submissions, idempotency_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteStore(str(tmp_path / "state.db"))
+
+
+def test_idempotency_key():
+    config = {"Name": "Shami", "Tasks": ["dialect identification"]}
+    assert idempotency_key(config, "User ") == idempotency_key(dict(config), "user")
+    assert idempotency_key(config, "user") != idempotency_key(config, "other")
+    assert idempotency_key(config, "user") != idempotency_key(dict(config, Name="Other"), "user")
+
+
+def test_resend_gets_the_stored_result(store):
+    calls = []
+    submissions = Submissions(store)
+    assert submissions.run("key", lambda: calls.append(1) or {"status": "created"}) == ({"status": "created"}, False)
+    # another replica sharing the store
+    assert Submissions(store).run("key", lambda: calls.append(1)) == ({"status": "created"}, True)
+    assert calls == [1]
+
+
+def test_concurrent_duplicates_wait_for_the_first(store):
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+    submissions = Submissions(store)
+
+    def submit():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"status": "created"}
+
+    first = threading.Thread(target=lambda: results.append(submissions.run("key", submit)))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=lambda: results.append(submissions.run("key", submit)))
+    second.start()
+    time.sleep(0.1)
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert calls == [1]
+    assert sorted(duplicate for _, duplicate in results) == [False, True]
+
+
+def test_failed_submission_can_be_resent(store):
+    submissions = Submissions(store)
+
+    def fail():
+        raise RuntimeError("push rejected")
+
+    with pytest.raises(RuntimeError):
+        submissions.run("key", fail)
+    assert submissions.run("key", lambda: {"status": "created"}) == ({"status": "created"}, False)
+
+
+def test_claim_released_when_the_result_cannot_be_saved(store):
+    class FailingStore(SQLiteStore):
+        def set(self, namespace, key, value, ttl=None):
+            raise OSError("store unavailable")
+
+    submissions = Submissions(FailingStore(store.path))
+    assert submissions.run("key", lambda: {"status": "created"}) == ({"status": "created"}, False)
+    # the claim is gone, a resend runs instead of waiting for the lease
+    assert store.get("submissions", "key") is None
@@ -0,0 +1,20 @@
+import json
+
+from stubs.bot import METADATA, SCHEMA
+from validate_catalogue import validate_catalogue
+
+
+def test_reports_the_invalid_files(tmp_path):
+    for i in range(5):
+        (tmp_path / f"valid_{i}.json").write_text(json.dumps(dict(METADATA, Name=f"Shami {i}")))
+    (tmp_path / "bad_license.json").write_text(json.dumps(dict(METADATA, License="GPL")))
+    (tmp_path / "broken.json").write_text("{")
+    (tmp_path / "list.json").write_text("[]")
+    (tmp_path / "notes.txt").write_text("not a dataset")
+
+    report = validate_catalogue(str(tmp_path), SCHEMA, workers=2, chunksize=2)
+    assert (report["total"], report["valid"], report["invalid"]) == (8, 5, 3)
+    results = {result["file"].rsplit("/", 1)[1]: result["errors"] for result in report["results"]}
+    assert list(results) == ["bad_license.json", "broken.json", "list.json"]
+    assert [error["field"] for error in results["bad_license.json"]] == ["License"]
+    assert results["broken.json"][0]["field"] is None
@@ -0,0 +1,87 @@
+import threading
+
+from schemas import compile_schema
+from stubs.bot import METADATA, SCHEMA
+from validation import CheckCache
+
+VALIDATOR = compile_schema(SCHEMA)["validator"]
+
+
+def fields(errors):
+    return sorted(error.field for error in errors)
+
+
+def test_valid_config():
+    assert VALIDATOR.validate(METADATA, check_url=lambda url: True) == []
+
+
+def test_every_error_reported_at_once():
+    config = dict(
+        METADATA,
+        Name="",
+        License="GPL",
+        Year=2018.5,
+        Link="github.com/shami",
+        Subsets=[{"Name": "", "Volume": "many", "Unit": "sentences", "Dialect": "Jordan"}],
+    )
+    del config["Tasks"]
+    errors = VALIDATOR.validate(config)
+    assert fields(errors) == ["License", "Link", "Name", "Subsets", "Subsets", "Tasks", "Year"]
+
+
+def test_urls_checked_concurrently():
+    checked = []
+    errors = VALIDATOR.validate(METADATA, check_url=lambda url: checked.append(url) or "aclanthology" not in url)
+    # only the required urls are checked
+    assert sorted(checked) == sorted([METADATA["Link"], METADATA["Paper Link"]])
+    assert [error.message for error in errors] == [f"{METADATA['Paper Link']} is not reachable."]
+
+
+def test_check_field():
+    assert VALIDATOR.check_field("Name", "Shami") == ([], None)
+    assert VALIDATOR.check_field("Link", METADATA["Link"]) == ([], METADATA["Link"])
+    assert VALIDATOR.check_field("HF Link", "") == ([], None)
+    errors, url = VALIDATOR.check_field("Year", "2018")
+    assert fields(errors) == ["Year"] and url is None
+    errors, _ = VALIDATOR.check_field("Name", "Shami<")
+    assert "<" in errors[0].message
+
+
+def test_check_cache_runs_a_value_once():
+    cache = CheckCache(max_workers=2, ttl=60, max_size=2)
+    release = threading.Event()
+    calls = []
+
+    def check(value):
+        calls.append(value)
+        release.wait(5)
+        return value.startswith("ok")
+
+    first = cache.submit("user", "ok-1", check)
+    # the same value is running, the future is shared
+    assert cache.submit("user", "ok-1", check) is first
+    release.set()
+    assert first.result(5) is True
+    assert cache.submit("user", "ok-1", check).result(5) is True
+    assert calls == ["ok-1"]
+
+    # the oldest result is evicted past max_size
+    assert cache.submit("user", "bad", check).result(5) is False
+    assert cache.submit("user", "ok-2", check).result(5) is True
+    cache.submit("user", "ok-1", check).result(5)
+    assert calls == ["ok-1", "bad", "ok-2", "ok-1"]
+
+
+def test_check_cache_does_not_keep_failures():
+    cache = CheckCache(max_workers=1, ttl=60)
+    calls = []
+
+    def check(value):
+        calls.append(value)
+        if len(calls) == 1:
+            raise RuntimeError("rate limited")
+        return True
+
+    assert cache.submit("url", "x", check).exception(5) is not None
+    assert cache.submit("url", "x", check).result(5) is True
+    assert len(calls) == 2
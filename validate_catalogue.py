@@ -0,0 +1,111 @@
+"""
+Validates every dataset json of a catalogue checkout against the current schema.
+
+Usage:
+    python validate_catalogue.py ../masader/datasets --mode ar --output report.json
+
+The report lists the errors of every invalid file, the exit code is 1 if any file is invalid.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from schemas import compile_schema, fetch_schema
+
+_validator = None
+
+
+def _init_worker(schema):
+    # compile the validator once per worker process
+    global _validator
+    _validator = compile_schema(schema)["validator"]
+
+
+def _validate_file(path):
+    try:
+        with open(path, "r") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        return {"file": path, "errors": [{"field": None, "message": f"Cannot read the json: {e}"}]}
+    if not isinstance(config, dict):
+        return {"file": path, "errors": [{"field": None, "message": "The json is not an object."}]}
+    errors = _validator.validate(config)
+    return {"file": path, "errors": [error._asdict() for error in errors]}
+
+
+def iter_dataset_files(directory):
+    """
+    Yields the dataset json files of a directory without listing it in memory first.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".json"):
+                yield entry.path
+
+
+def validate_catalogue(directory, schema, workers=None, chunksize=16):
+    """
+    Validates the dataset jsons of a directory across a process pool.
+
+    Args:
+        directory (str): The directory of the dataset jsons.
+        schema (dict): The schema to validate against.
+        workers (int): The number of processes, all cores by default.
+        chunksize (int): The number of files sent to a process at once.
+
+    Returns:
+        dict: The report with the number of files, the number of invalid files and their errors.
+    """
+    start = time.perf_counter()
+    total = 0
+    invalid = []
+    with Pool(workers, initializer=_init_worker, initargs=(schema,)) as pool:
+        for result in pool.imap_unordered(
+            _validate_file, iter_dataset_files(directory), chunksize=chunksize
+        ):
+            total += 1
+            if result["errors"]:
+                invalid.append(result)
+    invalid.sort(key=lambda result: result["file"])
+    return {
+        "directory": directory,
+        "total": total,
+        "valid": total - len(invalid),
+        "invalid": len(invalid),
+        "seconds": round(time.perf_counter() - start, 3),
+        "results": invalid,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", help="The datasets directory of a masader checkout.")
+    parser.add_argument("--mode", default="ar", help="The schema mode to validate against.")
+    parser.add_argument("--schema", help="Read the schema from a json file instead of the bot.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes.")
+    parser.add_argument("--output", help="Write the report to a file instead of stdout.")
+    args = parser.parse_args()
+
+    if args.schema:
+        with open(args.schema, "r") as f:
+            schema = json.load(f)
+    else:
+        schema = fetch_schema(args.mode)
+
+    report = validate_catalogue(args.directory, schema, workers=args.workers)
+    report["mode"] = None if args.schema else args.mode
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    return 1 if report["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
+from constants import *
+
+# Regular expression pattern to match numbers with comma-separated thousands
+COMMA_NUMBER_PATTERN = re.compile(r"\d{1,3}(,\d{3})*")
+VALID_NAME_CHARS = frozenset(VALID_SYMP_NAMES)
+
+ValidationError = namedtuple("ValidationError", ["field", "message"])
+
+# the python types of each output type, as created by create_default_json and the form
+PYTHON_TYPES = {
+    "str": str,
+    "url": str,
+    "List[str]": list,
+    "int": int,
+    "date[year]": int,
+    "float": (int, float),
+}
+
+
+def validate_comma_separated_number(number: str) -> bool:
+    """
+    Validates a number with commas separating thousands.
+
+    Args:
+        number (str): The number as a string.
+
+    Returns:
+        bool: True if valid, False otherwise.
+    """
+    return COMMA_NUMBER_PATTERN.fullmatch(number) is not None
+
+
+def invalid_name_chars(name: str) -> list:
+    """
+    Finds the characters that are not allowed in the name of a dataset.
+
+    Args:
+        name (str): The name of the dataset.
+
+    Returns:
+        list: The invalid characters, sorted.
+    """
+    return sorted(set(name.lower()) - VALID_NAME_CHARS)
+
+
+def dict_keys(type: str) -> list:
+    # List[Dict[Name, Volume, Unit, Dialect]] -> [Name, Volume, Unit, Dialect]
+    type = type.replace("List[Dict[", "").replace("]]", "")
+    return [key.strip() for key in type.split(",")]
+
+
+def _is_empty(value) -> bool:
+    if isinstance(value, str):
+        return value.strip() == ""
+    if isinstance(value, (list, dict)):
+        return len(value) == 0
+    return value is None or value == 0
+
+
+class Validator:
+    """
+    Validates a config against a schema, the checks of every column are compiled once.
+
+    Network checks (urls) are collected during the pass and run concurrently at the end,
+    so one call reports every error of the config. check_field validates a single field,
+    for the form to check fields as they change.
+    """
+
+    def __init__(self, schema: dict, required_columns: list):
+        self.checks = {}
+        self.url_columns = {}
+        self.subset_columns = {}
+        required = set(required_columns)
+        self.types = {}
+        for column, spec in schema.items():
+            type = spec["output_type"]
+            self.types[column] = list if "List[Dict[" in type else PYTHON_TYPES.get(type)
+            if "List[Dict[" in type:
+                self.subset_columns[column] = self._compile_subset(schema, type)
+                continue
+            if type == "url":
+                self.url_columns[column] = column in required
+                continue
+            checks = []
+            if column in required and type in ["str", "List[str]", "int"]:
+                checks.append(self._required(column))
+            if "options" in spec and type == "str":
+                checks.append(self._one_of(column, frozenset(spec["options"])))
+            if type in ["int", "date[year]"]:
+                checks.append(self._integer(column))
+            if column == "Name":
+                checks.append(self._name(column))
+            if column == "Volume":
+                checks.append(self._volume(column))
+            self.checks[column] = checks
+
+    @staticmethod
+    def _required(column):
+        def check(value):
+            if _is_empty(value):
+                return f"Please enter a valid {column}."
+
+        return check
+
+    @staticmethod
+    def _one_of(column, options):
+        def check(value):
+            if value not in options:
+                return f"{value} is not a valid option for {column}."
+
+        return check
+
+    @staticmethod
+    def _integer(column):
+        def check(value):
+            if not isinstance(value, (int, float)) or int(value) != value:
+                return f"{column} must be a whole number."
+
+        return check
+
+    @staticmethod
+    def _name(column):
+        def check(value):
+            chars = invalid_name_chars(value)
+            if chars:
+                return f"Invalid characters in the dataset name: {' '.join(chars)}"
+
+        return check
+
+    @staticmethod
+    def _volume(column):
+        def check(value):
+            if isinstance(value, str) and not validate_comma_separated_number(value):
+                return f"{column} must be a number like 1,000 or 117,805."
+
+        return check
+
+    def _compile_subset(self, schema, type):
+        keys = dict_keys(type)
+        checks = {}
+        for key in keys:
+            key_checks = []
+            if key in schema and "options" in schema[key]:
+                key_checks.append(self._one_of(key, frozenset(schema[key]["options"])))
+            if key == "Volume":
+                key_checks.append(self._volume(key))
+            checks[key] = key_checks
+        return keys, checks
+
+    def _validate_subsets(self, column, rows):
+        keys, checks = self.subset_columns[column]
+        errors = []
+        for i, row in enumerate(rows):
+            if not isinstance(row, dict):
+                errors.append(ValidationError(column, f"Row {i + 1}: must be an object."))
+                continue
+            if _is_empty(row.get(keys[0], "")):
+                errors.append(ValidationError(column, f"Row {i + 1}: please enter the {keys[0]}."))
+            for key in keys:
+                for check in checks[key]:
+                    message = check(row.get(key, ""))
+                    if message:
+                        errors.append(ValidationError(column, f"Row {i + 1}: {message}"))
+        return errors
+
+    def check_field(self, column: str, value):
+        """
+        Runs the local checks of one field.
+
+        Args:
+            column (str): The column of the field.
+            value: The value of the field, as in the config.
+
+        Returns:
+            tuple: The ValidationError of the field, and the url left to check over the network
+            (None if there is none).
+        """
+        expected = self.types.get(column)
+        if expected and (not isinstance(value, expected) or isinstance(value, bool)):
+            return [ValidationError(column, f"{column} has the wrong type {type(value).__name__}.")], None
+
+        if column in self.subset_columns:
+            return self._validate_subsets(column, value), None
+
+        if column in self.url_columns:
+            is_required = self.url_columns[column]
+            if _is_empty(value):
+                if is_required:
+                    return [ValidationError(column, f"Please enter a valid {column}.")], None
+            elif not value.startswith(("http://", "https://")):
+                return [ValidationError(column, f"Please enter a valid {column}.")], None
+            elif is_required:
+                return [], value
+            return [], None
+
+        for check in self.checks.get(column, []):
+            message = check(value)
+            if message:
+                return [ValidationError(column, message)], None
+        return [], None
+
+    def validate(self, config: dict, check_url=None) -> list:
+        """
+        Validates a whole config in one pass.
+
+        Args:
+            config (dict): The config created from the form.
+            check_url (callable): Checks that a url is reachable, skipped if None.
+
+        Returns:
+            list: The ValidationError of every failing field, empty if the config is valid.
+        """
+        errors = []
+        urls = []
+        for column in self.types:
+            if column not in config:
+                errors.append(ValidationError(column, f"{column} is missing."))
+                continue
+            field_errors, url = self.check_field(column, config[column])
+            errors += field_errors
+            if url and check_url:
+                urls.append((column, url))
+
+        if urls:
+            with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+                reachable = list(executor.map(check_url, [value for _, value in urls]))
+            for (column, value), ok in zip(urls, reachable):
+                if not ok:
+                    errors.append(ValidationError(column, f"{value} is not reachable."))
+        return errors
+
+
+class CheckCache:
+    """
+    Runs the slow checks of field values (reachable urls, existing GitHub usernames) in
+    background threads. The results are cached by value for `ttl` seconds and shared by
+    all the sessions, so a value is checked once whichever session typed it first.
+    """
+
+    def __init__(self, max_workers=VALIDATION_WORKERS, ttl=VALIDATION_CACHE_TTL, max_size=VALIDATION_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="field-check")
+        self._results = OrderedDict()
+        self._pending = {}
+        # reentrant, a check that finished already runs its callback in the submitting thread
+        self._lock = threading.RLock()
+
+    def submit(self, name: str, value, check) -> Future:
+        """
+        Starts a check unless its result is cached or it is already running.
+
+        Args:
+            name (str): The name of the check, part of the cache key.
+            value: The checked value.
+            check (callable): Returns True if the value is valid.
+
+        Returns:
+            Future: The result of the check.
+        """
+        key = (name, value)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[1] > time.time():
+                self._results.move_to_end(key)
+                future = Future()
+                future.set_result(cached[0])
+                return future
+            if key in self._pending:
+                return self._pending[key]
+            future = self._executor.submit(check, value)
+            self._pending[key] = future
+            future.add_done_callback(partial(self._done, key))
+            return future
+
+    def _done(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+            # failures (rate limits) are not cached, the check runs again next time
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._results[key] = (future.result(), time.time() + self.ttl)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+
+_check_cache = None
+_check_cache_lock = threading.Lock()
+
+
+def get_check_cache() -> CheckCache:
+    """
+    Returns the check cache of the process.
+    """
+    global _check_cache
+    with _check_cache_lock:
+        if _check_cache is None:
+            _check_cache = CheckCache()
+        return _check_cache